@@ -0,0 +1,97 @@
+"""Benchmark de la analítica de estancias y ocupación sobre un histórico grande.
+
+Compara emparejar entradas y salidas recorriendo objetos del ORM en Python, la consulta
+con LEAD de estancias() y el Analizador incremental, tanto el primer cálculo completo
+como una actualización con unos pocos registros nuevos.
+
+Uso:
+    python benchmarks/bench_analitica.py --registros 1000000 --nuevos 1000
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+
+from sqlalchemy import insert
+
+from comun import (
+    abrir_bd,
+    comparar,
+    dni_sintetico,
+    guardar_resultados,
+    imprimir,
+    medir,
+    poblar,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--bicis", type=int, default=5000)
+    parser.add_argument("--registros", type=int, default=200000)
+    parser.add_argument("--nuevos", type=int, default=1000, help="Registros nuevos")
+    parser.add_argument("--salida", help="Ruta del JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        bd = abrir_bd(str(Path(directorio) / "bench.db"))
+        from parking.data_utils.analitica import Analizador, distribucion, estancias
+        from parking.models.bd import RegistroORM
+
+        poblar(bd, args.usuarios, args.bicis, args.registros)
+        print(f"Histórico de {args.registros} registros de {args.bicis} bicis\n")
+
+        def orm_en_python(_):
+            # Forma ingenua: todos los objetos del ORM ordenados y emparejados en Python
+            abiertas, duraciones = {}, []
+            with bd.crear_sesion(escritura=False) as sesion:
+                for r in sesion.query(RegistroORM).order_by(
+                    RegistroORM.num_serie, RegistroORM.timestamp
+                ):
+                    if r.accion == "IN":
+                        abiertas[r.num_serie] = r.timestamp
+                    elif r.num_serie in abiertas:
+                        duraciones.append(r.timestamp - abiertas.pop(r.num_serie))
+            return duraciones
+
+        analizador = Analizador()
+        resultados = {
+            "ORM en Python": medir(orm_en_python, 1),
+            "estancias() con LEAD": medir(
+                lambda _: distribucion(e.segundos for e in estancias()), 1
+            ),
+            "Analizador completo": medir(lambda _: analizador.actualizar(), 1),
+        }
+
+        siguiente = 1_700_000_000_000_000 + args.registros * 1_000_000
+        filas = [
+            {
+                "timestamp": siguiente + i * 1_000_000,
+                "accion": (
+                    "IN" if ((args.registros + i) // args.bicis) % 2 == 0 else "OUT"
+                ),
+                "num_serie": f"S{(args.registros + i) % args.bicis:08d}",
+                "dni_usuario": dni_sintetico(
+                    ((args.registros + i) % args.bicis) % args.usuarios
+                ),
+            }
+            for i in range(args.nuevos)
+        ]
+        with bd.crear_sesion() as sesion:
+            sesion.execute(insert(RegistroORM), filas)
+        resultados[f"Analizador +{args.nuevos}"] = medir(
+            lambda _: analizador.actualizar(), 1
+        )
+        bd.engine.dispose()
+
+    imprimir(resultados)
+    destino = guardar_resultados("analitica", vars(args), resultados, args.salida)
+    print(f"\nResultados guardados en {destino}")
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
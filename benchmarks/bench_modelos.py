@@ -0,0 +1,112 @@
+"""Benchmark de los caminos más usados de modelos y validadores.
+
+Crea una base de datos temporal con datos sintéticos del tamaño indicado y mide la
+primera carga de Usuario.bicis, Bici.guardar, Registro.guardar de entrada y salida,
+puede_entrar y la importación masiva de registros. Los resultados se guardan en JSON
+con el commit actual para comparar entre versiones.
+
+Uso:
+    python benchmarks/bench_modelos.py --usuarios 1000 --bicis 5000 --registros 1000000
+    python benchmarks/bench_modelos.py --comparar benchmarks/resultados/modelos-abc123.json
+"""
+
+import argparse
+import csv
+from datetime import datetime, timedelta
+from pathlib import Path
+import tempfile
+import time
+
+from comun import (
+    abrir_bd,
+    comparar,
+    dni_sintetico,
+    guardar_resultados,
+    imprimir,
+    medir,
+    poblar,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--bicis", type=int, default=5000)
+    parser.add_argument("--registros", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=500)
+    parser.add_argument(
+        "--importar", type=int, default=50000, help="Filas del csv de importación"
+    )
+    parser.add_argument("--salida", help="Ruta del JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+    n = args.repeticiones
+
+    with tempfile.TemporaryDirectory() as directorio:
+        bd = abrir_bd(str(Path(directorio) / "bench.db"))
+        from parking.data_utils.importador import importar_registros
+        from parking.data_utils.validators import puede_entrar
+        from parking.models.bici import Bici
+        from parking.models.registro import Registro
+        from parking.models.usuario import Usuario
+
+        inicio = time.perf_counter()
+        poblar(bd, args.usuarios, args.bicis, args.registros)
+        print(
+            f"Datos sintéticos: {args.usuarios} usuarios, {args.bicis} bicis, "
+            f"{args.registros} registros en {time.perf_counter() - inicio:.1f} s\n"
+        )
+
+        # Bicis nuevas para guardar y para las entradas y salidas, sin historial
+        dni = dni_sintetico(0)
+        nuevas = [f"N{i:08d}" for i in range(n)]
+        resultados = {
+            # Las bicis se cargan en el primer acceso, construir el Usuario no consulta nada
+            "Usuario.bicis": medir(
+                lambda i: Usuario(dni_sintetico(i % args.usuarios)).bicis, n
+            ),
+            "Bici.guardar": medir(
+                lambda i: Bici(nuevas[i], dni, "Marca", "Modelo").guardar(), n
+            ),
+            "Registro.guardar IN": medir(
+                lambda i: Registro("IN", nuevas[i], dni).guardar(), n
+            ),
+            "Registro.guardar OUT": medir(
+                lambda i: Registro("OUT", nuevas[i], dni).guardar(), n
+            ),
+            "puede_entrar": medir(lambda i: puede_entrar(f"S{i % args.bicis:08d}"), n),
+        }
+
+        # Importación: histórico nuevo de las bicis sintéticas, posterior al existente
+        ruta_csv = Path(directorio) / "registros.csv"
+        with open(ruta_csv, "w", newline="", encoding="utf-8") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(["timestamp", "accion", "num_serie", "dni_usuario"])
+            for i in range(args.importar):
+                bici = i % args.bicis
+                escritor.writerow(
+                    [
+                        # Un segundo distinto por fila: los eventos repetidos se ignoran
+                        f"{datetime(2030, 1, 1) + timedelta(seconds=i):%Y-%m-%d %H:%M:%S}",
+                        "IN" if (i // args.bicis) % 2 == 0 else "OUT",
+                        f"S{bici:08d}",
+                        dni_sintetico(bici % args.usuarios),
+                    ]
+                )
+        importacion = medir(lambda _: importar_registros(str(ruta_csv)), 1)
+        importacion["filas_por_s"] = round(
+            args.importar / (importacion["media_us"] / 1_000_000)
+        )
+        resultados["importar_registros"] = importacion
+        bd.engine.dispose()
+
+    imprimir(resultados)
+    print(f"importar_registros: {importacion['filas_por_s']} filas/s")
+    destino = guardar_resultados("modelos", vars(args), resultados, args.salida)
+    print(f"\nResultados guardados en {destino}")
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
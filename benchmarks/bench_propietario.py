@@ -0,0 +1,69 @@
+"""Benchmark de la comprobación de propietario para usuarios con muchas bicis (flotas).
+
+Compara cargar todas las bicis del usuario y buscar en la lista con una consulta de
+existencia por clave primaria y con la consulta de contexto que usa Registro.guardar.
+
+Uso:
+    python benchmarks/bench_propietario.py --bicis 20000 --repeticiones 500
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+
+from comun import abrir_bd, comparar, guardar_resultados, imprimir, medir, poblar
+
+DNI_FLOTA = "00000000T"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bicis", type=int, default=20000)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--salida", help="Ruta del JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        bd = abrir_bd(str(Path(directorio) / "bench.db"))
+        from sqlalchemy import exists
+
+        from parking.models.bd import BiciORM
+        from parking.models.registro import Registro
+        from parking.models.usuario import Usuario
+
+        # Un único usuario, la flota, dueño de todas las bicis
+        poblar(bd, usuarios=1, bicis=args.bicis, registros=0)
+        ultima = f"S{args.bicis - 1:08d}"
+        print(f"Usuario con {args.bicis} bicis, {args.repeticiones} repeticiones\n")
+
+        def es_propietario(_):
+            with bd.crear_sesion(escritura=False) as sesion:
+                consulta = exists().where(
+                    BiciORM.num_serie == ultima, BiciORM.dni_usuario == DNI_FLOTA
+                )
+                return bool(sesion.query(consulta).scalar())
+
+        def contexto(_):
+            with bd.crear_sesion(escritura=False) as sesion:
+                Registro("IN", ultima, DNI_FLOTA).consultar_contexto(sesion)
+
+        resultados = {
+            "lista de bicis (anterior)": medir(
+                lambda _: ultima in [b.num_serie for b in Usuario(DNI_FLOTA).bicis],
+                args.repeticiones,
+            ),
+            "es_propietario (exists)": medir(es_propietario, args.repeticiones),
+            "Registro.consultar_contexto": medir(contexto, args.repeticiones),
+        }
+        bd.engine.dispose()
+
+    imprimir(resultados)
+    destino = guardar_resultados("propietario", vars(args), resultados, args.salida)
+    print(f"\nResultados guardados en {destino}")
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Generador de carga que simula el tráfico de los tornos en hora punta.
+
+Crea una población de usuarios con una bici cada uno y reproduce sus entradas y salidas
+con la distribución de llegadas indicada, en tiempo real y con varios hilos (y procesos)
+a la vez, usando el camino real de Registro.guardar o EscritorRegistros sobre una base
+de datos temporal. Informa del rendimiento, la latencia p50/p95/p99 y los errores por
+bloqueo de la base de datos.
+
+Uso:
+    python benchmarks/carga.py --usuarios 2000 --duracion 30 --hilos 16
+    python benchmarks/carga.py --distribucion pico --salidas 0.3 --modo escritor
+    python benchmarks/carga.py --procesos 4 --hilos 8 --arranque fork
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from pathlib import Path
+import random
+import tempfile
+import threading
+import time
+
+from comun import abrir_bd, dni_sintetico, guardar_resultados, poblar
+
+DISTRIBUCIONES = ("poisson", "uniforme", "pico", "rafaga")
+CONTADORES = ("ok", "rechazados", "bloqueos", "errores_escritura")
+
+
+def generar_eventos(
+    usuarios: int,
+    duracion: float,
+    distribucion: str,
+    salidas: float,
+    estancia: float,
+    semilla: int,
+) -> list[tuple[float, str, str, str]]:
+    """
+    Genera la secuencia de eventos (segundo, accion, num_serie, dni) de la simulación.
+    Cada bici entra una vez y una fracción de ellas sale tras una estancia exponencial.
+
+    Args:
+        usuarios (int): Usuarios, cada uno con una bici
+        duracion (float): Segundos en los que llegan todas las bicis
+        distribucion (str): poisson (llegadas independientes), uniforme (a intervalos
+            fijos), pico (triangular con el máximo a mitad) o rafaga (todas a la vez)
+        salidas (float): Fracción de bicis que salen durante la simulación
+        estancia (float): Segundos medios entre entrada y salida
+        semilla (int): Semilla del generador aleatorio
+
+    Returns:
+        list[tuple[float, str, str, str]]: Eventos ordenados por segundo
+    """
+    azar = random.Random(semilla)
+    eventos = []
+    for bici in range(usuarios):
+        if distribucion == "poisson":
+            llegada = azar.uniform(0, duracion)
+        elif distribucion == "uniforme":
+            llegada = bici * duracion / usuarios
+        elif distribucion == "pico":
+            llegada = azar.triangular(0, duracion, duracion / 2)
+        else:
+            llegada = 0.0
+        serie, dni = f"S{bici:08d}", dni_sintetico(bici)
+        eventos.append((llegada, "IN", serie, dni))
+        if azar.random() < salidas:
+            salida = llegada + azar.expovariate(1 / estancia) if estancia else llegada
+            eventos.append((salida, "OUT", serie, dni))
+    eventos.sort()
+    return eventos
+
+
+def repartir(eventos: list, partes: int) -> list[list]:
+    """Reparte los eventos manteniendo todos los de una misma bici en la misma parte"""
+    repartidos: list[list] = [[] for _ in range(partes)]
+    for evento in eventos:
+        repartidos[int(evento[2][1:]) % partes].append(evento)
+    return repartidos
+
+
+def _ejecutar_hilo(eventos: list, inicio: float, modo: str, escritor, medidas: dict):
+    """Reproduce los eventos de un hilo respetando su momento programado"""
+    from sqlalchemy.exc import OperationalError
+
+    from parking.models.registro import Registro
+    from parking.models.resultado import CodigoError
+
+    latencias, retrasos, contadores = [], [], dict.fromkeys(CONTADORES, 0)
+    for segundo, accion, serie, dni in eventos:
+        espera = inicio + segundo - time.time()
+        if espera > 0:
+            time.sleep(espera)
+        retrasos.append(max(0.0, -espera))
+
+        empiece = time.perf_counter()
+        if modo == "escritor":
+            resultado = escritor.registrar(accion, serie, dni)
+        else:
+            resultado = Registro(accion, serie, dni).guardar()
+        latencias.append(time.perf_counter() - empiece)
+
+        excepcion = resultado.excepcion
+        if resultado.ok:
+            contadores["ok"] += 1
+        elif resultado.codigo is not CodigoError.ERROR_ESCRITURA:
+            contadores["rechazados"] += 1
+        elif isinstance(excepcion, OperationalError) and "locked" in str(excepcion):
+            contadores["bloqueos"] += 1
+        else:
+            contadores["errores_escritura"] += 1
+
+    with medidas["cerrojo"]:
+        medidas["latencias"].extend(latencias)
+        medidas["retrasos"].extend(retrasos)
+        for clave, valor in contadores.items():
+            medidas[clave] += valor
+
+
+def ejecutar_proceso(
+    ruta_bd: str, partes: list[list], inicio: float, modo: str
+) -> dict:
+    """
+    Abre la base de datos y reproduce cada parte de los eventos en su propio hilo.
+    Es la función que ejecuta cada proceso, o el principal si solo hay uno.
+
+    Returns:
+        dict: Latencias y retrasos en segundos y contadores de resultados
+    """
+    abrir_bd(ruta_bd)
+    from parking.models.escritor import EscritorRegistros
+
+    medidas = {"cerrojo": threading.Lock(), "latencias": [], "retrasos": []}
+    medidas.update(dict.fromkeys(CONTADORES, 0))
+    escritor = EscritorRegistros().iniciar() if modo == "escritor" else None
+    hilos = [
+        threading.Thread(
+            target=_ejecutar_hilo, args=(parte, inicio, modo, escritor, medidas)
+        )
+        for parte in partes
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    if escritor:
+        escritor.cerrar()
+    del medidas["cerrojo"]
+    return medidas
+
+
+def percentil(valores: list[float], p: float) -> float:
+    """Percentil p (0-100) de una lista ya ordenada"""
+    if not valores:
+        return 0.0
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=2000)
+    parser.add_argument(
+        "--historial", type=int, default=0, help="Registros previos en la base de datos"
+    )
+    parser.add_argument("--duracion", type=float, default=20.0, help="Segundos")
+    parser.add_argument("--distribucion", choices=DISTRIBUCIONES, default="poisson")
+    parser.add_argument("--salidas", type=float, default=0.0, help="Fracción 0-1")
+    parser.add_argument("--estancia", type=float, default=5.0, help="Segundos medios")
+    parser.add_argument("--hilos", type=int, default=8, help="Hilos por proceso")
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument(
+        "--arranque",
+        choices=multiprocessing.get_all_start_methods(),
+        default=(
+            "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        ),
+        help="Cómo se crean los procesos",
+    )
+    parser.add_argument("--modo", choices=("guardar", "escritor"), default="guardar")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--salida", help="Ruta del JSON de resultados")
+    args = parser.parse_args()
+
+    eventos = generar_eventos(
+        args.usuarios,
+        args.duracion,
+        args.distribucion,
+        args.salidas,
+        args.estancia,
+        args.semilla,
+    )
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_bd = str(Path(directorio) / "carga.db")
+        bd = abrir_bd(ruta_bd)
+        # Historial en múltiplos de dos vueltas para que todas las bicis acaben fuera
+        vuelta = 2 * args.usuarios
+        poblar(bd, args.usuarios, args.usuarios, -(-args.historial // vuelta) * vuelta)
+        bd.engine.dispose()
+
+        partes = repartir(eventos, args.procesos * args.hilos)
+        print(
+            f"{len(eventos)} eventos de {args.usuarios} usuarios en {args.duracion} s "
+            f"({args.distribucion}), {args.procesos} procesos x {args.hilos} hilos, "
+            f"modo {args.modo}"
+        )
+        inicio = time.time() + 1.0
+        if args.procesos == 1:
+            medidas = [ejecutar_proceso(ruta_bd, partes, inicio, args.modo)]
+        else:
+            # Con fork los hijos descartan el motor heredado y abren sus conexiones
+            contexto = multiprocessing.get_context(args.arranque)
+            inicio += 2.0
+            with ProcessPoolExecutor(args.procesos, mp_context=contexto) as procesos:
+                medidas = list(
+                    procesos.map(
+                        ejecutar_proceso,
+                        [ruta_bd] * args.procesos,
+                        [partes[i :: args.procesos] for i in range(args.procesos)],
+                        [inicio] * args.procesos,
+                        [args.modo] * args.procesos,
+                    )
+                )
+        total = time.time() - inicio
+
+    latencias = sorted(l for m in medidas for l in m["latencias"])
+    retrasos = sorted(r for m in medidas for r in m["retrasos"])
+    contadores = {c: sum(m[c] for m in medidas) for c in CONTADORES}
+    resultados = {
+        "eventos": len(eventos),
+        **contadores,
+        "segundos": round(total, 2),
+        "eventos_por_s": round(len(latencias) / total, 1),
+        "ok_por_s": round(contadores["ok"] / total, 1),
+        "latencia_ms": {
+            f"p{p}": round(percentil(latencias, p) * 1000, 2) for p in (50, 95, 99)
+        }
+        | {"max": round(latencias[-1] * 1000, 2) if latencias else 0.0},
+        "retraso_p95_ms": round(percentil(retrasos, 95) * 1000, 2),
+    }
+
+    print(
+        f"\nok {contadores['ok']}, rechazados {contadores['rechazados']}, "
+        f"bloqueos {contadores['bloqueos']}, "
+        f"otros errores de escritura {contadores['errores_escritura']}"
+    )
+    print(
+        f"{resultados['eventos_por_s']} eventos/s en {resultados['segundos']} s, "
+        f"latencia p50 {resultados['latencia_ms']['p50']} ms, "
+        f"p95 {resultados['latencia_ms']['p95']} ms, "
+        f"p99 {resultados['latencia_ms']['p99']} ms"
+    )
+    # Si el retraso crece el sistema no da abasto con el ritmo de llegadas
+    print(f"retraso p95 sobre lo programado {resultados['retraso_p95_ms']} ms")
+    destino = guardar_resultados("carga", vars(args), resultados, args.salida)
+    print(f"\nResultados guardados en {destino}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Utilidades compartidas por los benchmarks: base de datos temporal, datos sintéticos,
+medición de tiempos y resultados en JSON etiquetados con el commit"""
+
+from contextlib import redirect_stdout
+import io
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Optional
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "src"))
+from parking.models.bd import Bd
+
+# DNIs sintéticos con letra de control válida
+LETRAS_DNI = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+
+def dni_sintetico(numero: int) -> str:
+    """Devuelve un DNI válido a partir de un número"""
+    return f"{numero:08d}{LETRAS_DNI[numero % 23]}"
+
+
+def abrir_bd(ruta: str) -> Bd:
+    """
+    Apunta la base de datos principal a la ruta dada. Se debe llamar antes de la primera
+    consulta, los Bd() de los modelos son la misma instancia y no se conectan al importarse.
+    """
+    return Bd(ruta)
+
+
+def poblar(
+    bd: Bd, usuarios: int, bicis: int, registros: int, tam_lote: int = 50000
+) -> None:
+    """
+    Llena la base de datos con datos sintéticos y deja al día el estado y la ocupación.
+    Las bicis se reparten entre los usuarios y cada bici alterna IN y OUT.
+
+    Args:
+        bd (Bd): Base de datos vacía
+        usuarios (int): Número de usuarios
+        bicis (int): Número de bicis
+        registros (int): Número de registros del histórico
+        tam_lote (int, optional): Filas por executemany. Por defecto 50000.
+    """
+    from sqlalchemy import insert
+
+    from parking.models.bd import BiciORM, RegistroORM, UsuarioORM
+    from parking.models.estado import reconciliar_ocupacion, reconstruir_estado_bicis
+
+    with bd.crear_sesion() as sesion:
+        conexion = sesion.connection()
+        conexion.execute(
+            insert(UsuarioORM),
+            [
+                {"dni": dni_sintetico(u), "nombre": f"U{u}", "email": f"u{u}@x.es"}
+                for u in range(usuarios)
+            ],
+        )
+        conexion.execute(
+            insert(BiciORM),
+            [
+                {
+                    "num_serie": f"S{b:08d}",
+                    "dni_usuario": dni_sintetico(b % usuarios),
+                    "marca": "Marca",
+                    "modelo": "Modelo",
+                }
+                for b in range(bicis)
+            ],
+        )
+
+    inicio = 1_700_000_000_000_000
+    for desde in range(0, registros, tam_lote):
+        filas = []
+        for i in range(desde, min(desde + tam_lote, registros)):
+            bici = i % bicis
+            filas.append(
+                {
+                    "timestamp": inicio + i * 1_000_000,
+                    "accion": "IN" if (i // bicis) % 2 == 0 else "OUT",
+                    "num_serie": f"S{bici:08d}",
+                    "dni_usuario": dni_sintetico(bici % usuarios),
+                }
+            )
+        with bd.crear_sesion() as sesion:
+            sesion.connection().execute(insert(RegistroORM), filas)
+
+    with bd.crear_sesion() as sesion:
+        reconstruir_estado_bicis(sesion)
+        reconciliar_ocupacion(sesion, desde_registros=False)
+
+
+def medir(
+    funcion: Callable[[int], object], repeticiones: int, silencio: bool = True
+) -> dict:
+    """
+    Ejecuta funcion(i) para i en range(repeticiones) y devuelve estadísticas en microsegundos
+
+    Args:
+        funcion (Callable[[int], object]): Operación a medir, recibe el número de repetición
+        repeticiones (int): Veces que se ejecuta
+        silencio (bool, optional): Descarta lo que imprima la operación. Por defecto True.
+
+    Returns:
+        dict: n, media_us, p50_us, p95_us y max_us
+    """
+    tiempos = []
+    with redirect_stdout(io.StringIO() if silencio else sys.stdout):
+        for i in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion(i)
+            tiempos.append((time.perf_counter() - inicio) * 1_000_000)
+    tiempos.sort()
+    return {
+        "n": repeticiones,
+        "media_us": round(statistics.fmean(tiempos), 1),
+        "p50_us": round(tiempos[len(tiempos) // 2], 1),
+        "p95_us": round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 1),
+        "max_us": round(tiempos[-1], 1),
+    }
+
+
+def commit_actual() -> str:
+    """Devuelve el hash corto del commit actual, con -dirty si hay cambios sin guardar"""
+    try:
+        commit = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=RAIZ,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "desconocido"
+    return commit
+
+
+def guardar_resultados(
+    nombre: str, parametros: dict, resultados: dict, ruta: Optional[str] = None
+) -> Path:
+    """
+    Guarda los resultados en JSON junto al commit y los parámetros usados.
+    Por defecto en benchmarks/resultados/<nombre>-<commit>.json
+
+    Returns:
+        Path: Ruta del archivo escrito
+    """
+    commit = commit_actual()
+    destino = (
+        Path(ruta)
+        if ruta
+        else RAIZ / "benchmarks" / "resultados" / f"{nombre}-{commit}.json"
+    )
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    datos = {
+        "benchmark": nombre,
+        "commit": commit,
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "parametros": parametros,
+        "resultados": resultados,
+    }
+    destino.write_text(json.dumps(datos, indent=2, ensure_ascii=False), "utf-8")
+    return destino
+
+
+def comparar(actual: dict, ruta_anterior: str) -> None:
+    """Imprime la media de cada medida frente a la de un JSON anterior"""
+    anterior = json.loads(Path(ruta_anterior).read_text("utf-8"))
+    print(f"\nComparación con {anterior['commit']}:")
+    for nombre, medida in actual.items():
+        previa = anterior["resultados"].get(nombre)
+        if not previa:
+            print(f"  {nombre:<28} sin datos anteriores")
+            continue
+        cambio = medida["media_us"] / previa["media_us"] if previa["media_us"] else 0
+        print(
+            f"  {nombre:<28} {previa['media_us']:>10.1f} -> "
+            f"{medida['media_us']:>10.1f} us  x{cambio:.2f}"
+        )
+
+
+def imprimir(resultados: dict) -> None:
+    """Imprime una tabla con las medidas"""
+    print(f"{'operación':<30}{'media':>10}{'p50':>10}{'p95':>10}{'max':>10}  (us)")
+    for nombre, m in resultados.items():
+        print(
+            f"{nombre:<30}{m['media_us']:>10.1f}{m['p50_us']:>10.1f}"
+            f"{m['p95_us']:>10.1f}{m['max_us']:>10.1f}"
+        )
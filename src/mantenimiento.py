@@ -0,0 +1,279 @@
+"""Comandos de mantenimiento de la base de datos, se lanzan desde la carpeta src"""
+
+import argparse
+import os
+
+from parking.config import ARCHIVO, TAM_LOTE_IMPORTACION  # pragma: no cover
+from parking.data_utils.analitica import Analizador  # pragma: no cover
+from parking.data_utils.archivo import archivar_registros  # pragma: no cover
+from parking.data_utils.exportador import exportar_registros_csv  # pragma: no cover
+from parking.data_utils.historial import (
+    PosicionHistorial,
+    historial_bici,
+    historial_usuario,
+)  # pragma: no cover
+from parking.data_utils.importador import (
+    importar_bicis,
+    importar_registros,
+    importar_usuarios,
+)  # pragma: no cover
+from parking.data_utils.tiempo import (
+    microsegundos_a_texto,
+    texto_a_microsegundos,
+)  # pragma: no cover
+from parking.models.bd import Bd  # pragma: no cover
+from parking.models.estado import (
+    reconciliar_ocupacion,
+    reconstruir_estado_bicis,
+)  # pragma: no cover
+from parking.models.resumenes import (
+    DIAS_POR_LOTE,
+    actualizar_resumenes,
+    reconstruir_resumenes,
+    resumen_dias,
+)  # pragma: no cover
+
+
+def comando_reconstruir_estado(args: argparse.Namespace) -> None:  # pragma: no cover
+    """Recalcula la tabla de estado de las bicis y la ocupación a partir de los registros"""
+    with Bd().crear_sesion() as sesion:
+        total = reconstruir_estado_bicis(sesion)
+        dentro = reconciliar_ocupacion(sesion)
+    print(f"OK: estado reconstruido para {total} bicis, {dentro} dentro del parking")
+
+
+def comando_importar(args: argparse.Namespace) -> None:  # pragma: no cover
+    """Importa un csv de usuarios, bicis o registros"""
+    importadores = {
+        "usuarios": importar_usuarios,
+        "bicis": importar_bicis,
+        "registros": importar_registros,
+    }
+    resultado = importadores[args.tipo](args.ruta, args.lote)
+    for linea, error in resultado.errores:
+        print(f"ERROR: línea {linea}: {error}")
+    print(
+        f"OK: {resultado.insertadas} filas importadas de {resultado.leidas}, "
+        f"{resultado.rechazadas} rechazadas"
+    )
+
+
+def comando_exportar(args: argparse.Namespace) -> None:  # pragma: no cover
+    """Exporta los registros a csv, continuando desde la marca si se indica"""
+    despues_de_id = 0
+    if args.marca and os.path.exists(args.marca):
+        with open(args.marca, encoding="utf-8") as archivo:
+            despues_de_id = int(archivo.read().strip() or 0)
+
+    resultado = exportar_registros_csv(
+        args.ruta,
+        desde=texto_a_microsegundos(args.desde) if args.desde else None,
+        hasta=texto_a_microsegundos(args.hasta) if args.hasta else None,
+        despues_de_id=despues_de_id,
+        anexar=args.anexar,
+    )
+
+    if args.marca:
+        with open(args.marca, "w", encoding="utf-8") as archivo:
+            archivo.write(str(resultado.ultimo_id))
+    print(
+        f"OK: {resultado.filas} registros exportados, último id {resultado.ultimo_id}"
+    )
+
+
+def comando_historial(args: argparse.Namespace) -> None:  # pragma: no cover
+    """Muestra una página del histórico de una bici o de un usuario"""
+    despues_de = None
+    if args.despues_de:
+        timestamp, id_registro = args.despues_de.split(",")
+        despues_de = PosicionHistorial(int(timestamp), int(id_registro))
+    consulta = historial_bici if args.bici else historial_usuario
+    pagina = consulta(
+        args.bici or args.usuario,
+        args.limite,
+        despues_de,
+        desde=texto_a_microsegundos(args.desde) if args.desde else None,
+        hasta=texto_a_microsegundos(args.hasta) if args.hasta else None,
+        incluir_archivo=args.archivo,
+        carpeta_archivo=args.carpeta,
+    )
+    for evento in pagina.eventos:
+        print(
+            f"{microsegundos_a_texto(evento.timestamp)} {evento.accion:<3} "
+            f"{evento.num_serie} {evento.dni_usuario}"
+        )
+    if pagina.siguiente:
+        print(
+            f"Siguiente página: --despues-de {pagina.siguiente.timestamp},{pagina.siguiente.id}"
+        )
+
+
+def comando_analitica(args: argparse.Namespace) -> None:  # pragma: no cover
+    """Resume la duración de las estancias, las horas con más ocupación y los usuarios con más usos"""
+    analizador = Analizador.cargar()
+    analizador.actualizar()
+    analizador.guardar()
+    resumen = analizador.distribucion_estancias()
+    print(
+        f"Estancias: {resumen.cuenta}, media {resumen.media / 60:.1f} min, "
+        f"máxima {resumen.maximo / 60:.1f} min"
+    )
+    for limite, cuenta in resumen.cubos:
+        etiqueta = f"<= {limite // 60} min" if limite else "más"
+        print(f"  {etiqueta:>12}: {cuenta}")
+
+    desde = texto_a_microsegundos(args.desde) if args.desde else None
+    hasta = texto_a_microsegundos(args.hasta) if args.hasta else None
+    curva = analizador.ocupacion_por_hora(desde, hasta)
+    print("Horas con más ocupación:")
+    for hora in sorted(curva, key=lambda h: h.pico, reverse=True)[: args.top]:
+        print(f"  {microsegundos_a_texto(hora.hora)}: {hora.pico} bicis")
+    print("Usuarios con más usos:")
+    for dni, usos in analizador.usos_por_usuario.most_common(args.top):
+        print(f"  {dni}: {usos}")
+
+
+def comando_resumenes(args: argparse.Namespace) -> None:  # pragma: no cover
+    """Pone al día los resúmenes por hora y día, o los reconstruye desde el histórico"""
+    if args.reconstruir:
+        dias = reconstruir_resumenes(args.lote)
+        print(f"OK: resúmenes reconstruidos para {dias} días")
+    else:
+        nuevos = actualizar_resumenes()
+        print(f"OK: {nuevos} registros nuevos resumidos")
+    if args.desde:
+        for dia in resumen_dias(args.desde, args.hasta or args.desde):
+            print(
+                f"  {dia.periodo}: {dia.entradas} entradas, {dia.salidas} salidas, "
+                f"{dia.bicis} bicis, {dia.usuarios} usuarios, pico {dia.pico}, "
+                f"quedan {dia.final}"
+            )
+
+
+def comando_archivar(args: argparse.Namespace) -> None:  # pragma: no cover
+    """Mueve los registros antiguos a un archivo por mes"""
+    resultado = archivar_registros(
+        args.meses,
+        args.carpeta,
+        antes_de=texto_a_microsegundos(args.antes_de) if args.antes_de else None,
+        compactar_bd=args.compactar,
+    )
+    for ruta in resultado.archivos:
+        print(f"  {ruta}")
+    print(
+        f"OK: {resultado.movidos} registros archivados anteriores a "
+        f"{microsegundos_a_texto(resultado.corte)}"
+    )
+
+
+def crear_parser() -> argparse.ArgumentParser:  # pragma: no cover
+    """Devuelve el parser de argumentos con todos los comandos disponibles"""
+    parser = argparse.ArgumentParser(description="Mantenimiento de Bike Parking")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    reconstruir = comandos.add_parser(
+        "reconstruir-estado",
+        help="Recalcula el estado de cada bici y la ocupación desde la tabla de registros",
+    )
+    reconstruir.set_defaults(funcion=comando_reconstruir_estado)
+
+    importar = comandos.add_parser(
+        "importar", help="Importa por lotes un csv de usuarios, bicis o registros"
+    )
+    importar.add_argument("tipo", choices=["usuarios", "bicis", "registros"])
+    importar.add_argument("ruta", help="Ruta al archivo csv")
+    importar.add_argument(
+        "--lote", type=int, default=TAM_LOTE_IMPORTACION, help="Filas por lote"
+    )
+    importar.set_defaults(funcion=comando_importar)
+
+    exportar = comandos.add_parser(
+        "exportar", help="Exporta el histórico de registros a csv en streaming"
+    )
+    exportar.add_argument("ruta", help="Ruta del csv de salida")
+    exportar.add_argument("--desde", help="Fecha inicial incluida, YYYY-MM-DD HH:MM:SS")
+    exportar.add_argument("--hasta", help="Fecha final excluida, YYYY-MM-DD HH:MM:SS")
+    exportar.add_argument(
+        "--marca",
+        help="Archivo con el último id exportado, se lee al empezar y se actualiza al terminar",
+    )
+    exportar.add_argument(
+        "--anexar", action="store_true", help="Añade al csv en vez de sobrescribirlo"
+    )
+    exportar.set_defaults(funcion=comando_exportar)
+
+    historial = comandos.add_parser(
+        "historial", help="Muestra por páginas el histórico de una bici o un usuario"
+    )
+    quien = historial.add_mutually_exclusive_group(required=True)
+    quien.add_argument("--bici", help="Número de serie, los últimos eventos primero")
+    quien.add_argument("--usuario", help="DNI, los eventos en orden cronológico")
+    historial.add_argument(
+        "--desde", help="Fecha inicial incluida, YYYY-MM-DD HH:MM:SS"
+    )
+    historial.add_argument("--hasta", help="Fecha final excluida, YYYY-MM-DD HH:MM:SS")
+    historial.add_argument("--limite", type=int, default=50, help="Eventos por página")
+    historial.add_argument(
+        "--despues-de", help="Posición timestamp,id que indica la página anterior"
+    )
+    historial.add_argument(
+        "--archivo", action="store_true", help="Busca también en los meses archivados"
+    )
+    historial.add_argument(
+        "--carpeta", default=ARCHIVO["carpeta"], help="Carpeta de los meses archivados"
+    )
+    historial.set_defaults(funcion=comando_historial)
+
+    analitica = comandos.add_parser(
+        "analitica",
+        help="Resume duración de estancias, ocupación por hora y usos por usuario",
+    )
+    analitica.add_argument(
+        "--desde", help="Primera hora de la curva, YYYY-MM-DD HH:MM:SS"
+    )
+    analitica.add_argument("--hasta", help="Hora final excluida, YYYY-MM-DD HH:MM:SS")
+    analitica.add_argument("--top", type=int, default=10, help="Filas de cada ranking")
+    analitica.set_defaults(funcion=comando_analitica)
+
+    resumenes = comandos.add_parser(
+        "resumenes",
+        help="Actualiza los resúmenes por hora y día con los registros nuevos",
+    )
+    resumenes.add_argument(
+        "--reconstruir",
+        action="store_true",
+        help="Recalcula los resúmenes de todo el histórico por lotes de días",
+    )
+    resumenes.add_argument(
+        "--lote", type=int, default=DIAS_POR_LOTE, help="Días por transacción"
+    )
+    resumenes.add_argument("--desde", help="Muestra los días desde YYYY-MM-DD")
+    resumenes.add_argument("--hasta", help="Último día mostrado, YYYY-MM-DD")
+    resumenes.set_defaults(funcion=comando_resumenes)
+
+    archivar = comandos.add_parser(
+        "archivar", help="Mueve los registros antiguos a un SQLite por mes"
+    )
+    archivar.add_argument(
+        "--meses",
+        type=int,
+        default=ARCHIVO["meses"],
+        help="Meses completos que se quedan en la base de datos",
+    )
+    archivar.add_argument(
+        "--antes-de", help="Corte explícito, se redondea al inicio de su mes"
+    )
+    archivar.add_argument(
+        "--carpeta", default=ARCHIVO["carpeta"], help="Carpeta de los archivos por mes"
+    )
+    archivar.add_argument(
+        "--compactar", action="store_true", help="Ejecuta VACUUM al terminar"
+    )
+    archivar.set_defaults(funcion=comando_archivar)
+
+    return parser
+
+
+if __name__ == "__main__":  # pragma: no cover
+    args = crear_parser().parse_args()
+    args.funcion(args)
@@ -15,6 +15,94 @@ CABECERA_REGISTROS = "timestamp,accion,num_serie,dni_usuario"
 
 TIMESTAMP_FMT = "%Y-%m-%d %H:%M:%S"
 
+# Filas por lote al importar CSVs, cada lote se inserta con un único executemany
+TAM_LOTE_IMPORTACION = 5000
+
+# Perfil del motor de SQLite: pragmas que se aplican a cada conexión nueva, tipo de
+# BEGIN de las sesiones de escritura y tamaño del pool de conexiones.
+# Con WAL los lectores no bloquean al escritor, y BEGIN IMMEDIATE hace que los
+# escritores esperen su turno (busy_timeout) en vez de fallar con "database is locked"
+PERFIL_BD = {
+    "pragmas": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,  # milisegundos
+        "cache_size": -16000,  # negativo = KiB, unos 16 MB
+        "mmap_size": 134217728,  # 128 MB
+        "temp_store": "MEMORY",
+    },
+    "begin_escritura": "IMMEDIATE",
+    "pool": {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+    },
+}
+
+# Número máximo de bicis dentro del parking, None para no limitar. Registro.es_permitido
+# rechaza las entradas cuando el contador de ocupación llega a este valor
+CAPACIDAD_MAXIMA = None
+
+# Caché en memoria de es_dni_unico, es_email_unico y es_serie_unica, por base de datos.
+# Los modelos la invalidan al escribir, pero no ven las escrituras de otros procesos y
+# los registros y altas ya no la usan, así que está desactivada por defecto
+CACHE_VALIDACIONES = {
+    "activa": False,
+    "tam_maximo": 4096,  # entradas
+    "ttl": 30.0,  # segundos
+}
+
+# Commits agrupados de EscritorRegistros: tras el primer evento se espera "ventana"
+# segundos a que lleguen más, hasta "tam_maximo" eventos por transacción
+GRUPO_ESCRITURA = {
+    "ventana": 0.005,
+    "tam_maximo": 500,
+}
+
+# Instrumentación del acceso a la base de datos (models/instrumentacion.py). Si está
+# activa, cada "intervalo" segundos se escribe una línea de log con las sesiones y
+# sentencias por operación y, si se indica, el archivo de texto para Prometheus
+INSTRUMENTACION = {
+    "activa": False,
+    "intervalo": 60,  # segundos
+    "archivo_prometheus": None,  # por ejemplo "data/parking.prom"
+}
+
+# Resúmenes por hora y día (models/resumenes.py). Si están activos, el servicio los pone
+# al día cada "intervalo" segundos con los registros nuevos desde la última vez
+RESUMENES = {
+    "activos": True,
+    "intervalo": 60,  # segundos
+}
+
+# Archivo de registros antiguos (data_utils/archivo.py): los registros de los meses
+# anteriores a los últimos "meses" se mueven a un SQLite por mes dentro de "carpeta"
+ARCHIVO = {
+    "carpeta": f"{DATA_DIR}/archivo",
+    "meses": 12,
+}
+
+# Analítica incremental (data_utils/analitica.py). Los eventos de los últimos "retraso"
+# segundos esperan por si se guarda después alguno con fecha anterior, que se coloca en
+# su hora sin recalcular; la curva de ocupación conserva solo las últimas "horas"
+ANALITICA = {
+    "retraso": 300,  # segundos
+    "horas": 24 * 31,
+}
+
+# Instantánea de solo lectura (models/instantanea.py) para la analítica, las
+# exportaciones y el historial. Si está activa se rehace cada "intervalo" segundos con
+# la API de backup de SQLite y esas consultas pueden ir hasta ese tiempo por detrás
+INSTANTANEA = {
+    "activa": False,
+    "ruta": f"{DATA_DIR}/bd_lectura.db",
+    "intervalo": 300,  # segundos
+}
+
+# Dirección TCP por defecto del servicio para tornos (servidor.py)
+HOST_SERVICIO = "127.0.0.1"
+PUERTO_SERVICIO = 8765
+
 TITULO = "BIKE PARKING"
 
 OPCIONES = [
@@ -0,0 +1,469 @@
+"""Analítica del histórico: duración de las estancias, ocupación por hora y usos por usuario.
+Una estancia es una entrada seguida de una salida de la misma bici. Para consultas
+puntuales estancias() las empareja en SQLite con LEAD sobre (num_serie, timestamp); para
+informes que se repiten, Analizador guarda las estancias abiertas y la ocupación y en cada
+actualización solo lee los registros con id posterior al último procesado, como tuplas
+y por lotes, sin objetos del ORM. Los registros que llegan con algo de retraso se colocan
+en su hora sin recalcular y la curva por horas solo guarda las más recientes. Su estado se guarda en la tabla analitica para que
+cada ejecución siga donde lo dejó la anterior. Los registros anteriores al corte del
+archivo no se leen: la ocupación de partida es el final de la última hora resumida."""
+
+from collections import Counter
+import heapq
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import and_, func, select
+
+from parking.config import ANALITICA, TAM_LOTE_IMPORTACION
+from parking.models.bd import AnaliticaORM, Bd, RegistroORM, ResumenHoraORM
+from parking.models.resumenes import MARCA_ARCHIVO, leer_marca
+
+bd = Bd()
+
+HORA = 3_600_000_000
+# Nombre con el que se guarda por defecto el estado del Analizador
+ANALIZADOR = "analizador"
+# Límites superiores de los cubos de duración de las estancias, en segundos
+CUBOS_ESTANCIA = (300, 900, 1800, 3600, 7200, 14400, 28800, 86400)
+
+
+class Estancia(NamedTuple):
+    """Entrada y salida emparejadas de una bici, en microsegundos desde epoch"""
+
+    num_serie: str
+    dni_usuario: str
+    entrada: int
+    salida: int
+
+    @property
+    def segundos(self) -> float:
+        return (self.salida - self.entrada) / 1_000_000
+
+
+class DistribucionEstancias(NamedTuple):
+    """Resumen de duraciones: cuenta, media y máximo en segundos y estancias por cubo"""
+
+    cuenta: int
+    media: float
+    maximo: float
+    # (límite superior en segundos o None para el último, estancias en el cubo)
+    cubos: list[tuple[Optional[int], int]]
+
+
+class OcupacionHora(NamedTuple):
+    """Bicis dentro durante una hora en punto: la máxima y la que queda al acabar"""
+
+    hora: int
+    pico: int
+    final: int
+
+
+def _cubo(segundos: float) -> int:
+    for i, limite in enumerate(CUBOS_ESTANCIA):
+        if segundos <= limite:
+            return i
+    return len(CUBOS_ESTANCIA)
+
+
+def distribucion(segundos: Iterable[float]) -> DistribucionEstancias:
+    """
+    Agrupa duraciones de estancias en los cubos de CUBOS_ESTANCIA
+
+    Args:
+        segundos (Iterable[float]): Duración de cada estancia
+
+    Returns:
+        DistribucionEstancias: Resumen de las duraciones
+    """
+    cubos = [0] * (len(CUBOS_ESTANCIA) + 1)
+    cuenta, suma, maximo = 0, 0.0, 0.0
+    for duracion in segundos:
+        cubos[_cubo(duracion)] += 1
+        cuenta += 1
+        suma += duracion
+        maximo = max(maximo, duracion)
+    return DistribucionEstancias(
+        cuenta,
+        suma / cuenta if cuenta else 0.0,
+        maximo,
+        list(zip((*CUBOS_ESTANCIA, None), cubos)),
+    )
+
+
+def estancias(
+    desde: Optional[int] = None,
+    hasta: Optional[int] = None,
+    base: Optional[Bd] = None,
+) -> list[Estancia]:
+    """
+    Empareja en una consulta cada entrada con el siguiente evento de su bici usando LEAD.
+    Solo cuentan las entradas cuyo siguiente evento es una salida.
+
+    Args:
+        desde (Optional[int]): Solo entradas con timestamp >= desde, en microsegundos
+        hasta (Optional[int]): Solo entradas con timestamp < hasta, en microsegundos
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
+
+    Returns:
+        list[Estancia]: Estancias ordenadas por bici y entrada
+    """
+    base = bd if base is None else base
+    ventana = {
+        "partition_by": RegistroORM.num_serie,
+        "order_by": (RegistroORM.timestamp, RegistroORM.id),
+    }
+    eventos = select(
+        RegistroORM.num_serie,
+        RegistroORM.dni_usuario,
+        RegistroORM.accion,
+        RegistroORM.timestamp,
+        func.lead(RegistroORM.accion).over(**ventana).label("siguiente_accion"),
+        func.lead(RegistroORM.timestamp).over(**ventana).label("siguiente_timestamp"),
+    ).subquery()
+
+    condiciones = [eventos.c.accion == "IN", eventos.c.siguiente_accion == "OUT"]
+    if desde is not None:
+        condiciones.append(eventos.c.timestamp >= desde)
+    if hasta is not None:
+        condiciones.append(eventos.c.timestamp < hasta)
+    consulta = (
+        select(
+            eventos.c.num_serie,
+            eventos.c.dni_usuario,
+            eventos.c.timestamp,
+            eventos.c.siguiente_timestamp,
+        )
+        .where(and_(*condiciones))
+        .order_by(eventos.c.num_serie, eventos.c.timestamp)
+    )
+    with base.crear_sesion_lectura() as sesion:
+        return [Estancia(*fila) for fila in sesion.execute(consulta)]
+
+
+class _Acumulado:
+    """
+    Parte del estado de Analizador que depende del orden de los eventos: estancias
+    abiertas, duraciones, ocupación y curva por horas. Solo se le aplican eventos en
+    orden de timestamp.
+    """
+
+    def __init__(self) -> None:
+        self.timestamp = 0
+        self.ocupadas = 0
+        self.abiertas: dict[str, int] = {}
+        self.cubos = [0] * (len(CUBOS_ESTANCIA) + 1)
+        self.cuenta = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+        self.horas: dict[int, tuple[int, int]] = {}
+        # True si ya se han descartado horas antiguas de la curva
+        self.podada = False
+
+    def copia(self) -> "_Acumulado":
+        copia = _Acumulado()
+        copia.__dict__.update(self.__dict__)
+        copia.abiertas = dict(self.abiertas)
+        copia.cubos = list(self.cubos)
+        copia.horas = dict(self.horas)
+        return copia
+
+    def procesar(self, timestamp: int, accion: str, num_serie: str) -> None:
+        """Empareja el evento con la entrada abierta de su bici y actualiza la ocupación"""
+        previas = self.ocupadas
+        if accion == "IN":
+            self.abiertas[num_serie] = timestamp
+            self.ocupadas += 1
+        else:
+            entrada = self.abiertas.pop(num_serie, None)
+            if entrada is not None:
+                segundos = (timestamp - entrada) / 1_000_000
+                self.cubos[_cubo(segundos)] += 1
+                self.cuenta += 1
+                self.suma += segundos
+                self.maximo = max(self.maximo, segundos)
+            # Sin negativos aunque falte la entrada, por ejemplo si quedó en el archivo
+            self.ocupadas = max(self.ocupadas - 1, 0)
+
+        # El pico de la hora cuenta también las bicis que ya estaban al empezar
+        hora = timestamp - timestamp % HORA
+        pico, _ = self.horas.get(hora, (previas, previas))
+        self.horas[hora] = (max(pico, self.ocupadas), self.ocupadas)
+        self.timestamp = timestamp
+
+    def podar(self, horas: int) -> None:
+        """Descarta de la curva las horas anteriores a las últimas `horas`"""
+        limite = self.timestamp - self.timestamp % HORA - (horas - 1) * HORA
+        # Las horas se añaden en orden, las más antiguas van primero
+        while self.horas and next(iter(self.horas)) < limite:
+            del self.horas[next(iter(self.horas))]
+            self.podada = True
+
+
+class Analizador:
+    """
+    Analítica incremental del histórico. Cada llamada a actualizar lee solo los registros
+    con id nuevo. Como el timestamp se toma antes de esperar al cerrojo de escritura, con
+    varios tornos los registros no se guardan exactamente en orden de fecha: los eventos
+    de los últimos `retraso` segundos quedan pendientes y se aplican en orden cuando salen
+    de esa ventana, así un registro que llega algo tarde se coloca en su hora sin recalcular
+    nada. Solo si llega uno anterior a lo ya aplicado (por ejemplo un lote de un torno sin
+    conexión) se vuelve a calcular todo para no falsear los datos.
+    """
+
+    def __init__(
+        self,
+        tam_lote: int = TAM_LOTE_IMPORTACION,
+        nombre: str = ANALIZADOR,
+        base: Optional[Bd] = None,
+        retraso: float = ANALITICA["retraso"],
+        horas: int = ANALITICA["horas"],
+    ) -> None:
+        """
+        Args:
+            tam_lote (int, optional): Registros leídos por lote. Por defecto TAM_LOTE_IMPORTACION.
+            nombre (str, optional): Nombre con el que se guarda su estado. Por defecto ANALIZADOR.
+            base (Optional[Bd]): Base de datos analizada. Por defecto la principal.
+            retraso (float, optional): Segundos que un evento queda pendiente por si llegan otros anteriores. Por defecto ANALITICA["retraso"].
+            horas (int, optional): Horas de la curva de ocupación que se conservan. Por defecto ANALITICA["horas"].
+        """
+        self.tam_lote = tam_lote
+        self.nombre = nombre
+        self.base = base
+        self.retraso = int(retraso * 1_000_000)
+        self.horas = horas
+        self.reconstrucciones = 0
+        self.reiniciar()
+
+    @property
+    def _bd(self) -> Bd:
+        return bd if self.base is None else self.base
+
+    @classmethod
+    def cargar(
+        cls,
+        nombre: str = ANALIZADOR,
+        tam_lote: int = TAM_LOTE_IMPORTACION,
+        base: Optional[Bd] = None,
+    ) -> "Analizador":
+        """
+        Crea un analizador con el estado guardado con ese nombre, o vacío si no hay
+
+        Args:
+            nombre (str, optional): Nombre del estado guardado. Por defecto ANALIZADOR.
+            tam_lote (int, optional): Registros leídos por lote. Por defecto TAM_LOTE_IMPORTACION.
+            base (Optional[Bd]): Base de datos analizada. Por defecto la principal.
+
+        Returns:
+            Analizador: Analizador listo para actualizar
+        """
+        analizador = cls(tam_lote, nombre, base)
+        # Sin instantánea: la copia puede tener un estado más viejo
+        with analizador._bd.crear_sesion(escritura=False) as sesion:
+            fila = sesion.get(AnaliticaORM, nombre)
+            datos = None if fila is None else fila.datos
+        if datos is not None:
+            analizador._restaurar(datos)
+        return analizador
+
+    def guardar(self) -> None:
+        """Guarda el estado para que la próxima ejecución siga desde ultimo_id"""
+        firme = self._firme
+        datos = {
+            "ultimo_id": self.ultimo_id,
+            "ultimo_timestamp": self.ultimo_timestamp,
+            "corte": self.corte,
+            "usos_por_usuario": dict(self.usos_por_usuario),
+            "pendientes": [list(evento) for evento in self._pendientes],
+            "aplicado": firme.timestamp,
+            "ocupadas": firme.ocupadas,
+            "abiertas": firme.abiertas,
+            "cubos": firme.cubos,
+            "cuenta": firme.cuenta,
+            "suma": firme.suma,
+            "maximo": firme.maximo,
+            "horas": [[hora, *valores] for hora, valores in firme.horas.items()],
+            "podada": firme.podada,
+        }
+        with self._bd.crear_sesion() as sesion:
+            sesion.merge(AnaliticaORM(self.nombre, datos))
+
+    def _restaurar(self, datos: dict) -> None:
+        self.ultimo_id = datos["ultimo_id"]
+        self.ultimo_timestamp = datos["ultimo_timestamp"]
+        self.corte = datos["corte"]
+        self.usos_por_usuario = Counter(datos["usos_por_usuario"])
+        # Los estados guardados antes de la ventana de retraso no tienen pendientes
+        self._pendientes = [tuple(evento) for evento in datos.get("pendientes", [])]
+        heapq.heapify(self._pendientes)
+        firme = self._firme
+        firme.timestamp = datos.get("aplicado", self.ultimo_timestamp)
+        firme.ocupadas = datos["ocupadas"]
+        firme.abiertas = datos["abiertas"]
+        firme.cubos = datos["cubos"]
+        firme.cuenta = datos["cuenta"]
+        firme.suma = datos["suma"]
+        firme.maximo = datos["maximo"]
+        firme.horas = {hora: (pico, final) for hora, pico, final in datos["horas"]}
+        firme.podada = datos.get("podada", False)
+        self._vista = None
+
+    def reiniciar(self) -> None:
+        """Descarta lo calculado, la siguiente actualización empieza desde el corte del archivo"""
+        self.ultimo_id = 0
+        # Timestamp más reciente leído, aplicado o pendiente
+        self.ultimo_timestamp = 0
+        # Corte del archivo al empezar, None hasta la primera actualización
+        self.corte: Optional[int] = None
+        self.usos_por_usuario: Counter[str] = Counter()
+        # Montículo de eventos (timestamp, id, accion, num_serie) dentro de la ventana
+        self._pendientes: list[tuple[int, int, str, str]] = []
+        # Eventos ya aplicados en orden y el resultado con los pendientes, que se calcula al consultarlo
+        self._firme = _Acumulado()
+        self._vista: Optional[_Acumulado] = None
+
+    def actualizar(self) -> int:
+        """
+        Procesa los registros con id mayor que ultimo_id
+
+        Returns:
+            int: Registros procesados
+        """
+        with self._bd.crear_sesion_lectura() as sesion:
+            if self.corte is None:
+                self._empezar(sesion)
+            procesados = self._leer(sesion)
+            if procesados is None:
+                self.reiniciar()
+                self._empezar(sesion)
+                self.reconstrucciones += 1
+                procesados = self._leer(sesion)
+
+        self._firme.podar(self.horas)
+        self._vista = None
+        return procesados
+
+    def _leer(self, sesion) -> Optional[int]:
+        """
+        Lee los registros nuevos y aplica los pendientes que salen de la ventana
+
+        Returns:
+            Optional[int]: Registros leídos, None si alguno es anterior a lo ya aplicado
+        """
+        consulta = (
+            select(
+                RegistroORM.id,
+                RegistroORM.timestamp,
+                RegistroORM.accion,
+                RegistroORM.num_serie,
+                RegistroORM.dni_usuario,
+            )
+            .where(
+                RegistroORM.id > self.ultimo_id,
+                RegistroORM.timestamp >= self.corte,
+            )
+            .order_by(RegistroORM.timestamp, RegistroORM.id)
+            .execution_options(yield_per=self.tam_lote)
+        )
+        procesados = 0
+        for lote in sesion.execute(consulta).partitions():
+            for id_registro, timestamp, accion, num_serie, dni in lote:
+                if timestamp < self._firme.timestamp:
+                    return None
+                heapq.heappush(
+                    self._pendientes, (timestamp, id_registro, accion, num_serie)
+                )
+                if accion == "IN":
+                    self.usos_por_usuario[dni] += 1
+                self.ultimo_id = max(self.ultimo_id, id_registro)
+                self.ultimo_timestamp = max(self.ultimo_timestamp, timestamp)
+            procesados += len(lote)
+            # Por lotes para que la primera lectura no acumule todo el histórico
+            self._aplicar(self.ultimo_timestamp - self.retraso)
+        return procesados
+
+    def _aplicar(self, hasta: int) -> None:
+        """Aplica en orden los eventos pendientes con timestamp anterior a `hasta`"""
+        while self._pendientes and self._pendientes[0][0] < hasta:
+            timestamp, _, accion, num_serie = heapq.heappop(self._pendientes)
+            self._firme.procesar(timestamp, accion, num_serie)
+
+    def _empezar(self, sesion) -> None:
+        """
+        Toma el corte del archivo y las bicis que había dentro en ese momento según los
+        resúmenes por hora, que se conservan para los meses archivados
+        """
+        self.corte = leer_marca(sesion, MARCA_ARCHIVO)
+        if self.corte:
+            self._firme.ocupadas = (
+                sesion.execute(
+                    select(ResumenHoraORM.final)
+                    .where(ResumenHoraORM.hora < self.corte)
+                    .order_by(ResumenHoraORM.hora.desc())
+                    .limit(1)
+                ).scalar()
+                or 0
+            )
+
+    def _actual(self) -> _Acumulado:
+        """Lo aplicado más los eventos pendientes, sin sacarlos de la ventana"""
+        if self._vista is None:
+            self._vista = self._firme.copia()
+            for timestamp, _, accion, num_serie in sorted(self._pendientes):
+                self._vista.procesar(timestamp, accion, num_serie)
+        return self._vista
+
+    @property
+    def ocupadas(self) -> int:
+        """Bicis dentro tras el último registro leído"""
+        return self._actual().ocupadas
+
+    def distribucion_estancias(self) -> DistribucionEstancias:
+        """
+        Returns:
+            DistribucionEstancias: Duración de las estancias cerradas hasta ahora
+        """
+        actual = self._actual()
+        return DistribucionEstancias(
+            actual.cuenta,
+            actual.suma / actual.cuenta if actual.cuenta else 0.0,
+            actual.maximo,
+            list(zip((*CUBOS_ESTANCIA, None), actual.cubos)),
+        )
+
+    def ocupacion_por_hora(
+        self, desde: Optional[int] = None, hasta: Optional[int] = None
+    ) -> list[OcupacionHora]:
+        """
+        Curva de ocupación por horas en punto. Las horas sin eventos se rellenan con las
+        bicis que quedaron dentro al final de la hora anterior. Solo se conservan las
+        últimas `horas`, para las anteriores están los resúmenes por hora.
+
+        Args:
+            desde (Optional[int]): Primera hora incluida, en microsegundos. Por defecto la primera con eventos.
+            hasta (Optional[int]): Hora final excluida, en microsegundos. Por defecto tras la última con eventos.
+
+        Returns:
+            list[OcupacionHora]: Una entrada por hora del intervalo
+        """
+        actual = self._actual()
+        if not actual.horas:
+            return []
+        horas = sorted(actual.horas)
+        inicio = horas[0] if desde is None else desde - desde % HORA
+        if actual.podada:
+            inicio = max(inicio, horas[0])
+        fin = horas[-1] + HORA if hasta is None else hasta
+
+        # Bicis dentro al empezar el intervalo: el final de la última hora anterior
+        dentro = 0
+        for hora in horas:
+            if hora >= inicio:
+                break
+            dentro = actual.horas[hora][1]
+
+        curva = []
+        for hora in range(inicio, fin, HORA):
+            pico, final = actual.horas.get(hora, (dentro, dentro))
+            curva.append(OcupacionHora(hora, pico, final))
+            dentro = final
+        return curva
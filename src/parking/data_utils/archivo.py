@@ -0,0 +1,304 @@
+"""Archivo de los registros antiguos en un SQLite por mes.
+archivar_registros mueve los registros anteriores al corte a registros_YYYY-MM.db dentro
+de ARCHIVO["carpeta"], así data/bd.db se queda con los meses recientes y cabe en caché.
+Los archivos se adjuntan con ATTACH DATABASE solo cuando hacen falta, por ejemplo en el
+historial con incluir_archivo. El último registro de cada bici no se archiva nunca, así
+estado_bicis y reconstruir_estado_bicis siguen siendo correctos para bicis paradas."""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import os
+import re
+from typing import Callable, Optional
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    delete,
+    exists,
+    func,
+    insert,
+    select,
+    tuple_,
+)
+from sqlalchemy.orm import aliased
+
+from parking.config import ARCHIVO
+from parking.data_utils.tiempo import ahora_microsegundos
+from parking.models.bd import Bd, RegistroORM
+from parking.models.resumenes import (
+    MARCA_ARCHIVO,
+    actualizar_resumenes,
+    guardar_marca,
+    leer_marca,
+)
+
+bd = Bd()
+
+ALIAS = "archivo"
+_PATRON_ARCHIVO = re.compile(r"registros_(\d{4})-(\d{2})\.db")
+
+# Tabla de registros dentro del archivo adjuntado, sin claves ajenas porque usuarios y
+# bicis se quedan en la base de datos principal
+REGISTROS_ARCHIVO = Table(
+    "registros",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("timestamp", Integer, nullable=False),
+    Column("accion", String),
+    Column("num_serie", String, nullable=False),
+    Column("dni_usuario", String, nullable=False),
+    schema=ALIAS,
+)
+_COLUMNAS = ["id", "timestamp", "accion", "num_serie", "dni_usuario"]
+
+
+@dataclass
+class ResultadoArchivo:
+    """Registros movidos, archivos escritos y corte en microsegundos desde epoch"""
+
+    corte: int
+    movidos: int = 0
+    archivos: list[str] = field(default_factory=list)
+
+
+def _inicio_mes(microsegundos: int) -> datetime:
+    fecha = datetime.fromtimestamp(microsegundos // 1_000_000)
+    return fecha.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _mes_siguiente(fecha: datetime) -> datetime:
+    return fecha.replace(
+        year=fecha.year + fecha.month // 12, month=fecha.month % 12 + 1
+    )
+
+
+def _a_microsegundos(fecha: datetime) -> int:
+    return int(fecha.timestamp()) * 1_000_000
+
+
+def corte_archivo(meses: int, ahora: Optional[int] = None) -> int:
+    """
+    Args:
+        meses (int): Meses completos que se quedan en la base de datos, además del actual
+        ahora (Optional[int]): Momento de referencia en microsegundos. Por defecto el actual.
+
+    Returns:
+        int: Inicio del mes local a partir del cual no se archiva, en microsegundos
+    """
+    fecha = _inicio_mes(ahora_microsegundos() if ahora is None else ahora)
+    for _ in range(meses):
+        fecha = (fecha - timedelta(days=1)).replace(day=1)
+    return _a_microsegundos(fecha)
+
+
+def ruta_archivo(carpeta: str, microsegundos: int) -> str:
+    """
+    Args:
+        carpeta (str): Carpeta de los archivos
+        microsegundos (int): Cualquier momento del mes
+
+    Returns:
+        str: Ruta del archivo del mes
+    """
+    return os.path.join(carpeta, f"registros_{_inicio_mes(microsegundos):%Y-%m}.db")
+
+
+def archivos_en_rango(
+    desde: Optional[int] = None,
+    hasta: Optional[int] = None,
+    carpeta: str = ARCHIVO["carpeta"],
+) -> list[tuple[int, int, str]]:
+    """
+    Args:
+        desde (Optional[int]): Solo meses que acaban después, en microsegundos
+        hasta (Optional[int]): Solo meses que empiezan antes, en microsegundos
+        carpeta (str, optional): Carpeta de los archivos. Por defecto ARCHIVO["carpeta"].
+
+    Returns:
+        list[tuple[int, int, str]]: (inicio, fin, ruta) de cada mes archivado, en orden
+    """
+    if not os.path.isdir(carpeta):
+        return []
+    meses = []
+    for nombre in os.listdir(carpeta):
+        coincidencia = _PATRON_ARCHIVO.fullmatch(nombre)
+        if not coincidencia:
+            continue
+        mes = datetime(int(coincidencia.group(1)), int(coincidencia.group(2)), 1)
+        inicio = _a_microsegundos(mes)
+        fin = _a_microsegundos(_mes_siguiente(mes))
+        if (desde is None or fin > desde) and (hasta is None or inicio < hasta):
+            meses.append((inicio, fin, os.path.join(carpeta, nombre)))
+    return sorted(meses)
+
+
+@contextmanager
+def adjuntar(conexion, ruta: str):
+    """
+    Adjunta un archivo a una conexión que aún no ha empezado su transacción, porque
+    SQLite no admite ATTACH dentro de una. Al salir se descarta lo que no se haya
+    confirmado y se separa el archivo antes de devolver la conexión al pool.
+
+    Args:
+        conexion (Connection): Conexión recién abierta
+        ruta (str): Ruta del archivo, se crea si no existe
+
+    Yields:
+        Table: REGISTROS_ARCHIVO, la tabla de registros del archivo adjuntado
+    """
+    crudo = conexion.connection.driver_connection
+    crudo.execute(f"ATTACH DATABASE ? AS {ALIAS}", (ruta,))
+    try:
+        yield REGISTROS_ARCHIVO
+    finally:
+        if conexion.in_transaction():
+            conexion.rollback()
+        crudo.execute(f"DETACH DATABASE {ALIAS}")
+
+
+def consultar_archivo(ruta: str, construir: Callable[[Table], object]) -> list:
+    """
+    Ejecuta una consulta sobre la tabla de registros de un archivo
+
+    Args:
+        ruta (str): Ruta del archivo
+        construir (Callable[[Table], Select]): Construye la consulta para la tabla dada
+
+    Returns:
+        list[Row]: Filas devueltas
+    """
+    with bd.engine.connect() as conexion, adjuntar(conexion, ruta) as tabla:
+        return conexion.execute(construir(tabla)).all()
+
+
+def _no_es_el_ultimo():
+    """Condición de los registros que tienen otro posterior de la misma bici"""
+    posterior = aliased(RegistroORM)
+    return exists().where(
+        posterior.num_serie == RegistroORM.num_serie,
+        posterior.timestamp >= RegistroORM.timestamp,
+        tuple_(posterior.timestamp, posterior.id)
+        > tuple_(RegistroORM.timestamp, RegistroORM.id),
+    )
+
+
+def _crear_tabla(conexion) -> None:
+    """Esquema congelado de la tabla de registros del archivo, como en migraciones.py"""
+    conexion.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {ALIAS}.registros ("
+        "id INTEGER NOT NULL, "
+        "timestamp INTEGER NOT NULL, "
+        "accion VARCHAR, "
+        "num_serie VARCHAR NOT NULL, "
+        "dni_usuario VARCHAR NOT NULL, "
+        "PRIMARY KEY (id))"
+    )
+    for columna in ("num_serie", "dni_usuario"):
+        conexion.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS {ALIAS}.ix_registros_{columna}_timestamp "
+            f"ON registros ({columna}, timestamp)"
+        )
+
+
+def _archivar_mes(ruta: str, desde: int, hasta: int) -> int:
+    """Mueve los registros archivables de [desde, hasta) al archivo en una transacción"""
+    condiciones = (
+        RegistroORM.timestamp >= desde,
+        RegistroORM.timestamp < hasta,
+        _no_es_el_ultimo(),
+    )
+    # Sin registros que mover no se crea el archivo
+    with bd.crear_sesion(escritura=False) as sesion:
+        if not sesion.execute(select(exists().where(*condiciones))).scalar():
+            return 0
+
+    with bd.motor_escritura.connect() as conexion, adjuntar(conexion, ruta) as tabla:
+        with conexion.begin():
+            _crear_tabla(conexion)
+            # OR IGNORE: si una ejecución anterior se cortó tras escribir el archivo,
+            # repetirla solo borra de la base de datos principal
+            conexion.execute(
+                insert(tabla)
+                .prefix_with("OR IGNORE")
+                .from_select(
+                    _COLUMNAS,
+                    select(*(getattr(RegistroORM, c) for c in _COLUMNAS)).where(
+                        *condiciones
+                    ),
+                )
+            )
+            archivados = select(tabla.c.id).where(
+                tabla.c.timestamp >= desde, tabla.c.timestamp < hasta
+            )
+            return conexion.execute(
+                delete(RegistroORM).where(RegistroORM.id.in_(archivados), *condiciones)
+            ).rowcount
+
+
+def compactar() -> None:
+    """Devuelve al sistema el espacio libre de la base de datos principal y vacía el WAL"""
+    with bd.engine.connect() as conexion:
+        crudo = conexion.connection.driver_connection
+        crudo.execute("VACUUM")
+        crudo.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def archivar_registros(
+    meses: int = ARCHIVO["meses"],
+    carpeta: str = ARCHIVO["carpeta"],
+    antes_de: Optional[int] = None,
+    compactar_bd: bool = False,
+) -> ResultadoArchivo:
+    """
+    Mueve a un archivo por mes los registros anteriores al corte, salvo el último de
+    cada bici. Antes se ponen al día los resúmenes, que se conservan para los meses
+    archivados, y al terminar se guarda el corte en la marca "archivo".
+
+    Args:
+        meses (int, optional): Meses completos que se quedan. Por defecto ARCHIVO["meses"].
+        carpeta (str, optional): Carpeta de los archivos. Por defecto ARCHIVO["carpeta"].
+        antes_de (Optional[int]): Corte explícito en microsegundos, se redondea al inicio de su mes
+        compactar_bd (bool, optional): Ejecutar VACUUM al terminar. Por defecto False.
+
+    Returns:
+        ResultadoArchivo: Registros movidos y archivos escritos
+    """
+    if antes_de is None:
+        corte = corte_archivo(meses)
+    else:
+        corte = _a_microsegundos(_inicio_mes(antes_de))
+    resultado = ResultadoArchivo(corte)
+
+    actualizar_resumenes()
+    with bd.crear_sesion(escritura=False) as sesion:
+        minimo = sesion.execute(
+            select(func.min(RegistroORM.timestamp)).where(
+                RegistroORM.timestamp < corte, _no_es_el_ultimo()
+            )
+        ).scalar()
+
+    if minimo is not None:
+        os.makedirs(carpeta, exist_ok=True)
+        mes = _inicio_mes(minimo)
+        while _a_microsegundos(mes) < corte:
+            siguiente = _mes_siguiente(mes)
+            ruta = ruta_archivo(carpeta, _a_microsegundos(mes))
+            movidos = _archivar_mes(
+                ruta, _a_microsegundos(mes), _a_microsegundos(siguiente)
+            )
+            if movidos:
+                resultado.movidos += movidos
+                resultado.archivos.append(ruta)
+            mes = siguiente
+
+    with bd.crear_sesion() as sesion:
+        if corte > leer_marca(sesion, MARCA_ARCHIVO):
+            guardar_marca(sesion, MARCA_ARCHIVO, corte)
+    if compactar_bd:
+        compactar()
+    return resultado
@@ -0,0 +1,160 @@
+"""Caché en memoria para las consultas de existencia de usuarios, emails y bicis.
+Es una LRU acotada con caducidad: las entradas se descartan al superar CACHE_VALIDACIONES
+["tam_maximo"] o al pasar CACHE_VALIDACIONES["ttl"] segundos. Las claves llevan el nombre
+de la base de datos consultada. Los modelos invalidan las claves que modifican, pero un
+dato escrito por otro proceso dura hasta el ttl, por eso está desactivada por defecto.
+"""
+
+from collections import OrderedDict
+from functools import wraps
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+from parking.config import CACHE_VALIDACIONES
+from parking.models.bd import PRINCIPAL
+
+
+class CacheTTL:
+    """LRU con caducidad por entrada y contadores de aciertos y fallos, segura entre hilos"""
+
+    def __init__(
+        self,
+        tam_maximo: int,
+        ttl: float,
+        activa: bool = True,
+        reloj: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            tam_maximo (int): Número máximo de entradas
+            ttl (float): Segundos que una entrada es válida
+            activa (bool, optional): Si es False no se guarda nada. Por defecto True.
+            reloj (Callable[[], float], optional): Fuente de tiempo. Por defecto time.monotonic.
+        """
+        self.tam_maximo = tam_maximo
+        self.ttl = ttl
+        self.activa = activa
+        self._reloj = reloj
+        self._entradas: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._cerrojo = threading.Lock()
+        # Cambia con cada invalidación para no guardar un valor calculado antes de ella
+        self._generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave: Hashable, calcular: Callable[[], Any]) -> Any:
+        """
+        Devuelve el valor guardado para la clave o lo calcula y lo guarda.
+        El cálculo se hace fuera del cerrojo para no serializar las consultas.
+
+        Args:
+            clave (Hashable): Clave de la entrada
+            calcular (Callable[[], Any]): Función que obtiene el valor si no está en caché
+
+        Returns:
+            Any: Valor de la entrada
+        """
+        if not self.activa:
+            return calcular()
+
+        ahora = self._reloj()
+        with self._cerrojo:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] > ahora:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+            generacion = self._generacion
+
+        valor = calcular()
+        with self._cerrojo:
+            if generacion != self._generacion:
+                return valor
+            self._entradas[clave] = (self._reloj() + self.ttl, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.tam_maximo:
+                self._entradas.popitem(last=False)
+        return valor
+
+    def invalidar(self, *claves: Hashable) -> None:
+        """
+        Descarta las claves dadas, o todas las entradas si no se da ninguna
+
+        Args:
+            *claves (Hashable): Claves a descartar
+        """
+        with self._cerrojo:
+            self._generacion += 1
+            if not claves:
+                self._entradas.clear()
+            for clave in claves:
+                self._entradas.pop(clave, None)
+
+    def limpiar(self) -> None:
+        """Descarta todas las entradas y pone los contadores a cero"""
+        with self._cerrojo:
+            self._entradas.clear()
+            self._generacion += 1
+            self.aciertos = 0
+            self.fallos = 0
+
+    def estadisticas(self) -> dict[str, int]:
+        """
+        Returns:
+            dict[str, int]: Aciertos, fallos y número de entradas guardadas
+        """
+        with self._cerrojo:
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "entradas": len(self._entradas),
+            }
+
+
+cache_validaciones = CacheTTL(
+    CACHE_VALIDACIONES["tam_maximo"],
+    CACHE_VALIDACIONES["ttl"],
+    CACHE_VALIDACIONES["activa"],
+)
+
+
+def clave(tipo: str, valor: str, base: Any = None) -> tuple[str, str, str]:
+    """
+    Clave de cache_validaciones para una consulta de existencia
+
+    Args:
+        tipo (str): Tipo de consulta: "dni", "email" o "serie"
+        valor (str): Valor consultado
+        base (Any): Bd consultada. Por defecto la principal.
+
+    Returns:
+        tuple[str, str, str]: (tipo, nombre de la base de datos, valor)
+    """
+    return (tipo, PRINCIPAL if base is None else base.nombre, valor)
+
+
+def cacheado(tipo: str, cache: Optional[CacheTTL] = None) -> Callable:
+    """
+    Decorador para funciones de un argumento y una base de datos opcional cuyo resultado
+    se guarda con la clave dada por clave()
+
+    Args:
+        tipo (str): Prefijo de la clave, con el que luego se invalida
+        cache (Optional[CacheTTL]): Caché a usar. Por defecto cache_validaciones.
+
+    Returns:
+        Callable: Decorador
+    """
+
+    def decorador(funcion: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(funcion)
+        def envoltura(valor: str, base: Any = None) -> Any:
+            return (cache or cache_validaciones).obtener(
+                clave(tipo, valor, base), lambda: funcion(valor, base)
+            )
+
+        return envoltura
+
+    return decorador
@@ -0,0 +1,44 @@
+"""Utilidad para leer archivos csv por lotes sin cargarlos enteros en memoria"""
+
+import csv
+from typing import Iterator
+
+
+def leer_cabecera(path: str) -> list[str]:
+    """
+    Devuelve las columnas de la cabecera de un csv
+
+    Args:
+        path (str): Ruta al archivo csv
+
+    Returns:
+        list[str]: Nombres de las columnas, vacía si el archivo no tiene filas
+    """
+    with open(path, newline="", encoding="utf-8") as archivo:
+        return next(csv.reader(archivo), [])
+
+
+def leer_csv_por_lotes(
+    path: str, tam_lote: int
+) -> Iterator[list[tuple[int, dict[str, str]]]]:
+    """
+    Lee un csv con cabecera y devuelve sus filas en lotes de como mucho tam_lote filas.
+    Cada fila va acompañada de su número de línea en el archivo para poder informar de errores.
+
+    Args:
+        path (str): Ruta al archivo csv
+        tam_lote (int): Número máximo de filas por lote
+
+    Yields:
+        list[tuple[int, dict[str, str]]]: Lote de pares (número de línea, fila)
+    """
+    with open(path, newline="", encoding="utf-8") as archivo:
+        lector = csv.DictReader(archivo)
+        lote = []
+        for fila in lector:
+            lote.append((lector.line_num, fila))
+            if len(lote) >= tam_lote:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
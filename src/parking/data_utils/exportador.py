@@ -0,0 +1,81 @@
+"""Exportación en streaming del histórico de registros a csv.
+Las filas se leen por lotes con yield_per y se escriben según llegan, así la memoria
+usada no depende del tamaño de la tabla. Los timestamps conservan los microsegundos para
+que al volver a importar el csv los eventos ya guardados se reconozcan y se ignoren."""
+
+import csv
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+
+from parking.config import CABECERA_REGISTROS, TAM_LOTE_IMPORTACION
+from parking.data_utils.tiempo import microsegundos_a_texto_exacto
+from parking.models.bd import Bd, RegistroORM
+
+bd = Bd()
+
+
+@dataclass
+class ResultadoExportacion:
+    """Filas escritas y id del último registro exportado, para continuar desde ahí"""
+
+    filas: int = 0
+    ultimo_id: int = 0
+
+
+def exportar_registros_csv(
+    path: str,
+    desde: Optional[int] = None,
+    hasta: Optional[int] = None,
+    despues_de_id: int = 0,
+    anexar: bool = False,
+    tam_lote: int = TAM_LOTE_IMPORTACION,
+) -> ResultadoExportacion:
+    """
+    Escribe los registros en un csv con cabecera CABECERA_REGISTROS, ordenados por id.
+    Para exportaciones incrementales se pasa como despues_de_id el ultimo_id de la
+    exportación anterior y solo se leen los registros nuevos.
+
+    Args:
+        path (str): Ruta del csv de salida
+        desde (Optional[int]): Solo registros con timestamp >= desde, en microsegundos
+        hasta (Optional[int]): Solo registros con timestamp < hasta, en microsegundos
+        despues_de_id (int, optional): Solo registros con id mayor. Por defecto 0, todos.
+        anexar (bool, optional): Añadir al final del archivo sin repetir cabecera. Por defecto False.
+        tam_lote (int, optional): Filas leídas por lote. Por defecto TAM_LOTE_IMPORTACION.
+
+    Returns:
+        ResultadoExportacion: Número de filas escritas y último id exportado
+    """
+    consulta = (
+        select(
+            RegistroORM.id,
+            RegistroORM.timestamp,
+            RegistroORM.accion,
+            RegistroORM.num_serie,
+            RegistroORM.dni_usuario,
+        )
+        .where(RegistroORM.id > despues_de_id)
+        .order_by(RegistroORM.id)
+        .execution_options(yield_per=tam_lote)
+    )
+    if desde is not None:
+        consulta = consulta.where(RegistroORM.timestamp >= desde)
+    if hasta is not None:
+        consulta = consulta.where(RegistroORM.timestamp < hasta)
+
+    resultado = ResultadoExportacion(ultimo_id=despues_de_id)
+    with open(path, "a" if anexar else "w", newline="", encoding="utf-8") as archivo:
+        escritor = csv.writer(archivo)
+        if not anexar or archivo.tell() == 0:
+            escritor.writerow(CABECERA_REGISTROS.split(","))
+        with bd.crear_sesion_lectura() as sesion:
+            for lote in sesion.execute(consulta).partitions():
+                escritor.writerows(
+                    (microsegundos_a_texto_exacto(timestamp), accion, num_serie, dni)
+                    for _, timestamp, accion, num_serie, dni in lote
+                )
+                resultado.filas += len(lote)
+                resultado.ultimo_id = lote[-1].id
+    return resultado
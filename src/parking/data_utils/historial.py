@@ -0,0 +1,255 @@
+"""Consulta del histórico de registros por bici o por usuario.
+Las páginas se piden con paginación por clave (keyset) en vez de OFFSET: cada página
+devuelve la posición (timestamp, id) de su último evento y la siguiente empieza justo
+después, así que SQLite baja directamente por el índice (num_serie, timestamp) o
+(dni_usuario, timestamp) y la página 1000 cuesta lo mismo que la primera.
+Los eventos se devuelven como tuplas ligeras, no como objetos del ORM. Con
+incluir_archivo se consultan también los meses archivados por data_utils/archivo.py."""
+
+from typing import Iterator, NamedTuple, Optional
+
+from sqlalchemy import select, tuple_
+
+from parking.config import ARCHIVO
+from parking.data_utils.archivo import archivos_en_rango, consultar_archivo
+from parking.models.bd import PRINCIPAL, Bd, RegistroORM
+
+bd = Bd()
+
+TAM_PAGINA = 50
+
+
+class EventoHistorial(NamedTuple):
+    """Registro del histórico, timestamp en microsegundos desde epoch"""
+
+    id: int
+    timestamp: int
+    accion: str
+    num_serie: str
+    dni_usuario: str
+
+
+class PosicionHistorial(NamedTuple):
+    """Posición de un evento en el orden del histórico, sirve de cursor entre páginas"""
+
+    timestamp: int
+    id: int
+
+
+class PaginaHistorial(NamedTuple):
+    """Eventos de una página y posición para pedir la siguiente, None si no hay más"""
+
+    eventos: list[EventoHistorial]
+    siguiente: Optional[PosicionHistorial]
+
+
+def _pagina(
+    columna: str,
+    valor: str,
+    limite: int,
+    despues_de: Optional[PosicionHistorial],
+    desde: Optional[int],
+    hasta: Optional[int],
+    recientes_primero: bool,
+    incluir_archivo: bool = False,
+    base: Optional[Bd] = None,
+    carpeta_archivo: str = ARCHIVO["carpeta"],
+) -> PaginaHistorial:
+    """Consulta común: filtra por la columna indexada y continúa tras la posición dada"""
+    if limite < 1:
+        raise ValueError("el límite de la página tiene que ser al menos 1")
+    base = bd if base is None else base
+    if incluir_archivo and base.nombre != PRINCIPAL:
+        raise ValueError("solo la base de datos principal tiene archivo")
+
+    def consulta_en(tabla):
+        c = tabla.c
+        posicion = tuple_(c.timestamp, c.id)
+        consulta = select(
+            c.id, c.timestamp, c.accion, c.num_serie, c.dni_usuario
+        ).where(c[columna] == valor)
+        if desde is not None:
+            consulta = consulta.where(c.timestamp >= desde)
+        if hasta is not None:
+            consulta = consulta.where(c.timestamp < hasta)
+        if recientes_primero:
+            if despues_de is not None:
+                consulta = consulta.where(posicion < tuple(despues_de))
+            consulta = consulta.order_by(c.timestamp.desc(), c.id.desc())
+        else:
+            if despues_de is not None:
+                consulta = consulta.where(posicion > tuple(despues_de))
+            consulta = consulta.order_by(c.timestamp, c.id)
+        # Se pide un evento de más para saber si hay otra página sin contar el total
+        return consulta.limit(limite + 1)
+
+    with base.crear_sesion_lectura() as sesion:
+        filas = sesion.execute(consulta_en(RegistroORM.__table__)).all()
+    if incluir_archivo:
+        filas = _con_archivo(
+            filas, consulta_en, limite, desde, hasta, recientes_primero, carpeta_archivo
+        )
+
+    eventos = [EventoHistorial(*fila) for fila in filas[:limite]]
+    siguiente = None
+    if len(filas) > limite:
+        siguiente = PosicionHistorial(eventos[-1].timestamp, eventos[-1].id)
+    return PaginaHistorial(eventos, siguiente)
+
+
+def _con_archivo(
+    filas: list,
+    consulta_en,
+    limite: int,
+    desde: Optional[int],
+    hasta: Optional[int],
+    recientes_primero: bool,
+    carpeta: str,
+) -> list:
+    """
+    Mezcla las filas de la base de datos con las de los meses archivados, adjuntando los
+    archivos de uno en uno en el orden de la página. Se deja de abrir archivos cuando
+    ninguno de los meses que quedan puede tener eventos dentro de la página.
+    """
+    meses = archivos_en_rango(desde, hasta, carpeta)
+    if recientes_primero:
+        meses.reverse()
+    for inicio, fin, ruta in meses:
+        if len(filas) > limite:
+            frontera = filas[limite].timestamp
+            if fin <= frontera if recientes_primero else inicio > frontera:
+                break
+        # Por id, por si la instantánea aún tiene registros que ya se han archivado
+        filas = sorted(
+            {f.id: f for f in [*filas, *consultar_archivo(ruta, consulta_en)]}.values(),
+            key=lambda fila: (fila.timestamp, fila.id),
+            reverse=recientes_primero,
+        )[: limite + 1]
+    return filas
+
+
+def historial_bici(
+    num_serie: str,
+    limite: int = TAM_PAGINA,
+    despues_de: Optional[PosicionHistorial] = None,
+    desde: Optional[int] = None,
+    hasta: Optional[int] = None,
+    recientes_primero: bool = True,
+    incluir_archivo: bool = False,
+    base: Optional[Bd] = None,
+    carpeta_archivo: str = ARCHIVO["carpeta"],
+) -> PaginaHistorial:
+    """
+    Devuelve una página de eventos de una bici, por defecto los últimos primero
+
+    Args:
+        num_serie (str): Número de serie de la bici
+        limite (int, optional): Eventos por página. Por defecto TAM_PAGINA.
+        despues_de (Optional[PosicionHistorial]): siguiente de la página anterior
+        desde (Optional[int]): Solo eventos con timestamp >= desde, en microsegundos
+        hasta (Optional[int]): Solo eventos con timestamp < hasta, en microsegundos
+        recientes_primero (bool, optional): Orden descendente por fecha. Por defecto True.
+        incluir_archivo (bool, optional): Buscar también en los meses archivados. Por defecto False.
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
+        carpeta_archivo (str, optional): Carpeta de los meses archivados. Por defecto ARCHIVO["carpeta"].
+
+    Returns:
+        PaginaHistorial: Eventos de la página y posición de la siguiente
+    """
+    return _pagina(
+        "num_serie",
+        num_serie,
+        limite,
+        despues_de,
+        desde,
+        hasta,
+        recientes_primero,
+        incluir_archivo,
+        base,
+        carpeta_archivo,
+    )
+
+
+def historial_usuario(
+    dni_usuario: str,
+    limite: int = TAM_PAGINA,
+    despues_de: Optional[PosicionHistorial] = None,
+    desde: Optional[int] = None,
+    hasta: Optional[int] = None,
+    recientes_primero: bool = False,
+    incluir_archivo: bool = False,
+    base: Optional[Bd] = None,
+    carpeta_archivo: str = ARCHIVO["carpeta"],
+) -> PaginaHistorial:
+    """
+    Devuelve una página de eventos de un usuario, por defecto en orden cronológico
+
+    Args:
+        dni_usuario (str): DNI del usuario
+        limite (int, optional): Eventos por página. Por defecto TAM_PAGINA.
+        despues_de (Optional[PosicionHistorial]): siguiente de la página anterior
+        desde (Optional[int]): Solo eventos con timestamp >= desde, en microsegundos
+        hasta (Optional[int]): Solo eventos con timestamp < hasta, en microsegundos
+        recientes_primero (bool, optional): Orden descendente por fecha. Por defecto False.
+        incluir_archivo (bool, optional): Buscar también en los meses archivados. Por defecto False.
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
+        carpeta_archivo (str, optional): Carpeta de los meses archivados. Por defecto ARCHIVO["carpeta"].
+
+    Returns:
+        PaginaHistorial: Eventos de la página y posición de la siguiente
+    """
+    return _pagina(
+        "dni_usuario",
+        dni_usuario,
+        limite,
+        despues_de,
+        desde,
+        hasta,
+        recientes_primero,
+        incluir_archivo,
+        base,
+        carpeta_archivo,
+    )
+
+
+def recorrer_historial_usuario(
+    dni_usuario: str,
+    desde: Optional[int] = None,
+    hasta: Optional[int] = None,
+    tam_pagina: int = TAM_PAGINA,
+    incluir_archivo: bool = False,
+    base: Optional[Bd] = None,
+    carpeta_archivo: str = ARCHIVO["carpeta"],
+) -> Iterator[EventoHistorial]:
+    """
+    Recorre en orden cronológico todos los eventos de un usuario entre dos fechas,
+    pidiendo una página cada vez sin mantener una sesión abierta entre páginas
+
+    Args:
+        dni_usuario (str): DNI del usuario
+        desde (Optional[int]): Solo eventos con timestamp >= desde, en microsegundos
+        hasta (Optional[int]): Solo eventos con timestamp < hasta, en microsegundos
+        tam_pagina (int, optional): Eventos por consulta. Por defecto TAM_PAGINA.
+        incluir_archivo (bool, optional): Buscar también en los meses archivados. Por defecto False.
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
+        carpeta_archivo (str, optional): Carpeta de los meses archivados. Por defecto ARCHIVO["carpeta"].
+
+    Yields:
+        EventoHistorial: Cada evento del usuario
+    """
+    despues_de = None
+    while True:
+        pagina = historial_usuario(
+            dni_usuario,
+            tam_pagina,
+            despues_de,
+            desde,
+            hasta,
+            incluir_archivo=incluir_archivo,
+            base=base,
+            carpeta_archivo=carpeta_archivo,
+        )
+        yield from pagina.eventos
+        if pagina.siguiente is None:
+            return
+        despues_de = pagina.siguiente
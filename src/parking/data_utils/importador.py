@@ -0,0 +1,249 @@
+"""Importación masiva de usuarios, bicis y registros desde archivos csv.
+Los archivos se leen por lotes, cada lote se valida por columnas con validacion.py y
+se inserta con un único executemany en su propia transacción."""
+
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from sqlalchemy import insert, select
+
+from parking.config import (
+    CABECERA_BICIS,
+    CABECERA_REGISTROS,
+    CABECERA_USUARIOS,
+    TAM_LOTE_IMPORTACION,
+)
+from parking.data_utils.cache import cache_validaciones
+from parking.data_utils.csv_utils import leer_cabecera, leer_csv_por_lotes
+from parking.data_utils.tiempo import texto_a_microsegundos
+from parking.data_utils.validacion import (
+    MENSAJES,
+    CodigoValidacion,
+    a_columnas,
+    validar_acciones,
+    validar_columnas,
+    validar_dnis,
+    validar_emails,
+    validar_no_vacios,
+)
+from parking.models.bd import Bd, BiciORM, RegistroORM, UsuarioORM
+from parking.models.estado import actualizar_estados, reconciliar_ocupacion
+
+bd = Bd()
+
+# Reglas de cada tipo de csv, en el orden en que se informa del primer error de la fila
+REGLAS_USUARIOS = {
+    "dni": validar_dnis,
+    "email": validar_emails,
+    "nombre": validar_no_vacios,
+}
+REGLAS_BICIS = {
+    "num_serie": validar_no_vacios,
+    "marca": validar_no_vacios,
+    "modelo": validar_no_vacios,
+    "dni_usuario": validar_dnis,
+}
+REGLAS_REGISTROS = {"accion": validar_acciones}
+
+ConvertirLote = Callable[[list[dict[str, str]]], list[tuple[Optional[dict], str]]]
+
+
+@dataclass
+class ResultadoImportacion:
+    """Resumen de una importación con los errores por número de línea"""
+
+    leidas: int = 0
+    insertadas: int = 0
+    errores: list[tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def rechazadas(self) -> int:
+        """Filas no insertadas, ya sea por no ser válidas o por estar repetidas"""
+        return self.leidas - self.insertadas
+
+
+def _mensaje(columna: str, codigo: CodigoValidacion) -> str:
+    if codigo is CodigoValidacion.VACIO:
+        return f"{columna} vacío"
+    return MENSAJES[codigo]
+
+
+def _convertir_con_reglas(
+    filas: list[dict[str, str]], reglas: dict
+) -> list[tuple[Optional[dict], str]]:
+    """Valida las columnas de las reglas y devuelve cada fila válida con solo esas columnas"""
+    errores = validar_columnas(a_columnas(filas, reglas), reglas)
+    return [
+        (None, _mensaje(*error)) if error else ({c: fila[c] for c in reglas}, "")
+        for fila, error in zip(filas, errores)
+    ]
+
+
+def _convertir_usuarios(
+    filas: list[dict[str, str]],
+) -> list[tuple[Optional[dict], str]]:
+    return _convertir_con_reglas(filas, REGLAS_USUARIOS)
+
+
+def _importar(
+    path: str,
+    cabecera: str,
+    tabla,
+    convertir: ConvertirLote,
+    tam_lote: int,
+    despues_de_insertar: Optional[Callable] = None,
+) -> ResultadoImportacion:
+    """
+    Bucle común de importación: valida la cabecera, convierte cada lote de una vez e
+    inserta las filas válidas ignorando las que ya existen por clave primaria o única.
+    En los registros la clave única es (num_serie, timestamp, accion), así que importar
+    dos veces el mismo csv no duplica eventos.
+    """
+    resultado = ResultadoImportacion()
+    if leer_cabecera(path) != cabecera.split(","):
+        resultado.errores.append((1, f"la cabecera debe ser {cabecera}"))
+        return resultado
+
+    sentencia = insert(tabla).prefix_with("OR IGNORE")
+    for lote in leer_csv_por_lotes(path, tam_lote):
+        validas = []
+        convertidas = convertir([fila for _, fila in lote])
+        for (linea, _), (convertida, error) in zip(lote, convertidas):
+            if convertida is None:
+                resultado.errores.append((linea, error))
+            else:
+                validas.append(convertida)
+        resultado.leidas += len(lote)
+        if not validas:
+            continue
+
+        with bd.crear_sesion() as sesion:
+            insertadas = sesion.connection().execute(sentencia, validas).rowcount
+            if despues_de_insertar:
+                despues_de_insertar(sesion, validas)
+        resultado.insertadas += insertadas
+    return resultado
+
+
+def importar_usuarios(
+    path: str, tam_lote: int = TAM_LOTE_IMPORTACION
+) -> ResultadoImportacion:
+    """
+    Importa usuarios desde un csv con cabecera CABECERA_USUARIOS.
+    Los DNI o emails ya registrados se ignoran. Al terminar se vacía cache_validaciones.
+
+    Args:
+        path (str): Ruta al archivo csv
+        tam_lote (int, optional): Filas por lote. Por defecto TAM_LOTE_IMPORTACION.
+
+    Returns:
+        ResultadoImportacion: Resumen de la importación
+    """
+    try:
+        return _importar(
+            path, CABECERA_USUARIOS, UsuarioORM.__table__, _convertir_usuarios, tam_lote
+        )
+    finally:
+        cache_validaciones.invalidar()
+
+
+def importar_bicis(
+    path: str, tam_lote: int = TAM_LOTE_IMPORTACION
+) -> ResultadoImportacion:
+    """
+    Importa bicis desde un csv con cabecera CABECERA_BICIS.
+    Solo se aceptan bicis de usuarios ya existentes y los números de serie ya registrados
+    se ignoran. Al terminar se vacía cache_validaciones.
+
+    Args:
+        path (str): Ruta al archivo csv
+        tam_lote (int, optional): Filas por lote. Por defecto TAM_LOTE_IMPORTACION.
+
+    Returns:
+        ResultadoImportacion: Resumen de la importación
+    """
+    with bd.crear_sesion(escritura=False) as sesion:
+        usuarios = set(sesion.scalars(select(UsuarioORM.dni)))
+
+    def convertir(filas: list[dict[str, str]]) -> list[tuple[Optional[dict], str]]:
+        return [
+            (
+                (None, "el usuario no está registrado")
+                if convertida is not None and convertida["dni_usuario"] not in usuarios
+                else (convertida, error)
+            )
+            for convertida, error in _convertir_con_reglas(filas, REGLAS_BICIS)
+        ]
+
+    try:
+        return _importar(path, CABECERA_BICIS, BiciORM.__table__, convertir, tam_lote)
+    finally:
+        cache_validaciones.invalidar()
+
+
+def importar_registros(
+    path: str, tam_lote: int = TAM_LOTE_IMPORTACION
+) -> ResultadoImportacion:
+    """
+    Importa el histórico de registros desde un csv con cabecera CABECERA_REGISTROS.
+    Solo se aceptan registros IN u OUT de bicis y usuarios ya existentes, los eventos ya
+    guardados con la misma bici, timestamp y acción se ignoran, y con cada lote
+    se actualiza el estado de las bicis si el registro importado es más reciente.
+    Al terminar se recalcula el contador de ocupación desde el estado de las bicis.
+
+    Args:
+        path (str): Ruta al archivo csv
+        tam_lote (int, optional): Filas por lote. Por defecto TAM_LOTE_IMPORTACION.
+
+    Returns:
+        ResultadoImportacion: Resumen de la importación
+    """
+    with bd.crear_sesion(escritura=False) as sesion:
+        bicis = set(sesion.scalars(select(BiciORM.num_serie)))
+        usuarios = set(sesion.scalars(select(UsuarioORM.dni)))
+
+    def convertir_fila(fila: dict[str, str]) -> tuple[Optional[dict], str]:
+        if fila["num_serie"] not in bicis:
+            return None, "la bicicleta no está registrada"
+        if fila["dni_usuario"] not in usuarios:
+            return None, "el usuario no está registrado"
+        try:
+            timestamp = texto_a_microsegundos(fila["timestamp"])
+        except ValueError:
+            return None, "timestamp no válido"
+        return {
+            "timestamp": timestamp,
+            "accion": fila["accion"],
+            "num_serie": fila["num_serie"],
+            "dni_usuario": fila["dni_usuario"],
+        }, ""
+
+    def convertir(filas: list[dict[str, str]]) -> list[tuple[Optional[dict], str]]:
+        errores = validar_columnas(
+            a_columnas(filas, REGLAS_REGISTROS), REGLAS_REGISTROS
+        )
+        return [
+            (None, _mensaje(*error)) if error else convertir_fila(fila)
+            for fila, error in zip(filas, errores)
+        ]
+
+    def actualizar_estado(sesion, filas: list[dict]) -> None:
+        ultimos = {}
+        for fila in filas:
+            anterior = ultimos.get(fila["num_serie"])
+            if anterior is None or fila["timestamp"] >= anterior["timestamp"]:
+                ultimos[fila["num_serie"]] = fila
+        actualizar_estados(sesion, list(ultimos.values()), solo_posteriores=True)
+
+    resultado = _importar(
+        path,
+        CABECERA_REGISTROS,
+        RegistroORM.__table__,
+        convertir,
+        tam_lote,
+        actualizar_estado,
+    )
+    if resultado.insertadas:
+        with bd.crear_sesion() as sesion:
+            reconciliar_ocupacion(sesion, desde_registros=False)
+    return resultado
@@ -0,0 +1,80 @@
+"""Conversión entre el formato de texto de los registros y microsegundos desde epoch"""
+
+from datetime import datetime
+import re
+import threading
+import time
+
+from parking.config import TIMESTAMP_FMT
+
+_cerrojo = threading.Lock()
+_ultimo = 0
+
+# Con el formato por defecto se evita strptime, que es el coste principal al importar.
+# También se aceptan microsegundos tras los segundos, como los escribe el exportador
+_PATRON_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d{6})?")
+
+
+def ahora_microsegundos() -> int:
+    """
+    Devuelve el momento actual en microsegundos desde epoch.
+    Dentro del mismo proceso el valor es estrictamente creciente, aunque dos
+    llamadas caigan en el mismo microsegundo o el reloj del sistema retroceda.
+
+    Returns:
+        int: Microsegundos desde 1970-01-01 UTC
+    """
+    global _ultimo
+    with _cerrojo:
+        _ultimo = max(time.time_ns() // 1000, _ultimo + 1)
+        return _ultimo
+
+
+def texto_a_microsegundos(texto: str, formato: str = TIMESTAMP_FMT) -> int:
+    """
+    Convierte una fecha en texto con hora local a microsegundos desde epoch.
+    Con el formato por defecto admite también microsegundos: "2025-03-01 08:15:22.000125".
+
+    Args:
+        texto (str): Fecha en el formato indicado
+        formato (str, optional): Formato de strptime. Por defecto TIMESTAMP_FMT.
+
+    Returns:
+        int: Microsegundos desde 1970-01-01 UTC
+    """
+    if formato == TIMESTAMP_FMT and _PATRON_TIMESTAMP.fullmatch(texto):
+        fecha = datetime.fromisoformat(texto)
+    else:
+        fecha = datetime.strptime(texto, formato)
+    return int(fecha.timestamp()) * 1_000_000 + fecha.microsecond
+
+
+def microsegundos_a_texto(microsegundos: int, formato: str = TIMESTAMP_FMT) -> str:
+    """
+    Convierte microsegundos desde epoch a una fecha en texto con hora local
+
+    Args:
+        microsegundos (int): Microsegundos desde 1970-01-01 UTC
+        formato (str, optional): Formato de strftime. Por defecto TIMESTAMP_FMT.
+
+    Returns:
+        str: Fecha formateada
+    """
+    segundos, resto = divmod(microsegundos, 1_000_000)
+    return datetime.fromtimestamp(segundos).replace(microsecond=resto).strftime(formato)
+
+
+def microsegundos_a_texto_exacto(microsegundos: int) -> str:
+    """
+    Como microsegundos_a_texto con TIMESTAMP_FMT, pero añade los microsegundos tras los
+    segundos si no son cero para que texto_a_microsegundos devuelva el mismo valor
+
+    Args:
+        microsegundos (int): Microsegundos desde 1970-01-01 UTC
+
+    Returns:
+        str: Fecha formateada, con ".ffffff" si hace falta
+    """
+    texto = microsegundos_a_texto(microsegundos)
+    resto = microsegundos % 1_000_000
+    return f"{texto}.{resto:06d}" if resto else texto
@@ -0,0 +1,184 @@
+"""Reglas de validación de campos con patrones precompilados y letra de control del DNI/NIE.
+Además de las funciones por valor hay funciones por columna, que validan una lista (o
+cualquier secuencia, como un array) de valores de una vez y devuelven un código de error
+por fila, pensadas para importaciones y APIs por lotes. Ninguna imprime por pantalla."""
+
+from enum import Enum
+import re
+from typing import Callable, Iterable, Mapping, Optional, Sequence
+
+from parking.config import PATRON_DNI, PATRON_EMAIL
+
+LETRAS_DNI = "TRWAGMYFPDXBNJZSQVHLCKE"
+# Los NIE empiezan por X, Y o Z, que cuentan como 0, 1 y 2 al calcular la letra
+PREFIJOS_NIE = {"X": "0", "Y": "1", "Z": "2"}
+
+_PATRON_DNI = re.compile(PATRON_DNI)
+_PATRON_NIE = re.compile(r"^[XYZxyz]\d{7}[A-Za-z]$")
+_PATRON_EMAIL = re.compile(PATRON_EMAIL)
+
+
+class CodigoValidacion(str, Enum):
+    """Motivo por el que un valor no es válido"""
+
+    VACIO = "vacio"
+    DNI_FORMATO = "dni_formato"
+    DNI_LETRA = "dni_letra"
+    EMAIL_FORMATO = "email_formato"
+    ACCION = "accion"
+
+
+MENSAJES = {
+    CodigoValidacion.VACIO: "campo vacío",
+    CodigoValidacion.DNI_FORMATO: "DNI no válido",
+    CodigoValidacion.DNI_LETRA: "la letra del DNI no es correcta",
+    CodigoValidacion.EMAIL_FORMATO: "email no válido",
+    CodigoValidacion.ACCION: "la acción debe ser IN u OUT",
+}
+
+ACCIONES = frozenset(("IN", "OUT"))
+
+
+def letra_dni(numero: int) -> str:
+    """
+    Devuelve la letra de control de un número de DNI
+
+    Args:
+        numero (int): Número del DNI, o del NIE con el prefijo ya sustituido
+
+    Returns:
+        str: Letra mayúscula
+    """
+    return LETRAS_DNI[numero % 23]
+
+
+def validar_dni(documento: str) -> Optional[CodigoValidacion]:
+    """
+    Valida un DNI (8 dígitos y letra) o NIE (X, Y o Z, 7 dígitos y letra) incluida su
+    letra de control. Se aceptan letras minúsculas.
+
+    Args:
+        documento (str): DNI o NIE
+
+    Returns:
+        Optional[CodigoValidacion]: None si es válido, si no el motivo
+    """
+    if _PATRON_DNI.fullmatch(documento):
+        numero = documento[:8]
+    elif _PATRON_NIE.fullmatch(documento):
+        numero = PREFIJOS_NIE[documento[0].upper()] + documento[1:8]
+    else:
+        return CodigoValidacion.DNI_FORMATO
+    if letra_dni(int(numero)) != documento[8].upper():
+        return CodigoValidacion.DNI_LETRA
+    return None
+
+
+def validar_email(email: str) -> Optional[CodigoValidacion]:
+    """
+    Valida que un email conste de texto seguido de arroba y un dominio
+
+    Args:
+        email (str): Email a evaluar
+
+    Returns:
+        Optional[CodigoValidacion]: None si es válido, si no el motivo
+    """
+    return None if _PATRON_EMAIL.fullmatch(email) else CodigoValidacion.EMAIL_FORMATO
+
+
+def validar_dnis(valores: Iterable[str]) -> list[Optional[CodigoValidacion]]:
+    """
+    Valida una columna de DNI o NIE
+
+    Args:
+        valores (Iterable[str]): Columna de documentos
+
+    Returns:
+        list[Optional[CodigoValidacion]]: Un código por fila, None si es válida
+    """
+    return [validar_dni(valor) for valor in valores]
+
+
+def validar_emails(valores: Iterable[str]) -> list[Optional[CodigoValidacion]]:
+    """
+    Valida una columna de emails
+
+    Args:
+        valores (Iterable[str]): Columna de emails
+
+    Returns:
+        list[Optional[CodigoValidacion]]: Un código por fila, None si es válida
+    """
+    coincide = _PATRON_EMAIL.fullmatch
+    error = CodigoValidacion.EMAIL_FORMATO
+    return [None if coincide(valor) else error for valor in valores]
+
+
+def validar_no_vacios(valores: Iterable[str]) -> list[Optional[CodigoValidacion]]:
+    """
+    Valida que ningún valor de la columna esté vacío
+
+    Args:
+        valores (Iterable[str]): Columna de texto
+
+    Returns:
+        list[Optional[CodigoValidacion]]: Un código por fila, None si es válida
+    """
+    error = CodigoValidacion.VACIO
+    return [None if valor else error for valor in valores]
+
+
+def validar_acciones(valores: Iterable[str]) -> list[Optional[CodigoValidacion]]:
+    """
+    Valida que cada acción sea IN u OUT
+
+    Args:
+        valores (Iterable[str]): Columna de acciones
+
+    Returns:
+        list[Optional[CodigoValidacion]]: Un código por fila, None si es válida
+    """
+    error = CodigoValidacion.ACCION
+    return [None if valor in ACCIONES else error for valor in valores]
+
+
+ValidadorColumna = Callable[[Iterable[str]], list[Optional[CodigoValidacion]]]
+
+
+def validar_columnas(
+    columnas: Mapping[str, Sequence[str]], reglas: Mapping[str, ValidadorColumna]
+) -> list[Optional[tuple[str, CodigoValidacion]]]:
+    """
+    Aplica a cada columna su validador y devuelve, por fila, el primer error en el orden
+    de las reglas
+
+    Args:
+        columnas (Mapping[str, Sequence[str]]): Valores de cada columna, todas del mismo largo
+        reglas (Mapping[str, ValidadorColumna]): Validador de cada columna a comprobar
+
+    Returns:
+        list[Optional[tuple[str, CodigoValidacion]]]: Por fila, None si es válida o la
+            columna y el código del primer error
+    """
+    filas = len(next(iter(columnas.values()))) if columnas else 0
+    errores: list[Optional[tuple[str, CodigoValidacion]]] = [None] * filas
+    for columna, validador in reglas.items():
+        for i, codigo in enumerate(validador(columnas[columna])):
+            if codigo is not None and errores[i] is None:
+                errores[i] = (columna, codigo)
+    return errores
+
+
+def a_columnas(filas: Sequence[Mapping[str, str]], nombres: Iterable[str]) -> dict:
+    """
+    Pasa una lista de filas como diccionarios a un diccionario de columnas
+
+    Args:
+        filas (Sequence[Mapping[str, str]]): Filas, por ejemplo de csv.DictReader
+        nombres (Iterable[str]): Columnas que se quieren extraer
+
+    Returns:
+        dict[str, list[str]]: Lista de valores de cada columna
+    """
+    return {nombre: [fila[nombre] for fila in filas] for nombre in nombres}
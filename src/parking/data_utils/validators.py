@@ -1,12 +1,11 @@
 """Paquete de validaciones para comprobar entrada de datos y consistencias de datos en los archivos"""
 
-import re
 from typing import Optional
 
-from sqlalchemy import desc
-
-from parking.models.bd import Bd, BiciORM, RegistroORM, UsuarioORM
-from ..config import PATRON_DNI, PATRON_EMAIL, USUARIOS_CSV, BICIS_CSV, REGISTROS_CSV
+from parking.data_utils.cache import cacheado
+from parking.data_utils.validacion import validar_dni, validar_email
+from parking.models.bd import Bd, BiciORM, EstadoBiciORM, UsuarioORM
+from parking.models.instrumentacion import operacion
 
 
 bd = Bd()
@@ -14,15 +13,16 @@ bd = Bd()
 
 def es_dni_valido(dni: str) -> bool:
     """
-    Valida que un DNI tenga 8 digitos y una letra mayúscula o minúscula.
+    Valida que un DNI tenga 8 digitos y una letra mayúscula o minúscula, o que sea un
+    NIE, y que la letra de control sea la correcta.
 
     Args:
         dni (str): Número de DNI a evaluar
 
     Returns:
-        bool: True si coincide el patrón, False si no
+        bool: True si coincide el patrón y la letra, False si no
     """
-    return bool(re.match(PATRON_DNI, dni))
+    return validar_dni(dni) is None
 
 
 def es_email_valido(email: str) -> bool:
@@ -35,54 +35,66 @@ def es_email_valido(email: str) -> bool:
     Returns:
         bool: True si coincide el patrón, False si no
     """
-    return bool(re.match(PATRON_EMAIL, email))
+    return validar_email(email) is None
 
 
-def es_dni_unico(dni: str) -> bool:
+@cacheado("dni")
+def es_dni_unico(dni: str, base: Optional[Bd] = None) -> bool:
     """
-    Valida que un DNI no aparezca en la tabla de usuarios
+    Valida que un DNI no aparezca en la tabla de usuarios.
+    El resultado se guarda en cache_validaciones con clave ("dni", base, dni).
 
     Args:
         dni (str): DNI a validar
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
 
     Returns:
         bool: Si no existe el DNI devuelve True, si existe False
     """
-    with bd.crear_sesion() as sesion:
+    base = bd if base is None else base
+    with base.crear_sesion(escritura=False) as sesion:
         if sesion.query(UsuarioORM).filter_by(dni=dni).first():
             return False
         else:
             return True
 
 
-def es_email_unico(email: str) -> bool:
+@cacheado("email")
+def es_email_unico(email: str, base: Optional[Bd] = None) -> bool:
     """
-    Valida que un email no aparezca en la tabla de usuarios
+    Valida que un email no aparezca en la tabla de usuarios.
+    El resultado se guarda en cache_validaciones con clave ("email", base, email).
 
     Args:
         email (str): email a validar
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
 
     Returns:
         bool: Si no existe el email devuelve True, si existe False
     """
-    with bd.crear_sesion() as sesion:
+    base = bd if base is None else base
+    with base.crear_sesion(escritura=False) as sesion:
         if sesion.query(UsuarioORM).filter_by(email=email).first():
             return False
         else:
             return True
 
 
-def es_serie_unica(num_serie: str) -> bool:
+@cacheado("serie")
+def es_serie_unica(num_serie: str, base: Optional[Bd] = None) -> bool:
     """
-    Valida que una serie no aparezca en la tabla de bicis
+    Valida que una serie no aparezca en la tabla de bicis.
+    El resultado se guarda en cache_validaciones con clave ("serie", base, num_serie).
 
     Args:
         num_serie (str): número de serie a validar
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
 
     Returns:
         bool: Si no existe el DNI devuelve True, si existe False
     """
-    with bd.crear_sesion() as sesion:
+    base = bd if base is None else base
+    with base.crear_sesion(escritura=False) as sesion:
         if sesion.query(BiciORM).filter_by(num_serie=num_serie).first():
             return False
         else:
@@ -115,53 +127,73 @@ def normalizar_texto(text: str) -> str:
     return text.lower().replace(" ", "")
 
 
-def puede_entrar(num_serie: str) -> bool:
+def admite_entrada(ultima_accion: Optional[str]) -> bool:
+    """
+    Devuelve si una bici con la última acción dada puede ser guardada
+
+    Args:
+        ultima_accion (Optional[str]): Última acción registrada de la bici, None si nunca ha entrado
+
+    Returns:
+        bool: True si la bici nunca ha entrado o su último estado es OUT
+    """
+    if ultima_accion is None:
+        return True  # La bici entra por primera vez
+    elif ultima_accion == "OUT":
+        return True  # Ultima accion fue OUT
+    else:
+        return False
+
+
+def admite_salida(ultima_accion: Optional[str]) -> bool:
+    """
+    Devuelve si una bici con la última acción dada puede ser retirada
+
+    Args:
+        ultima_accion (Optional[str]): Última acción registrada de la bici, None si nunca ha entrado
+
+    Returns:
+        bool: True si el último estado de la bici es IN
+    """
+    if ultima_accion is None:
+        return False  # La bici nunca ha entrado, no puede salir
+    elif ultima_accion == "IN":
+        return True  # Ultima accion fue IN
+    else:
+        return False
+
+
+@operacion("puede_entrar")
+def puede_entrar(num_serie: str, base: Optional[Bd] = None) -> bool:
     """
     Devuelve si la bici puede ser guardada
 
     Args:
         num_serie (str): Número de serie de la bici
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
 
     Returns:
         bool: True si la bici nunca ha entrado o su último estado es OUT
     """
-    with bd.crear_sesion() as sesion:
-        registro_reciente: Optional[RegistroORM] = (
-            sesion.query(RegistroORM)
-            .filter_by(num_serie=num_serie)
-            .order_by(desc(RegistroORM.timestamp))
-            .first()
-        )
-
-        if registro_reciente is None:
-            return True  # La bici entra por primera vez
-        elif registro_reciente.accion == "OUT":  # type: ignore
-            return True  # Ultima accion fue OUT
-        else:
-            return False
+    base = bd if base is None else base
+    with base.crear_sesion(escritura=False) as sesion:
+        estado: Optional[EstadoBiciORM] = sesion.get(EstadoBiciORM, num_serie)
+        return admite_entrada(estado.accion if estado else None)  # type: ignore
 
 
-def puede_salir(num_serie: str) -> bool:
+@operacion("puede_salir")
+def puede_salir(num_serie: str, base: Optional[Bd] = None) -> bool:
     """
     Devuelve si la bici puede ser retirada
 
     Args:
         num_serie (str): Número de serie de la bici
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
 
     Returns:
         bool: True si el último estado de la bici es IN
     """
-    with bd.crear_sesion() as sesion:
-        registro_reciente: Optional[RegistroORM] = (
-            sesion.query(RegistroORM)
-            .filter_by(num_serie=num_serie)
-            .order_by(desc(RegistroORM.timestamp))
-            .first()
-        )
-
-        if registro_reciente is None:
-            return False  # La bici nunca ha entrado, no puede salir
-        elif registro_reciente.accion == "IN":  # type: ignore
-            return True  # Ultima accion fue IN
-        else:
-            return False
+    base = bd if base is None else base
+    with base.crear_sesion(escritura=False) as sesion:
+        estado: Optional[EstadoBiciORM] = sesion.get(EstadoBiciORM, num_serie)
+        return admite_salida(estado.accion if estado else None)  # type: ignore
@@ -1,12 +1,31 @@
 """Objeto para gestionar la conexión a la base de datos"""
 
 from contextlib import contextmanager
-from sqlalchemy import ForeignKey, create_engine, Column, Integer, String
+import os
+import threading
+from typing import Optional
+
+from sqlalchemy import (
+    JSON,
+    ForeignKey,
+    Index,
+    create_engine,
+    event,
+    Column,
+    Integer,
+    String,
+)
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from parking.config import INSTANTANEA, INSTRUMENTACION, PERFIL_BD
+from parking.models.instantanea import Instantanea
+from parking.models.instrumentacion import Exportador, activar, metricas
+
 Base = declarative_base()
 
 DB_NAME = "data/bd.db"
+# Nombre de la base de datos que devuelve Bd() sin argumentos
+PRINCIPAL = "principal"
 
 
 # ====== MODELOS ORM ======
@@ -24,6 +43,7 @@ class UsuarioORM(Base):
 
 class BiciORM(Base):
     __tablename__ = "bicis"
+    __table_args__ = (Index("ix_bicis_dni_usuario", "dni_usuario"),)
     num_serie = Column(String, primary_key=True)
     dni_usuario = Column(String, ForeignKey("usuarios.dni"), nullable=False)
     marca = Column(String, nullable=False)
@@ -37,37 +57,299 @@ class BiciORM(Base):
 
 
 class RegistroORM(Base):
+    """Evento de entrada o salida, timestamp en microsegundos desde epoch"""
+
     __tablename__ = "registros"
-    timestamp = Column(String, primary_key=True)
+    __table_args__ = (
+        Index("ix_registros_num_serie_timestamp", "num_serie", "timestamp"),
+        Index("ix_registros_dni_usuario_timestamp", "dni_usuario", "timestamp"),
+        Index("ix_registros_timestamp", "timestamp"),
+        # Un mismo evento no se guarda dos veces, por ejemplo al reimportar un csv
+        Index("ux_registros_evento", "num_serie", "timestamp", "accion", unique=True),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    timestamp = Column(Integer, nullable=False)
     accion = Column(String)
     num_serie = Column(String, ForeignKey("bicis.num_serie"), nullable=False)
     dni_usuario = Column(String, ForeignKey("usuarios.dni"), nullable=False)
 
-    def __init__(self, timestamp: str, accion: str, num_serie: str, dni_usuario: str):
+    def __init__(self, timestamp: int, accion: str, num_serie: str, dni_usuario: str):
         self.timestamp = timestamp
         self.accion = accion
         self.num_serie = num_serie
         self.dni_usuario = dni_usuario
 
 
+class EstadoBiciORM(Base):
+    """Último registro de cada bici, mantenido junto a cada inserción en registros"""
+
+    __tablename__ = "estado_bicis"
+    num_serie = Column(String, ForeignKey("bicis.num_serie"), primary_key=True)
+    accion = Column(String, nullable=False)
+    timestamp = Column(Integer, nullable=False)
+    dni_usuario = Column(String, ForeignKey("usuarios.dni"), nullable=False)
+
+    def __init__(self, num_serie: str, accion: str, timestamp: int, dni_usuario: str):
+        self.num_serie = num_serie
+        self.accion = accion
+        self.timestamp = timestamp
+        self.dni_usuario = dni_usuario
+
+
+class OcupacionORM(Base):
+    """Contador de bicis dentro del parking, una única fila con id 1"""
+
+    __tablename__ = "ocupacion"
+    id = Column(Integer, primary_key=True)
+    bicis = Column(Integer, nullable=False, default=0)
+
+    def __init__(self, bicis: int = 0):
+        self.id = 1
+        self.bicis = bicis
+
+
+class ResumenHoraORM(Base):
+    """Resumen de los registros de una hora en punto, hora en microsegundos desde epoch"""
+
+    __tablename__ = "resumen_horas"
+    hora = Column(Integer, primary_key=True)
+    entradas = Column(Integer, nullable=False)
+    salidas = Column(Integer, nullable=False)
+    bicis = Column(Integer, nullable=False)
+    usuarios = Column(Integer, nullable=False)
+    pico = Column(Integer, nullable=False)
+    final = Column(Integer, nullable=False)
+
+
+class ResumenDiaORM(Base):
+    """Resumen de los registros de un día en hora local, dia con formato YYYY-MM-DD"""
+
+    __tablename__ = "resumen_dias"
+    dia = Column(String, primary_key=True)
+    entradas = Column(Integer, nullable=False)
+    salidas = Column(Integer, nullable=False)
+    bicis = Column(Integer, nullable=False)
+    usuarios = Column(Integer, nullable=False)
+    pico = Column(Integer, nullable=False)
+    final = Column(Integer, nullable=False)
+
+
+class MarcaORM(Base):
+    """Marca de agua de un proceso incremental, por ejemplo el último id resumido"""
+
+    __tablename__ = "marcas"
+    nombre = Column(String, primary_key=True)
+    valor = Column(Integer, nullable=False)
+
+    def __init__(self, nombre: str, valor: int):
+        self.nombre = nombre
+        self.valor = valor
+
+
+class AnaliticaORM(Base):
+    """Estado guardado de un Analizador para seguir desde el último registro procesado"""
+
+    __tablename__ = "analitica"
+    nombre = Column(String, primary_key=True)
+    datos = Column(JSON, nullable=False)
+
+    def __init__(self, nombre: str, datos: dict):
+        self.nombre = nombre
+        self.datos = datos
+
+
 # ====== BD MANAGER ======
+def crear_motor(db_file: str, perfil: Optional[dict] = None):
+    """
+    Crea el motor de SQLAlchemy para un archivo SQLite aplicando un perfil de conexión
+
+    Args:
+        db_file (str): Ruta del archivo de la base de datos
+        perfil (Optional[dict]): Pragmas, BEGIN de escritura y pool. Por defecto PERFIL_BD.
+
+    Returns:
+        Engine: Motor configurado
+    """
+    perfil = PERFIL_BD if perfil is None else perfil
+    pragmas = perfil.get("pragmas", {})
+    espera = pragmas.get("busy_timeout", 5000) / 1000
+    engine = create_engine(
+        f"sqlite:///{db_file}",
+        echo=False,
+        connect_args={"timeout": espera, "check_same_thread": False},
+        **perfil.get("pool", {}),
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configurar_conexion(conexion_dbapi, _):
+        # SQLAlchemy emite el BEGIN en vez de pysqlite, así las lecturas también
+        # quedan dentro de la transacción
+        conexion_dbapi.isolation_level = None
+        cursor = conexion_dbapi.cursor()
+        for nombre, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nombre} = {valor}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _empezar_transaccion(conexion):
+        modo = conexion.get_execution_options().get("modo_begin", "DEFERRED")
+        conexion.exec_driver_sql(f"BEGIN {modo}")
+
+    return engine
+
+
 class Bd:
-    _instance = None
+    """
+    Base de datos con nombre. Bd() devuelve siempre la principal y Bd(nombre="lote2")
+    otra independiente, por defecto en data/lote2.db, con su propio motor. El motor se
+    crea en el primer uso, así importar un módulo con bd = Bd() no abre ningún archivo
+    y Bd(ruta) puede cambiar la ruta mientras no se haya conectado. En un proceso hijo
+    creado con fork los motores heredados se descartan sin cerrar las conexiones del
+    padre y cada proceso abre las suyas. Los modelos y las consultas usan la principal
+    salvo que se les pase otra en su argumento base.
+    """
+
+    _instancias: dict[str, "Bd"] = {}
+    _cerrojo_instancias = threading.Lock()
 
-    def __new__(cls, db_file=DB_NAME):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._init(db_file)
-        return cls._instance
+    def __new__(
+        cls,
+        db_file: Optional[str] = None,
+        perfil: Optional[dict] = None,
+        nombre: str = PRINCIPAL,
+    ):
+        with cls._cerrojo_instancias:
+            instancia = cls._instancias.get(nombre)
+            if instancia is None:
+                instancia = super().__new__(cls)
+                if db_file is None:
+                    db_file = (
+                        DB_NAME
+                        if nombre == PRINCIPAL
+                        else os.path.join(os.path.dirname(DB_NAME), f"{nombre}.db")
+                    )
+                instancia._init(db_file, perfil, nombre)
+                cls._instancias[nombre] = instancia
+            else:
+                instancia._configurar(db_file, perfil)
+        return instancia
+
+    def _init(
+        self,
+        db_file: str = DB_NAME,
+        perfil: Optional[dict] = None,
+        nombre: str = PRINCIPAL,
+    ):
+        self.nombre = nombre
+        self.db_file = db_file
+        self.perfil = PERFIL_BD if perfil is None else perfil
+        self._engine = None
+        self._cerrojo = threading.RLock()
+        self.instantanea: Optional[Instantanea] = None
+        self.exportador = None
 
-    def _init(self, db_file=DB_NAME):
-        self.engine = create_engine(f"sqlite:///{db_file}", echo=False)
-        Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
+    def _configurar(self, db_file: Optional[str], perfil: Optional[dict]) -> None:
+        """Cambia la ruta o el perfil de una instancia que aún no se ha conectado"""
+        with self._cerrojo:
+            cambia = (db_file is not None and db_file != self.db_file) or (
+                perfil is not None and perfil != self.perfil
+            )
+            if not cambia:
+                return
+            if self._engine is not None:
+                raise ValueError(
+                    f"la base de datos {self.nombre} ya está abierta en {self.db_file}"
+                )
+            self.db_file = db_file or self.db_file
+            self.perfil = perfil or self.perfil
+
+    def _abrir(self):
+        """Crea el motor, prepara el esquema y activa lo indicado en config.py"""
+        # import diferido para evitar el ciclo bd <-> migraciones
+        from parking.models.migraciones import preparar_esquema
+
+        with self._cerrojo:
+            if self._engine is not None:
+                return self._engine
+            engine = crear_motor(self.db_file, self.perfil)
+            preparar_esquema(engine)
+            # Para conexiones de escritura fuera de una sesión, por ejemplo con ATTACH
+            self._motor_escritura = engine.execution_options(
+                modo_begin=self.perfil.get("begin_escritura", "DEFERRED")
+            )
+            self._fabrica_escritura = sessionmaker(bind=self._motor_escritura)
+            # Los objetos leídos se siguen usando tras cerrar la sesión, no se expiran
+            self._fabrica_lectura = sessionmaker(bind=engine, expire_on_commit=False)
+            self._engine = engine
+            if INSTRUMENTACION["activa"]:
+                activar(engine)
+            # La instantánea y el exportador de métricas son de la base de datos principal
+            if self.nombre == PRINCIPAL:
+                if INSTANTANEA["activa"]:
+                    self.activar_instantanea(
+                        INSTANTANEA["ruta"], INSTANTANEA["intervalo"]
+                    )
+                if INSTRUMENTACION["activa"]:
+                    self.exportador = Exportador(
+                        INSTRUMENTACION["intervalo"],
+                        INSTRUMENTACION["archivo_prometheus"],
+                    )
+                    self.exportador.start()
+            return engine
+
+    @property
+    def engine(self):
+        """Motor de SQLAlchemy, se crea en el primer acceso"""
+        return self._engine if self._engine is not None else self._abrir()
+
+    @property
+    def motor_escritura(self):
+        """Motor cuyas transacciones empiezan con el BEGIN de escritura del perfil"""
+        self.engine
+        return self._motor_escritura
+
+    def _despues_de_fork(self) -> None:
+        """
+        Descarta en el proceso hijo las conexiones heredadas sin cerrarlas, porque siguen
+        siendo del padre, y los cerrojos que pudiera tener otro hilo al hacer fork
+        """
+        self._cerrojo = threading.RLock()
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+        if self.instantanea is not None:
+            self.instantanea.despues_de_fork()
+
+    def cerrar(self) -> None:
+        """
+        Para la instantánea y el exportador, cierra las conexiones y olvida la instancia:
+        el siguiente Bd() con el mismo nombre crea una nueva
+        """
+        with self._cerrojo:
+            if self.instantanea is not None:
+                self.instantanea.parar()
+                self.instantanea = None
+            if self.exportador is not None:
+                self.exportador.parar()
+                self.exportador = None
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+        with Bd._cerrojo_instancias:
+            if Bd._instancias.get(self.nombre) is self:
+                del Bd._instancias[self.nombre]
 
     @contextmanager
-    def crear_sesion(self):
-        session = self.Session()
+    def crear_sesion(self, escritura: bool = True):
+        """
+        Abre una sesión que hace commit al salir y rollback si hay una excepción.
+        Las sesiones de solo lectura empiezan con un BEGIN normal y no esperan al escritor.
+
+        Args:
+            escritura (bool, optional): Si la sesión va a escribir. Por defecto True.
+        """
+        self.engine
+        metricas.registrar_sesion()
+        session = self._fabrica_escritura() if escritura else self._fabrica_lectura()
         try:
             yield session
             session.commit()
@@ -76,3 +358,57 @@ class Bd:
             raise
         finally:
             session.close()
+
+    def activar_instantanea(
+        self, ruta: str, intervalo: Optional[float] = None
+    ) -> Instantanea:
+        """
+        Empieza a usar una instantánea para crear_sesion_lectura
+
+        Args:
+            ruta (str): Archivo de la instantánea
+            intervalo (Optional[float]): Segundos entre refrescos, None para refrescar a mano
+
+        Returns:
+            Instantanea: La instantánea ya creada
+        """
+        instantanea = Instantanea(self.engine, ruta, self.perfil)
+        if intervalo is None:
+            instantanea.refrescar()
+        else:
+            instantanea.iniciar(intervalo)
+        self.instantanea = instantanea
+        return instantanea
+
+    @contextmanager
+    def crear_sesion_lectura(self):
+        """
+        Abre una sesión de solo lectura para informes: sobre la instantánea si está
+        activa, que puede ir hasta un intervalo de refresco por detrás, y si no sobre la
+        base de datos principal. Las validaciones de los tornos no deben usarla.
+        """
+        self.engine
+        if self.instantanea is None:
+            with self.crear_sesion(escritura=False) as session:
+                yield session
+            return
+        metricas.registrar_sesion()
+        session = self.instantanea.crear_sesion()
+        try:
+            yield session
+            session.commit()
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+
+def _despues_de_fork() -> None:
+    """Deja cada Bd del proceso hijo lista para abrir sus propias conexiones"""
+    Bd._cerrojo_instancias = threading.Lock()
+    for instancia in list(Bd._instancias.values()):
+        instancia._despues_de_fork()
+
+
+os.register_at_fork(after_in_child=_despues_de_fork)
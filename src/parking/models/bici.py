@@ -1,15 +1,27 @@
 """Clase que representa una fila de la base de datos de bicis"""
 
+from typing import Optional
+
+from parking.data_utils.cache import cache_validaciones, clave
 from parking.data_utils.validators import es_campo_vacio, es_dni_unico
 from parking.models.bd import Bd, BiciORM
+from parking.models.instrumentacion import operacion
+from parking.models.resultado import CodigoError, Resultado
 
 bd = Bd()
 
 
 class Bici:
 
+    CAMPOS = ("num_serie", "dni_usuario", "marca", "modelo")
+
     def __init__(
-        self, num_serie: str, dni_usuario: str = "", marca: str = "", modelo: str = ""
+        self,
+        num_serie: str,
+        dni_usuario: str = "",
+        marca: str = "",
+        modelo: str = "",
+        base: Optional[Bd] = None,
     ) -> None:
         """
         Devuelve un objeto bici dado su número de serie (dni del usuario, marca y modelo opcional)
@@ -19,32 +31,42 @@ class Bici:
             dni_usuario (str, optional): DNI del usuario propietario de la bici. Por defecto vacío.
             marca (str, optional): Marca de la bici. Por defecto vacío.
             modelo (str, optional): Modelo de la bici. Por defecto vacío.
+            base (Optional[Bd]): Base de datos de la bici. Por defecto la principal.
         """
         self.num_serie = num_serie
         self.dni_usuario = dni_usuario
         self.marca = marca
         self.modelo = modelo
+        self.base = base
+
+    @property
+    def _bd(self) -> Bd:
+        return bd if self.base is None else self.base
 
-    def es_valido(self) -> bool:
+    def es_valido(self) -> Resultado:
         """
         Valida que la bici esté bien formada sin campos vacíos
 
         Returns:
-            bool: True si válida
+            Resultado: Correcto si es válida, si no con el campo vacío
         """
-        for key, value in vars(self).items():
-            if es_campo_vacio(value):
-                print(f"ERROR: el campo {key} no puede estar vacío")
-                return False
-        return True
-
-    def existe_usuario(self) -> bool:
-        # Mirando si el DNI es unico en el csv sabemos si existe ya
-        if not es_dni_unico(self.dni_usuario):
-            print("ERROR: el usuario no está registrado")
-            return False
+        for key in self.CAMPOS:
+            if es_campo_vacio(getattr(self, key)):
+                return Resultado.error(CodigoError.CAMPO_VACIO, key)
+        return Resultado.correcto("la bicicleta es válida")
+
+    def existe_usuario(self) -> Resultado:
+        """
+        Comprueba que el DNI de la bici sea de un usuario de su base de datos
+
+        Returns:
+            Resultado: Correcto si el usuario está registrado, si no USUARIO_NO_REGISTRADO
+        """
+        # Si el DNI es único en la tabla de usuarios es que no está registrado
+        if es_dni_unico(self.dni_usuario, self.base):
+            return Resultado.error(CodigoError.USUARIO_NO_REGISTRADO, "dni_usuario")
         else:
-            return True
+            return Resultado.correcto("el usuario está registrado")
 
     def crear_fila(self) -> BiciORM:
         """
@@ -55,47 +77,47 @@ class Bici:
         """
         return BiciORM(self.num_serie, self.dni_usuario, self.marca, self.modelo)
 
-    def guardar(self) -> bool:
+    @operacion("Bici.guardar")
+    def guardar(self) -> Resultado:
         """
-        Guarda la bici en el csv siempre y cuando sea válida, única y tenga un usuario creado
+        Guarda la bici en el csv siempre y cuando sea válida, única y tenga un usuario creado.
+        Tras confirmar la escritura invalida su número de serie en cache_validaciones.
 
         Returns:
-            bool: True si se ha guardado la bici
+            Resultado: Correcto si se ha guardado la bici, si no con el motivo
         """
-        with bd.crear_sesion() as sesion:
-            if sesion.query(BiciORM).filter_by(num_serie=self.num_serie).first():
-                print("ERROR: el número de serie ya está registrado")
-                return False
-            elif self.es_valido():
-                try:
-                    sesion.add(self.crear_fila())
-                    print("OK: se ha registrado la bicicleta")
-                    return True
-                except:
-                    print("ERROR: ha habido un error inexperado al escribir al CSV")
-                    return False
-            else:
-                return False
-
-    def borrar(self) -> bool:
+        # El try cubre también el commit al salir de la sesión, que es donde falla un bloqueo
+        try:
+            with self._bd.crear_sesion() as sesion:
+                if sesion.query(BiciORM).filter_by(num_serie=self.num_serie).first():
+                    return Resultado.error(CodigoError.SERIE_REPETIDA, "num_serie")
+                validez = self.es_valido()
+                if not validez:
+                    return validez
+                sesion.add(self.crear_fila())
+        except Exception as error:
+            return Resultado.error(CodigoError.ERROR_ESCRITURA, excepcion=error)
+
+        cache_validaciones.invalidar(clave("serie", self.num_serie, self._bd))
+        return Resultado.correcto("se ha registrado la bicicleta")
+
+    @operacion("Bici.borrar")
+    def borrar(self) -> Resultado:
         """
-        Intenta borrar la bici siempre y cuando tenga un número de serie válido
+        Intenta borrar la bici siempre y cuando tenga un número de serie válido.
+        Tras confirmar el borrado invalida su número de serie en cache_validaciones.
 
         Returns:
-            bool: _description_
+            Resultado: Correcto si se ha borrado la bici, si no con el motivo
         """
-        with bd.crear_sesion() as sesion:
-            bici = sesion.query(BiciORM).filter_by(num_serie=self.num_serie).first()
-            if bici:
-                try:
-                    sesion.delete(bici)
-                    print("OK: bicicleta borrada")
-                    return True
-                except:
-                    print(
-                        "ERROR: ha habido un error inexperado al borrar de la base de datos"
-                    )
-                    return False
-            else:
-                print("ERROR: la bicicleta no existe")
-                return False
+        try:
+            with self._bd.crear_sesion() as sesion:
+                bici = sesion.query(BiciORM).filter_by(num_serie=self.num_serie).first()
+                if not bici:
+                    return Resultado.error(CodigoError.BICI_NO_EXISTE, "num_serie")
+                sesion.delete(bici)
+        except Exception as error:
+            return Resultado.error(CodigoError.ERROR_BORRADO, excepcion=error)
+
+        cache_validaciones.invalidar(clave("serie", self.num_serie, self._bd))
+        return Resultado.correcto("bicicleta borrada")
@@ -0,0 +1,159 @@
+"""Escritor único de registros con commits agrupados.
+Los eventos de los tornos se encolan y un hilo los guarda por grupos con
+Registro.guardar_lote: una transacción por grupo en vez de una por evento. Cada
+llamante recibe un Future con el resultado de su propio evento."""
+
+from concurrent.futures import Future
+import queue
+import threading
+import time
+from typing import Optional, Union
+
+from parking.config import GRUPO_ESCRITURA
+from parking.models.registro import Registro
+from parking.models.resultado import CodigoError, Resultado
+
+_FIN = object()
+
+
+class EscritorRegistros:
+    """Hilo que agrupa los eventos que llegan dentro de una ventana de tiempo"""
+
+    def __init__(
+        self,
+        ventana: float = GRUPO_ESCRITURA["ventana"],
+        tam_maximo: int = GRUPO_ESCRITURA["tam_maximo"],
+    ) -> None:
+        """
+        Args:
+            ventana (float, optional): Segundos que se espera a más eventos tras el primero
+            tam_maximo (int, optional): Eventos máximos por grupo
+        """
+        self.ventana = ventana
+        self.tam_maximo = tam_maximo
+        self._cola: queue.Queue = queue.Queue()
+        self._hilo: Optional[threading.Thread] = None
+        self.grupos = 0
+        self.eventos = 0
+
+    def iniciar(self) -> "EscritorRegistros":
+        """Arranca el hilo escritor si no está en marcha"""
+        if self._hilo is None:
+            self._hilo = threading.Thread(
+                target=self._bucle, name="escritor-registros", daemon=True
+            )
+            self._hilo.start()
+        return self
+
+    def enviar(
+        self,
+        accion: str,
+        num_serie: str,
+        dni_usuario: str,
+        timestamp: Union[int, str, None] = None,
+    ) -> "Future[Resultado]":
+        """
+        Encola un evento y devuelve enseguida
+
+        Args:
+            accion (str): IN u OUT
+            num_serie (str): Número de serie de la bici
+            dni_usuario (str): DNI del usuario
+            timestamp (int | str | None, optional): Igual que en guardar_lote. Por defecto ahora.
+
+        Returns:
+            Future[Resultado]: Se resuelve con el resultado del evento
+        """
+        if self._hilo is None:
+            raise RuntimeError("el escritor no está iniciado")
+        futuro: Future = Future()
+        self._cola.put(((accion, num_serie, dni_usuario, timestamp), futuro))
+        return futuro
+
+    def registrar(
+        self,
+        accion: str,
+        num_serie: str,
+        dni_usuario: str,
+        timestamp: Union[int, str, None] = None,
+    ) -> Resultado:
+        """Encola un evento y espera a que su grupo se confirme"""
+        return self.enviar(accion, num_serie, dni_usuario, timestamp).result()
+
+    def cerrar(self) -> None:
+        """Guarda los eventos pendientes y para el hilo"""
+        if self._hilo is not None:
+            self._cola.put(_FIN)
+            self._hilo.join()
+            self._hilo = None
+
+    def __enter__(self) -> "EscritorRegistros":
+        return self.iniciar()
+
+    def __exit__(self, *exc) -> None:
+        self.cerrar()
+
+    def _recoger(self) -> tuple[list, bool]:
+        """
+        Espera al primer evento y recoge los que lleguen durante la ventana.
+        Devuelve el grupo y si se ha pedido cerrar.
+        """
+        primero = self._cola.get()
+        if primero is _FIN:
+            return [], True
+        grupo = [primero]
+        limite = time.monotonic() + self.ventana
+        while len(grupo) < self.tam_maximo:
+            restante = limite - time.monotonic()
+            try:
+                elemento = (
+                    self._cola.get(timeout=restante)
+                    if restante > 0
+                    else self._cola.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if elemento is _FIN:
+                return grupo, True
+            grupo.append(elemento)
+        return grupo, False
+
+    def _guardar(self, grupo: list) -> None:
+        """Guarda un grupo y resuelve el Future de cada evento"""
+        eventos = [evento for evento, _ in grupo]
+        try:
+            resultados = Registro.guardar_lote(eventos)
+            # Si falla la transacción del grupo se reintenta cada evento por separado
+            # para que un evento no haga fallar a los demás
+            if len(eventos) > 1 and all(
+                r.codigo is CodigoError.ERROR_ESCRITURA for r in resultados
+            ):
+                resultados = [Registro.guardar_lote([e])[0] for e in eventos]
+        except Exception as error:
+            for _, futuro in grupo:
+                futuro.set_exception(error)
+            return
+
+        self.grupos += 1
+        self.eventos += len(eventos)
+        for (_, futuro), resultado in zip(grupo, resultados):
+            futuro.set_result(resultado)
+
+    def _bucle(self) -> None:
+        terminar = False
+        while not terminar:
+            grupo, terminar = self._recoger()
+            if grupo:
+                self._guardar(grupo)
+
+        # Eventos encolados mientras se cerraba
+        pendientes = []
+        while True:
+            try:
+                elemento = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if elemento is not _FIN:
+                pendientes.append(elemento)
+        if pendientes:
+            self._guardar(pendientes)
@@ -0,0 +1,201 @@
+"""Funciones para mantener la tabla materializada del estado actual de cada bici
+y el contador de bicis dentro del parking"""
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from parking.models.bd import EstadoBiciORM, OcupacionORM, RegistroORM
+
+
+def actualizar_estado_bici(
+    sesion, num_serie: str, accion: str, timestamp: int, dni_usuario: str
+) -> None:
+    """
+    Inserta o actualiza la fila de estado de una bici con su último registro.
+    Se debe llamar dentro de la misma sesión que inserta el registro para que
+    ambas escrituras compartan transacción.
+
+    Args:
+        sesion (Session): Sesión abierta de la base de datos
+        num_serie (str): Número de serie de la bici
+        accion (str): Última acción registrada, IN u OUT
+        timestamp (int): Momento del último registro en microsegundos desde epoch
+        dni_usuario (str): DNI del usuario que ha hecho el último registro
+    """
+    sentencia = sqlite_insert(EstadoBiciORM).values(
+        num_serie=num_serie,
+        accion=accion,
+        timestamp=timestamp,
+        dni_usuario=dni_usuario,
+    )
+    sesion.execute(
+        sentencia.on_conflict_do_update(
+            index_elements=[EstadoBiciORM.num_serie],
+            set_={
+                "accion": sentencia.excluded.accion,
+                "timestamp": sentencia.excluded.timestamp,
+                "dni_usuario": sentencia.excluded.dni_usuario,
+            },
+        )
+    )
+
+
+def actualizar_estados(
+    sesion, filas: list[dict], solo_posteriores: bool = False
+) -> None:
+    """
+    Actualiza en bloque el estado de varias bicis con una sola sentencia.
+    Con solo_posteriores únicamente se sobrescribe el estado guardado si el registro dado
+    es más reciente, pensado para cargas de histórico donde los registros importados
+    pueden ser anteriores a los que ya hay en la base de datos.
+
+    Args:
+        sesion (Session): Sesión abierta de la base de datos
+        filas (list[dict]): Último registro de cada bici con num_serie, accion, timestamp y dni_usuario
+        solo_posteriores (bool, optional): Respetar estados más recientes. Por defecto False.
+    """
+    if not filas:
+        return
+    sentencia = sqlite_insert(EstadoBiciORM)
+    sesion.execute(
+        sentencia.on_conflict_do_update(
+            index_elements=[EstadoBiciORM.num_serie],
+            set_={
+                "accion": sentencia.excluded.accion,
+                "timestamp": sentencia.excluded.timestamp,
+                "dni_usuario": sentencia.excluded.dni_usuario,
+            },
+            where=(
+                sentencia.excluded.timestamp >= EstadoBiciORM.timestamp
+                if solo_posteriores
+                else None
+            ),
+        ),
+        filas,
+    )
+
+
+def _ultimos_registros():
+    """
+    Consulta con el último registro de cada bici: el de mayor timestamp y, si
+    coinciden, el de mayor id
+    """
+    orden = (
+        func.row_number()
+        .over(
+            partition_by=RegistroORM.num_serie,
+            order_by=(RegistroORM.timestamp.desc(), RegistroORM.id.desc()),
+        )
+        .label("orden")
+    )
+    ordenados = select(
+        RegistroORM.num_serie,
+        RegistroORM.accion,
+        RegistroORM.timestamp,
+        RegistroORM.dni_usuario,
+        orden,
+    ).subquery()
+    return (
+        select(
+            ordenados.c.num_serie,
+            ordenados.c.accion,
+            ordenados.c.timestamp,
+            ordenados.c.dni_usuario,
+        )
+        .where(ordenados.c.orden == 1)
+        .subquery()
+    )
+
+
+def reconstruir_estado_bicis(conexion) -> int:
+    """
+    Vacía la tabla de estado y la vuelve a calcular a partir del último registro de cada bici.
+    El último registro es el de mayor timestamp y, si coinciden, el de mayor id.
+
+    Args:
+        conexion (Connection | Session): Conexión o sesión con una transacción abierta
+
+    Returns:
+        int: Número de bicis con estado tras la reconstrucción
+    """
+    conexion.execute(delete(EstadoBiciORM))
+    resultado = conexion.execute(
+        insert(EstadoBiciORM).from_select(
+            ["num_serie", "accion", "timestamp", "dni_usuario"],
+            select(_ultimos_registros()),
+        )
+    )
+    return resultado.rowcount
+
+
+def actualizar_ocupacion(sesion, diferencia: int) -> None:
+    """
+    Suma la diferencia al contador de bicis dentro del parking, creando la fila si falta.
+    Se debe llamar en la misma sesión que inserta los registros.
+
+    Args:
+        sesion (Session): Sesión abierta de la base de datos
+        diferencia (int): Entradas menos salidas
+    """
+    if not diferencia:
+        return
+    sentencia = sqlite_insert(OcupacionORM).values(id=1, bicis=diferencia)
+    sesion.execute(
+        sentencia.on_conflict_do_update(
+            index_elements=[OcupacionORM.id],
+            set_={"bicis": OcupacionORM.bicis + sentencia.excluded.bicis},
+        )
+    )
+
+
+def consulta_ocupacion():
+    """
+    Subconsulta escalar con el número de bicis dentro del parking, NULL si nunca ha entrado ninguna
+
+    Returns:
+        ScalarSelect: Subconsulta para usar dentro de otro select
+    """
+    return select(OcupacionORM.bicis).where(OcupacionORM.id == 1).scalar_subquery()
+
+
+def leer_ocupacion(sesion) -> int:
+    """
+    Devuelve el número de bicis dentro del parking sin recorrer los registros
+
+    Args:
+        sesion (Session): Sesión abierta de la base de datos
+
+    Returns:
+        int: Bicis cuya última acción es IN
+    """
+    return sesion.execute(select(consulta_ocupacion())).scalar() or 0
+
+
+def reconciliar_ocupacion(conexion, desde_registros: bool = True) -> int:
+    """
+    Recalcula el contador de ocupación y lo sobrescribe.
+    Por defecto cuenta las bicis cuyo último registro es IN recorriendo el histórico,
+    sin fiarse de estado_bicis. Con desde_registros=False cuenta desde estado_bicis,
+    que es mucho más barato si se sabe que el estado está al día.
+
+    Args:
+        conexion (Connection | Session): Conexión o sesión con una transacción abierta
+        desde_registros (bool, optional): Calcular desde registros. Por defecto True.
+
+    Returns:
+        int: Bicis dentro del parking
+    """
+    if desde_registros:
+        ultimos = _ultimos_registros()
+        consulta = select(func.count()).where(ultimos.c.accion == "IN")
+    else:
+        consulta = select(func.count()).where(EstadoBiciORM.accion == "IN")
+    bicis = conexion.execute(consulta).scalar()
+
+    sentencia = sqlite_insert(OcupacionORM).values(id=1, bicis=bicis)
+    conexion.execute(
+        sentencia.on_conflict_do_update(
+            index_elements=[OcupacionORM.id], set_={"bicis": bicis}
+        )
+    )
+    return bicis
@@ -0,0 +1,200 @@
+"""Copia de solo lectura de la base de datos para informes.
+La analítica, las exportaciones y el historial pueden leer de una instantánea que se
+rehace cada cierto tiempo con la API de backup de SQLite, así sus consultas largas no
+compiten por la caché ni por el WAL con las escrituras de los tornos. Cada copia es un
+archivo nuevo con versión, ruta.<nanosegundos>: las sesiones abiertas siguen leyendo la
+copia vieja, las nuevas abren la última y las versiones anteriores se borran cuando ya
+no se usan. Nunca se sobrescribe un archivo abierto, que Windows no permite.
+Como una copia no se modifica nunca se abre con immutable=1 y SQLite no usa cerrojos."""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from parking.config import PERFIL_BD
+
+# Pragmas de PERFIL_BD que tienen sentido en una copia de solo lectura
+_PRAGMAS_LECTURA = ("cache_size", "mmap_size", "temp_store")
+
+_registro = logging.getLogger("parking.instantanea")
+
+
+class Instantanea:
+    """Instantánea de una base de datos SQLite con su propio motor de solo lectura"""
+
+    def __init__(self, engine, ruta: str, perfil: Optional[dict] = None) -> None:
+        """
+        Args:
+            engine (Engine): Motor de la base de datos principal
+            ruta (str): Archivo de la instantánea, cada refresco crea ruta.<versión>
+            perfil (Optional[dict]): Perfil del que se toman la caché y el pool. Por defecto PERFIL_BD.
+        """
+        perfil = PERFIL_BD if perfil is None else perfil
+        self.origen = engine
+        self.ruta = ruta
+        self.perfil = {
+            "pragmas": {
+                nombre: valor
+                for nombre, valor in perfil.get("pragmas", {}).items()
+                if nombre in _PRAGMAS_LECTURA
+            },
+            "pool": perfil.get("pool", {}),
+        }
+        self.engine = None
+        self.Session = None
+        # Momento del último refresco según time.time(), None si aún no hay copia
+        self.refrescada: Optional[float] = None
+        # Archivo de la versión abierta ahora
+        self.version: Optional[str] = None
+        self._cerrojo = threading.Lock()
+        self._hilo: Optional[Refresco] = None
+
+    def versiones(self) -> list[tuple[int, str]]:
+        """
+        Returns:
+            list[tuple[int, str]]: (versión, archivo) de las copias que hay en disco, en orden
+        """
+        carpeta = os.path.dirname(self.ruta) or "."
+        prefijo = f"{os.path.basename(self.ruta)}."
+        encontradas = []
+        for nombre in os.listdir(carpeta):
+            sufijo = nombre[len(prefijo) :]
+            if nombre.startswith(prefijo) and sufijo.isdigit():
+                encontradas.append((int(sufijo), os.path.join(carpeta, nombre)))
+        return sorted(encontradas)
+
+    def refrescar(self) -> None:
+        """
+        Copia la base de datos principal en una sola lectura, que en modo WAL no bloquea
+        a los escritores, cambia el motor de lectura a la copia nueva y borra las anteriores
+        """
+        # Con el pid para que varios procesos puedan refrescar la misma copia a la vez
+        temporal = f"{self.ruta}.{os.getpid()}.tmp"
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        with self.origen.connect() as conexion:
+            destino = sqlite3.connect(temporal)
+            try:
+                conexion.connection.driver_connection.backup(destino)
+                # Sin WAL la copia es un único archivo que se puede abrir como inmutable
+                destino.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                destino.close()
+        # El destino no existe todavía, así que el rename funciona también en Windows
+        version = f"{self.ruta}.{time.time_ns()}"
+        os.replace(temporal, version)
+        self._abrir_copia(version)
+        self._borrar_anteriores()
+
+    def _abrir_copia(self, version: str) -> None:
+        """Cambia el motor de lectura al archivo de la versión dada"""
+        # import diferido para evitar el ciclo bd <-> instantanea
+        from parking.models.bd import crear_motor
+
+        engine = crear_motor(
+            f"file:{version}?mode=ro&immutable=1&uri=true", self.perfil
+        )
+        with self._cerrojo:
+            anterior = self.engine
+            self.engine = engine
+            self.Session = sessionmaker(bind=engine, expire_on_commit=False)
+            self.refrescada = time.time()
+            self.version = version
+        # Solo cierra las conexiones libres, las sesiones en curso terminan con la copia vieja
+        if anterior is not None:
+            anterior.dispose()
+
+    def _borrar_anteriores(self) -> None:
+        """
+        Borra las versiones anteriores a la abierta. Si alguna sigue abierta, por una
+        sesión en curso o por otro proceso, Windows no deja borrarla y se vuelve a
+        intentar en el siguiente refresco.
+        """
+        for _, archivo in self.versiones():
+            if archivo == self.version:
+                break
+            try:
+                os.remove(archivo)
+            except OSError:
+                pass
+
+    def crear_sesion(self):
+        """
+        Returns:
+            Session: Sesión nueva sobre la última copia, creándola si aún no hay ninguna
+        """
+        versiones = self.versiones()
+        if not versiones:
+            self.refrescar()
+        elif versiones[-1][1] != self.version:
+            # Otro proceso, por ejemplo el padre tras un fork, ha dejado una copia nueva
+            self._abrir_copia(versiones[-1][1])
+        with self._cerrojo:
+            return self.Session()
+
+    def iniciar(self, intervalo: float) -> "Instantanea":
+        """
+        Refresca la copia ahora y después cada intervalo segundos en un hilo
+
+        Args:
+            intervalo (float): Segundos entre refrescos
+
+        Returns:
+            Instantanea: La propia instantánea, para encadenar
+        """
+        self.refrescar()
+        self._hilo = Refresco(self, intervalo)
+        self._hilo.start()
+        return self
+
+    def despues_de_fork(self) -> None:
+        """
+        En un proceso hijo descarta las conexiones heredadas sin cerrarlas. El hilo de
+        refresco no pasa al hijo: sigue refrescando el padre y el hijo abre cada copia
+        nueva al crear una sesión.
+        """
+        self._cerrojo = threading.Lock()
+        self._hilo = None
+        if self.engine is not None:
+            self.engine.dispose(close=False)
+
+    def parar(self) -> None:
+        """Detiene el refresco periódico y cierra el motor de la copia"""
+        if self._hilo is not None:
+            self._hilo.parar()
+            self._hilo = None
+        if self.engine is not None:
+            self.engine.dispose()
+
+
+class Refresco(threading.Thread):
+    """Hilo que rehace la instantánea cada cierto tiempo"""
+
+    def __init__(self, instantanea: Instantanea, intervalo: float):
+        """
+        Args:
+            instantanea (Instantanea): Instantánea que se refresca
+            intervalo (float): Segundos entre refrescos
+        """
+        super().__init__(name="refresco-instantanea", daemon=True)
+        self.instantanea = instantanea
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+
+    def run(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.instantanea.refrescar()
+            except Exception:
+                # Se sigue leyendo la copia anterior hasta el siguiente intento
+                _registro.exception("no se ha podido refrescar la instantánea")
+
+    def parar(self) -> None:
+        """Termina el hilo tras el refresco en curso, si lo hay"""
+        self._parar.set()
+        self.join()
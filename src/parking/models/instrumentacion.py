@@ -0,0 +1,310 @@
+"""Instrumentación opcional del acceso a la base de datos.
+Con los eventos before/after_cursor_execute del motor se cuenta y cronometra cada
+sentencia agrupada por su forma (el SQL sin valores), y con el decorador operacion se
+cuentan las sesiones y sentencias de cada operación de alto nivel, por ejemplo cuántas
+idas y vueltas a SQLite cuesta un Registro.guardar. Las métricas se exportan en formato
+de texto de Prometheus o como una línea de log.
+
+Está desactivada por defecto, se activa con INSTRUMENTACION en config.py o llamando a
+activar(engine). Desactivada, el decorador solo añade una comprobación."""
+
+from contextvars import ContextVar
+from functools import wraps
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import Engine, event
+
+# Límites superiores de los cubos de los histogramas, en segundos
+CUBOS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+)
+
+SIN_OPERACION = "sin_operacion"
+
+_operacion_actual: ContextVar[Optional[str]] = ContextVar("operacion", default=None)
+_registro = logging.getLogger("parking.instrumentacion")
+
+_PATRON_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_PATRON_NUMERO = re.compile(r"\b\d+\b")
+_PATRON_ESPACIOS = re.compile(r"\s+")
+
+
+def forma_sentencia(sql: str) -> str:
+    """
+    Devuelve la forma de una sentencia: espacios normalizados, números como N y las
+    listas de parámetros de IN o VALUES reducidas a un solo elemento
+
+    Args:
+        sql (str): Sentencia tal y como se envía a SQLite
+
+    Returns:
+        str: Forma con la que se agrupan las métricas
+    """
+    forma = _PATRON_ESPACIOS.sub(" ", sql).strip()
+    forma = _PATRON_LISTA.sub("(?, ...)", forma)
+    return _PATRON_NUMERO.sub("N", forma)
+
+
+class Histograma:
+    """Histograma acumulado al estilo de Prometheus"""
+
+    def __init__(self) -> None:
+        self.cubos = [0] * len(CUBOS)
+        self.cuenta = 0
+        self.suma = 0.0
+
+    def observar(self, segundos: float) -> None:
+        self.cuenta += 1
+        self.suma += segundos
+        for i, limite in enumerate(CUBOS):
+            if segundos <= limite:
+                self.cubos[i] += 1
+
+
+class Metricas:
+    """Métricas acumuladas del proceso, seguras entre hilos"""
+
+    def __init__(self) -> None:
+        self._cerrojo = threading.Lock()
+        self.activa = False
+        self.reiniciar()
+
+    def reiniciar(self) -> None:
+        """Pone todas las métricas a cero"""
+        with self._cerrojo:
+            self.sentencias: dict[str, Histograma] = {}
+            self.operaciones: dict[str, Histograma] = {}
+            self.sesiones: dict[str, int] = {}
+            self.sentencias_por_operacion: dict[str, int] = {}
+
+    def registrar_sentencia(self, sql: str, segundos: float) -> None:
+        forma = forma_sentencia(sql)
+        operacion = _operacion_actual.get() or SIN_OPERACION
+        with self._cerrojo:
+            self.sentencias.setdefault(forma, Histograma()).observar(segundos)
+            self.sentencias_por_operacion[operacion] = (
+                self.sentencias_por_operacion.get(operacion, 0) + 1
+            )
+
+    def registrar_sesion(self) -> None:
+        if not self.activa:
+            return
+        operacion = _operacion_actual.get() or SIN_OPERACION
+        with self._cerrojo:
+            self.sesiones[operacion] = self.sesiones.get(operacion, 0) + 1
+
+    def registrar_operacion(self, nombre: str, segundos: float) -> None:
+        with self._cerrojo:
+            self.operaciones.setdefault(nombre, Histograma()).observar(segundos)
+
+    def por_operacion(self) -> dict[str, dict[str, float]]:
+        """
+        Resume cada operación con sus llamadas y las sesiones y sentencias medias por llamada
+
+        Returns:
+            dict[str, dict[str, float]]: Por operación, llamadas, sesiones, sentencias y ms medios
+        """
+        with self._cerrojo:
+            resumen = {}
+            for nombre, histograma in self.operaciones.items():
+                llamadas = histograma.cuenta or 1
+                resumen[nombre] = {
+                    "llamadas": histograma.cuenta,
+                    "sesiones": self.sesiones.get(nombre, 0) / llamadas,
+                    "sentencias": self.sentencias_por_operacion.get(nombre, 0)
+                    / llamadas,
+                    "ms": histograma.suma * 1000 / llamadas,
+                }
+            return resumen
+
+
+metricas = Metricas()
+
+
+def _antes_de_sentencia(conexion, cursor, sql, parametros, contexto, executemany):
+    # En el contexto de la ejecución y no en la conexión: si la sentencia falla no hay
+    # after_cursor_execute y el inicio se descarta con el contexto
+    if contexto is not None:
+        contexto._inicio_instrumentacion = time.perf_counter()
+
+
+def _despues_de_sentencia(conexion, cursor, sql, parametros, contexto, executemany):
+    inicio = getattr(contexto, "_inicio_instrumentacion", None)
+    if inicio is not None:
+        metricas.registrar_sentencia(sql, time.perf_counter() - inicio)
+
+
+def activar(engine: Engine) -> None:
+    """
+    Empieza a medir las sentencias del motor y las operaciones decoradas
+
+    Args:
+        engine (Engine): Motor de la base de datos
+    """
+    if not event.contains(engine, "before_cursor_execute", _antes_de_sentencia):
+        event.listen(engine, "before_cursor_execute", _antes_de_sentencia)
+        event.listen(engine, "after_cursor_execute", _despues_de_sentencia)
+    metricas.activa = True
+
+
+def desactivar(engine: Engine) -> None:
+    """
+    Deja de medir, las métricas acumuladas se conservan
+
+    Args:
+        engine (Engine): Motor de la base de datos
+    """
+    if event.contains(engine, "before_cursor_execute", _antes_de_sentencia):
+        event.remove(engine, "before_cursor_execute", _antes_de_sentencia)
+        event.remove(engine, "after_cursor_execute", _despues_de_sentencia)
+    metricas.activa = False
+
+
+def operacion(nombre: str) -> Callable:
+    """
+    Decorador que atribuye a la operación las sesiones y sentencias que se hagan dentro.
+    Si ya hay una operación en curso, por ejemplo una validación dentro de un guardar,
+    se cuenta todo en la de fuera.
+
+    Args:
+        nombre (str): Nombre de la operación, por ejemplo Registro.guardar
+
+    Returns:
+        Callable: Decorador
+    """
+
+    def decorador(funcion: Callable) -> Callable:
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not metricas.activa or _operacion_actual.get() is not None:
+                return funcion(*args, **kwargs)
+            marca = _operacion_actual.set(nombre)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                metricas.registrar_operacion(nombre, time.perf_counter() - inicio)
+                _operacion_actual.reset(marca)
+
+        return envoltura
+
+    return decorador
+
+
+def _etiqueta(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _histogramas(nombre: str, etiqueta: str, datos: dict[str, Histograma]) -> list[str]:
+    lineas = [f"# TYPE {nombre} histogram"]
+    for clave, histograma in sorted(datos.items()):
+        valor = _etiqueta(clave)
+        for limite, cuenta in zip(CUBOS, histograma.cubos):
+            lineas.append(
+                f'{nombre}_bucket{{{etiqueta}="{valor}",le="{limite}"}} {cuenta}'
+            )
+        lineas.append(
+            f'{nombre}_bucket{{{etiqueta}="{valor}",le="+Inf"}} {histograma.cuenta}'
+        )
+        lineas.append(f'{nombre}_sum{{{etiqueta}="{valor}"}} {histograma.suma:.6f}')
+        lineas.append(f'{nombre}_count{{{etiqueta}="{valor}"}} {histograma.cuenta}')
+    return lineas
+
+
+def a_prometheus() -> str:
+    """
+    Devuelve las métricas en formato de texto de Prometheus
+
+    Returns:
+        str: Texto listo para un archivo del node exporter o un endpoint /metrics
+    """
+    with metricas._cerrojo:
+        lineas = _histogramas("parking_sql_segundos", "sentencia", metricas.sentencias)
+        lineas += _histogramas(
+            "parking_operacion_segundos", "operacion", metricas.operaciones
+        )
+        for nombre, datos in (
+            ("parking_sesiones_total", metricas.sesiones),
+            ("parking_sentencias_total", metricas.sentencias_por_operacion),
+        ):
+            lineas.append(f"# TYPE {nombre} counter")
+            for clave, cuenta in sorted(datos.items()):
+                lineas.append(f'{nombre}{{operacion="{_etiqueta(clave)}"}} {cuenta}')
+    return "\n".join(lineas) + "\n"
+
+
+def escribir_prometheus(ruta: str) -> None:
+    """
+    Escribe las métricas en un archivo de texto de Prometheus, de forma atómica
+
+    Args:
+        ruta (str): Ruta del archivo .prom
+    """
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        archivo.write(a_prometheus())
+    os.replace(temporal, ruta)
+
+
+def linea_log() -> str:
+    """
+    Resume en una línea las sesiones, sentencias y milisegundos medios por operación
+
+    Returns:
+        str: Por ejemplo "Registro.guardar llamadas=10 sesiones=1.0 sentencias=5.0 ms=2.1"
+    """
+    return " | ".join(
+        f"{nombre} llamadas={datos['llamadas']} sesiones={datos['sesiones']:.1f} "
+        f"sentencias={datos['sentencias']:.1f} ms={datos['ms']:.2f}"
+        for nombre, datos in sorted(metricas.por_operacion().items())
+    )
+
+
+class Exportador(threading.Thread):
+    """Hilo que cada cierto tiempo escribe el archivo de Prometheus y la línea de log"""
+
+    def __init__(self, intervalo: float, ruta_prometheus: Optional[str] = None):
+        """
+        Args:
+            intervalo (float): Segundos entre exportaciones
+            ruta_prometheus (Optional[str]): Archivo .prom, si no solo se escribe el log
+        """
+        super().__init__(name="exportador-metricas", daemon=True)
+        self.intervalo = intervalo
+        self.ruta_prometheus = ruta_prometheus
+        self._parar = threading.Event()
+
+    def exportar(self) -> None:
+        if self.ruta_prometheus:
+            escribir_prometheus(self.ruta_prometheus)
+        _registro.info(linea_log())
+
+    def run(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.exportar()
+            except Exception:
+                # Un fallo al escribir el archivo no detiene las siguientes exportaciones
+                _registro.exception("no se han podido exportar las métricas")
+
+    def parar(self) -> None:
+        """Exporta por última vez y termina el hilo"""
+        self._parar.set()
+        self.join()
+        self.exportar()
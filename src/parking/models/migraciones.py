@@ -0,0 +1,240 @@
+"""Migraciones versionadas del esquema de la base de datos.
+La versión aplicada se guarda en PRAGMA user_version del propio archivo SQLite.
+Las sentencias están escritas en SQL fijo para que una migración antigua no cambie
+aunque evolucionen los modelos ORM."""
+
+from sqlalchemy import Engine, inspect
+
+from parking.models.bd import Base
+
+
+def _crear_estado_bicis(conexion) -> None:
+    """Tabla estado_bicis calculada desde el último registro de cada bici"""
+    conexion.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS estado_bicis ("
+        "num_serie VARCHAR NOT NULL, "
+        "accion VARCHAR NOT NULL, "
+        "timestamp VARCHAR NOT NULL, "
+        "dni_usuario VARCHAR NOT NULL, "
+        "PRIMARY KEY (num_serie), "
+        "FOREIGN KEY(num_serie) REFERENCES bicis (num_serie), "
+        "FOREIGN KEY(dni_usuario) REFERENCES usuarios (dni))"
+    )
+    conexion.exec_driver_sql("DELETE FROM estado_bicis")
+    conexion.exec_driver_sql(
+        "INSERT INTO estado_bicis (num_serie, accion, timestamp, dni_usuario) "
+        "SELECT r.num_serie, r.accion, r.timestamp, r.dni_usuario FROM registros r "
+        "JOIN (SELECT num_serie, MAX(timestamp) AS timestamp FROM registros "
+        "GROUP BY num_serie) u "
+        "ON r.num_serie = u.num_serie AND r.timestamp = u.timestamp"
+    )
+
+
+def _crear_indices(conexion) -> None:
+    """Índices para buscar registros por bici o usuario y bicis por usuario"""
+    conexion.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_registros_num_serie_timestamp "
+        "ON registros (num_serie, timestamp)"
+    )
+    conexion.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_registros_dni_usuario_timestamp "
+        "ON registros (dni_usuario, timestamp)"
+    )
+    conexion.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_bicis_dni_usuario ON bicis (dni_usuario)"
+    )
+
+
+def _registros_con_id(conexion) -> None:
+    """
+    Clave sustituta autoincremental en registros y timestamps enteros en microsegundos.
+    Las fechas antiguas se guardaban como texto en hora local con TIMESTAMP_FMT.
+    """
+    conexion.exec_driver_sql(
+        "CREATE TABLE registros_nueva ("
+        "id INTEGER NOT NULL, "
+        "timestamp INTEGER NOT NULL, "
+        "accion VARCHAR, "
+        "num_serie VARCHAR NOT NULL, "
+        "dni_usuario VARCHAR NOT NULL, "
+        "PRIMARY KEY (id), "
+        "FOREIGN KEY(num_serie) REFERENCES bicis (num_serie), "
+        "FOREIGN KEY(dni_usuario) REFERENCES usuarios (dni))"
+    )
+    conexion.exec_driver_sql(
+        "INSERT INTO registros_nueva (timestamp, accion, num_serie, dni_usuario) "
+        "SELECT CAST(strftime('%s', timestamp, 'utc') AS INTEGER) * 1000000, "
+        "accion, num_serie, dni_usuario FROM registros ORDER BY timestamp"
+    )
+    conexion.exec_driver_sql("DROP TABLE registros")
+    conexion.exec_driver_sql("ALTER TABLE registros_nueva RENAME TO registros")
+    _crear_indices(conexion)
+
+    conexion.exec_driver_sql("DROP TABLE estado_bicis")
+    conexion.exec_driver_sql(
+        "CREATE TABLE estado_bicis ("
+        "num_serie VARCHAR NOT NULL, "
+        "accion VARCHAR NOT NULL, "
+        "timestamp INTEGER NOT NULL, "
+        "dni_usuario VARCHAR NOT NULL, "
+        "PRIMARY KEY (num_serie), "
+        "FOREIGN KEY(num_serie) REFERENCES bicis (num_serie), "
+        "FOREIGN KEY(dni_usuario) REFERENCES usuarios (dni))"
+    )
+    conexion.exec_driver_sql(
+        "INSERT INTO estado_bicis (num_serie, accion, timestamp, dni_usuario) "
+        "SELECT r.num_serie, r.accion, r.timestamp, r.dni_usuario FROM registros r "
+        "JOIN (SELECT MAX(id) AS id FROM registros GROUP BY num_serie) u "
+        "ON r.id = u.id"
+    )
+
+
+def _crear_ocupacion(conexion) -> None:
+    """Contador de bicis dentro del parking, inicializado desde el estado de cada bici"""
+    conexion.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS ocupacion ("
+        "id INTEGER NOT NULL, "
+        "bicis INTEGER NOT NULL, "
+        "PRIMARY KEY (id))"
+    )
+    conexion.exec_driver_sql(
+        "INSERT OR REPLACE INTO ocupacion (id, bicis) "
+        "SELECT 1, COUNT(*) FROM estado_bicis WHERE accion = 'IN'"
+    )
+
+
+def _crear_resumenes(conexion) -> None:
+    """
+    Tablas de resúmenes por hora y por día, marcas de agua e índice por timestamp.
+    Los resúmenes quedan vacíos con la marca a 0: la primera actualización o
+    mantenimiento.py resumenes --reconstruir los calcula desde el histórico.
+    """
+    for tabla, clave in (
+        ("resumen_horas", "hora INTEGER"),
+        ("resumen_dias", "dia VARCHAR"),
+    ):
+        conexion.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {tabla} ("
+            f"{clave} NOT NULL, "
+            "entradas INTEGER NOT NULL, "
+            "salidas INTEGER NOT NULL, "
+            "bicis INTEGER NOT NULL, "
+            "usuarios INTEGER NOT NULL, "
+            "pico INTEGER NOT NULL, "
+            "final INTEGER NOT NULL, "
+            f"PRIMARY KEY ({clave.split()[0]}))"
+        )
+    conexion.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS marcas ("
+        "nombre VARCHAR NOT NULL, "
+        "valor INTEGER NOT NULL, "
+        "PRIMARY KEY (nombre))"
+    )
+    conexion.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_registros_timestamp ON registros (timestamp)"
+    )
+
+
+def _crear_analitica(conexion) -> None:
+    """Tabla con el estado de los analizadores, vacía: el primero empieza desde el corte"""
+    conexion.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS analitica ("
+        "nombre VARCHAR NOT NULL, "
+        "datos JSON NOT NULL, "
+        "PRIMARY KEY (nombre))"
+    )
+
+
+def _registros_unicos(conexion) -> None:
+    """
+    Índice único por (num_serie, timestamp, accion). Antes se borran los eventos repetidos
+    dejando el de menor id; si había alguno se borra la marca de los resúmenes para que
+    la siguiente actualización los vuelva a calcular sin ellos.
+    """
+    borrados = conexion.exec_driver_sql(
+        "DELETE FROM registros WHERE id NOT IN ("
+        "SELECT MIN(id) FROM registros GROUP BY num_serie, timestamp, accion)"
+    ).rowcount
+    if borrados:
+        conexion.exec_driver_sql("DELETE FROM marcas WHERE nombre = 'resumenes'")
+    conexion.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_registros_evento "
+        "ON registros (num_serie, timestamp, accion)"
+    )
+
+
+# Lista ordenada de (versión, descripción, función). Nunca se edita una migración
+# ya publicada, los cambios nuevos se añaden al final con la siguiente versión.
+MIGRACIONES = [
+    (1, "tabla estado_bicis", _crear_estado_bicis),
+    (2, "índices de registros y bicis", _crear_indices),
+    (3, "id autoincremental y timestamps en microsegundos", _registros_con_id),
+    (4, "contador de ocupación", _crear_ocupacion),
+    (5, "resúmenes por hora y día", _crear_resumenes),
+    (6, "estado de la analítica", _crear_analitica),
+    (7, "registros sin eventos repetidos", _registros_unicos),
+]
+
+VERSION_ESQUEMA = MIGRACIONES[-1][0]
+
+# Vistas que no tienen datos propios, se recrean si faltan tras preparar el esquema.
+# registros_texto mantiene el formato de texto original (TIMESTAMP_FMT en hora local).
+VISTAS = [
+    "CREATE VIEW IF NOT EXISTS registros_texto AS "
+    "SELECT id, strftime('%Y-%m-%d %H:%M:%S', timestamp / 1000000, 'unixepoch', "
+    "'localtime') AS timestamp, accion, num_serie, dni_usuario FROM registros",
+]
+
+
+def version_actual(conexion) -> int:
+    """
+    Devuelve la versión del esquema guardada en la base de datos
+
+    Args:
+        conexion (Connection): Conexión abierta a la base de datos
+
+    Returns:
+        int: Versión aplicada, 0 si nunca se ha migrado
+    """
+    return conexion.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def preparar_esquema(engine: Engine) -> list[int]:
+    """
+    Deja la base de datos en la última versión del esquema.
+    Si está vacía crea todas las tablas con los modelos y la marca como actualizada,
+    si ya existía aplica en orden las migraciones pendientes. Cada paso lee la versión
+    dentro de su propia transacción BEGIN IMMEDIATE, así que si varios procesos abren
+    a la vez la misma base de datos antigua cada migración se aplica una sola vez.
+
+    Args:
+        engine (Engine): Motor de la base de datos creado con crear_motor
+
+    Returns:
+        list[int]: Versiones de las migraciones aplicadas por esta llamada
+    """
+    motor = engine.execution_options(modo_begin="IMMEDIATE")
+    with engine.connect() as conexion:
+        al_dia = version_actual(conexion) >= VERSION_ESQUEMA
+
+    aplicadas = []
+    if not al_dia:
+        with motor.begin() as conexion:
+            if not inspect(conexion).has_table("usuarios"):
+                Base.metadata.create_all(conexion)
+                conexion.exec_driver_sql(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+        for numero, _, migracion in MIGRACIONES:
+            with motor.begin() as conexion:
+                # Otro proceso puede haberla aplicado mientras se esperaba el cerrojo
+                if version_actual(conexion) >= numero:
+                    continue
+                migracion(conexion)
+                conexion.exec_driver_sql(f"PRAGMA user_version = {numero}")
+            aplicadas.append(numero)
+
+    with motor.begin() as conexion:
+        # Las tablas nuevas que no necesitan migración de datos se crean directamente
+        Base.metadata.create_all(conexion)
+        for vista in VISTAS:
+            conexion.exec_driver_sql(vista)
+    return aplicadas
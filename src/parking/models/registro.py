@@ -1,24 +1,53 @@
 """Clase que representa una fila de la base de datos de bicis"""
 
-from datetime import datetime
+from typing import NamedTuple, Optional, Union
 
-from parking.models.bd import Bd, RegistroORM
-from parking.models.usuario import Usuario
+from sqlalchemy import Row, exists, insert, select
+
+from parking.config import CAPACIDAD_MAXIMA
+from parking.models.bd import Bd, BiciORM, EstadoBiciORM, RegistroORM, UsuarioORM
+from parking.models.instrumentacion import operacion
+from parking.models.resultado import CodigoError, Resultado
+from parking.models.estado import (
+    actualizar_estado_bici,
+    actualizar_estados,
+    actualizar_ocupacion,
+    consulta_ocupacion,
+)
+from parking.data_utils.tiempo import ahora_microsegundos, texto_a_microsegundos
 from parking.data_utils.validators import (
+    admite_entrada,
+    admite_salida,
     es_campo_vacio,
-    puede_entrar,
-    puede_salir,
-    es_dni_unico,
-    es_serie_unica,
 )
-from ..config import TIMESTAMP_FMT
 
 bd = Bd()
 
+OK_REGISTRO = "se ha registrado el registro"
+
+
+class ContextoRegistro(NamedTuple):
+    """Datos de la base de datos necesarios para validar un registro"""
+
+    existe_usuario: bool
+    existe_bici: bool
+    es_propietario: bool
+    ultima_accion: Optional[str]
+    ocupadas: Optional[int]
+
 
 class Registro:
 
-    def __init__(self, accion: str, num_serie: str, dni_usuario: str) -> None:
+    CAMPOS = ("timestamp", "accion", "num_serie", "dni_usuario")
+
+    def __init__(
+        self,
+        accion: str,
+        num_serie: str,
+        dni_usuario: str,
+        timestamp: Optional[int] = None,
+        base: Optional[Bd] = None,
+    ) -> None:
         """
         Genera un objeto registro dado sus datos
 
@@ -26,55 +55,187 @@ class Registro:
             accion (str): IN para meter la bici, OUT para sacarla
             num_serie (str): Número de serie de la bicicleta
             dni_usuario (str): DNI del propietario de la bicicleta
+            timestamp (Optional[int]): Momento del evento en microsegundos. Por defecto ahora.
+            base (Optional[Bd]): Base de datos del registro. Por defecto la principal.
         """
-        self.timestamp = datetime.now().strftime(TIMESTAMP_FMT)
+        self.timestamp = ahora_microsegundos() if timestamp is None else timestamp
         self.accion = accion
         self.num_serie = num_serie
         self.dni_usuario = dni_usuario
+        self.base = base
+
+    @property
+    def _bd(self) -> Bd:
+        return bd if self.base is None else self.base
 
-    def es_valido(self) -> bool:
+    def consultar_contexto(self, sesion) -> Row:
         """
-        Valida que el registro esté bien formado sin campos vacíos y con un usuario y bici existentes
+        Obtiene en una sola consulta todo lo que hace falta para validar el registro:
+        si existen el usuario y la bici, si la bici es del usuario, su última acción
+        y las bicis que hay dentro del parking. Todas las subconsultas buscan por clave primaria.
+
+        Args:
+            sesion (Session): Sesión abierta de la base de datos
 
         Returns:
-            bool: True si valido.
-        """
-        for key, value in vars(self).items():
-            if es_campo_vacio(value):
-                print(f"ERROR: el campo {key} no puede estar vacío")
-                return False
-        if es_dni_unico(self.dni_usuario):
-            print("ERROR: el usuario no está registrado")
-            return False
-        elif es_serie_unica(self.num_serie):
-            print("ERROR: la bicicleta no está registrada")
-            return False
+            Row: Fila con existe_usuario, existe_bici, es_propietario, ultima_accion y ocupadas
+        """
+        return sesion.execute(
+            select(
+                exists()
+                .where(UsuarioORM.dni == self.dni_usuario)
+                .label("existe_usuario"),
+                exists()
+                .where(BiciORM.num_serie == self.num_serie)
+                .label("existe_bici"),
+                exists()
+                .where(
+                    BiciORM.num_serie == self.num_serie,
+                    BiciORM.dni_usuario == self.dni_usuario,
+                )
+                .label("es_propietario"),
+                select(EstadoBiciORM.accion)
+                .where(EstadoBiciORM.num_serie == self.num_serie)
+                .scalar_subquery()
+                .label("ultima_accion"),
+                consulta_ocupacion().label("ocupadas"),
+            )
+        ).one()
+
+    def error_campos(self) -> Optional[Resultado]:
+        """
+        Devuelve el error si el registro tiene campos vacíos, no consulta la base de datos
+
+        Returns:
+            Optional[Resultado]: Error con el campo vacío, None si todos tienen valor
+        """
+        for key in self.CAMPOS:
+            if es_campo_vacio(getattr(self, key)):
+                return Resultado.error(CodigoError.CAMPO_VACIO, key)
+        return None
+
+    def error_validez(
+        self, contexto: Union[Row, ContextoRegistro]
+    ) -> Optional[Resultado]:
+        """
+        Devuelve el error si el usuario o la bici no existen
+
+        Args:
+            contexto (Row | ContextoRegistro): Datos obtenidos con consultar_contexto
+
+        Returns:
+            Optional[Resultado]: Error encontrado, None si es válido
+        """
+        if not contexto.existe_usuario:
+            return Resultado.error(CodigoError.USUARIO_NO_REGISTRADO, "dni_usuario")
+        elif not contexto.existe_bici:
+            return Resultado.error(CodigoError.BICI_NO_REGISTRADA, "num_serie")
         else:
-            return True
+            return None
 
-    def es_permitido(self) -> bool:
+    def error_permiso(
+        self, contexto: Union[Row, ContextoRegistro]
+    ) -> Optional[Resultado]:
         """
-        Evalua si la bici indicada puede realizar la acción dada.
-        Cualquier acción que no sea IN o OUT devuelve False.
+        Devuelve el error si la bici no puede realizar la acción dada.
+        Cualquier acción que no sea IN o OUT es un error, y no se admiten entradas
+        si el parking ya tiene CAPACIDAD_MAXIMA bicis dentro.
+
+        Args:
+            contexto (Row | ContextoRegistro): Datos obtenidos con consultar_contexto
 
         Returns:
-            bool: True si puede
+            Optional[Resultado]: Error encontrado, None si está permitido
         """
         if self.accion == "IN":
-            if not puede_entrar(self.num_serie):
-                print("ERROR: Esta bicicleta no puede entrar")
-                return False
-            else:
-                return True
+            if not admite_entrada(contexto.ultima_accion):
+                return Resultado.error(CodigoError.NO_PUEDE_ENTRAR)
+            if (
+                CAPACIDAD_MAXIMA is not None
+                and (contexto.ocupadas or 0) >= CAPACIDAD_MAXIMA
+            ):
+                return Resultado.error(CodigoError.PARKING_LLENO)
         elif self.accion == "OUT":
-            if not puede_salir(self.num_serie):
-                print("ERROR: Esta bicicleta no puede salir")
-                return False
-            else:
-                return True
+            if not admite_salida(contexto.ultima_accion):
+                return Resultado.error(CodigoError.NO_PUEDE_SALIR)
         else:
-            print("ERROR: Las acciones aceptadas son solo IN y OUT")
-            return False
+            return Resultado.error(CodigoError.ACCION_NO_VALIDA, "accion")
+        return None
+
+    def validar(self, contexto: Union[Row, ContextoRegistro]) -> Optional[Resultado]:
+        """
+        Aplica todas las validaciones en orden: campos, existencia, permiso y propietario
+
+        Args:
+            contexto (Row | ContextoRegistro): Datos obtenidos con consultar_contexto
+
+        Returns:
+            Optional[Resultado]: Primer error encontrado, None si el registro se puede guardar
+        """
+        for error in (
+            self.error_campos(),
+            self.error_validez(contexto),
+            self.error_permiso(contexto),
+        ):
+            if error is not None:
+                return error
+        if not contexto.es_propietario:
+            return Resultado.error(CodigoError.NO_PROPIETARIO)
+        return None
+
+    def tiene_campos(self) -> Resultado:
+        """
+        Valida que el registro no tenga campos vacíos, no consulta la base de datos
+
+        Returns:
+            Resultado: Correcto si todos los campos tienen valor, si no con el campo vacío
+        """
+        error = self.error_campos()
+        if error is not None:
+            return error
+        return Resultado.correcto("el registro tiene todos los campos")
+
+    def es_valido(self, contexto: Optional[Row] = None) -> Resultado:
+        """
+        Valida que el registro esté bien formado sin campos vacíos y con un usuario y bici existentes
+
+        Args:
+            contexto (Optional[Row]): Resultado de consultar_contexto, si no se da se consulta
+
+        Returns:
+            Resultado: Correcto si es válido, si no con el motivo
+        """
+        error = self.error_campos()
+        if error is not None:
+            return error
+        if contexto is None:
+            with self._bd.crear_sesion(escritura=False) as sesion:
+                contexto = self.consultar_contexto(sesion)
+
+        error = self.error_validez(contexto)
+        if error is not None:
+            return error
+        return Resultado.correcto("el registro es válido")
+
+    def es_permitido(self, contexto: Optional[Row] = None) -> Resultado:
+        """
+        Evalua si la bici indicada puede realizar la acción dada.
+        Cualquier acción que no sea IN o OUT es un error.
+
+        Args:
+            contexto (Optional[Row]): Resultado de consultar_contexto, si no se da se consulta
+
+        Returns:
+            Resultado: Correcto si puede, si no con el motivo
+        """
+        if contexto is None:
+            with self._bd.crear_sesion(escritura=False) as sesion:
+                contexto = self.consultar_contexto(sesion)
+
+        error = self.error_permiso(contexto)
+        if error is not None:
+            return error
+        return Resultado.correcto("la acción está permitida")
 
     def crear_fila(self) -> RegistroORM:
         """
@@ -87,26 +248,180 @@ class Registro:
             self.timestamp, self.accion, self.num_serie, self.dni_usuario
         )
 
-    def guardar(self) -> bool:
+    @operacion("Registro.guardar")
+    def guardar(self) -> Resultado:
         """
-        Guarda el registro en el csv siempre y cuando sea válido y tenga un usuario y bici creados
+        Guarda el registro siempre y cuando sea válido y tenga un usuario y bici creados.
+        La validación, la comprobación del propietario y la inserción usan una única
+        sesión: una consulta para validar y la escritura del registro, su estado y
+        el contador de ocupación.
 
         Returns:
-            bool: True si se ha guardado el registro
-        """
-
-        if self.es_valido() and self.es_permitido():
-            if not self.num_serie in Usuario(self.dni_usuario).bicis:
-                print("ERROR: esta bicicleta NO pertenece al usuario")
-                return False
-            else:
-                try:
-                    with bd.crear_sesion() as sesion:
-                        sesion.add(self.crear_fila())
-                    print("OK: se ha registrado el registro")
-                    return True
-                except:
-                    print("ERROR: ha habido un error inexperado al escribir al CSV")
-                    return False
-        else:
-            return False
+            Resultado: Correcto si se ha guardado el registro, si no con el motivo
+        """
+        error = self.error_campos()
+        if error is not None:
+            return error
+
+        try:
+            with self._bd.crear_sesion() as sesion:
+                error = self.validar(self.consultar_contexto(sesion))
+                if error is not None:
+                    return error
+
+                sesion.add(self.crear_fila())
+                actualizar_estado_bici(
+                    sesion,
+                    self.num_serie,
+                    self.accion,
+                    self.timestamp,
+                    self.dni_usuario,
+                )
+                actualizar_ocupacion(sesion, 1 if self.accion == "IN" else -1)
+        except Exception as error:
+            return Resultado.error(CodigoError.ERROR_ESCRITURA, excepcion=error)
+
+        return Resultado.correcto(OK_REGISTRO)
+
+    @classmethod
+    @operacion("Registro.guardar_lote")
+    def guardar_lote(
+        cls,
+        eventos: list[tuple[str, str, str, Union[int, str, None]]],
+        base: Optional[Bd] = None,
+    ) -> list[Resultado]:
+        """
+        Guarda una lista de eventos (accion, num_serie, dni_usuario, timestamp) como los que
+        acumulan los tornos sin conexión. Los eventos se validan en el orden dado, teniendo
+        en cuenta los anteriores del mismo lote, y todos los válidos se insertan en una única
+        transacción. El timestamp puede ser microsegundos, texto con TIMESTAMP_FMT o None
+        para usar el momento actual. Los eventos anteriores al último estado de su bici,
+        guardado o del mismo lote, se rechazan para no desordenar estado_bicis, y los
+        que repiten (num_serie, timestamp, accion) de otro guardado o anterior del lote se
+        rechazan antes de validar para que el índice único no haga fallar todo el lote.
+
+        Args:
+            eventos (list[tuple[str, str, str, int | str | None]]): Eventos a registrar
+            base (Optional[Bd]): Base de datos de los eventos. Por defecto la principal.
+
+        Returns:
+            list[Resultado]: El resultado de cada evento
+        """
+        correcto = Resultado.correcto(OK_REGISTRO)
+        resultados: list[Resultado] = []
+        registros: list[Optional[Registro]] = []
+        for accion, num_serie, dni_usuario, timestamp in eventos:
+            try:
+                if isinstance(timestamp, str):
+                    timestamp = texto_a_microsegundos(timestamp)
+                registros.append(cls(accion, num_serie, dni_usuario, timestamp, base))
+                resultados.append(correcto)
+            except ValueError:
+                registros.append(None)
+                resultados.append(
+                    Resultado.error(CodigoError.TIMESTAMP_NO_VALIDO, "timestamp")
+                )
+
+        series = {r.num_serie for r in registros if r}
+        dnis = {r.dni_usuario for r in registros if r}
+        base = bd if base is None else base
+        try:
+            with base.crear_sesion() as sesion:
+                usuarios = set(
+                    sesion.scalars(
+                        select(UsuarioORM.dni).where(UsuarioORM.dni.in_(dnis))
+                    )
+                )
+                propietarios = dict(
+                    sesion.execute(
+                        select(BiciORM.num_serie, BiciORM.dni_usuario).where(
+                            BiciORM.num_serie.in_(series)
+                        )
+                    ).all()
+                )
+                ultimas = {}
+                momentos = {}
+                for num_serie, accion, timestamp in sesion.execute(
+                    select(
+                        EstadoBiciORM.num_serie,
+                        EstadoBiciORM.accion,
+                        EstadoBiciORM.timestamp,
+                    ).where(EstadoBiciORM.num_serie.in_(series))
+                ):
+                    ultimas[num_serie] = accion
+                    momentos[num_serie] = timestamp
+                vistos = set(
+                    sesion.execute(
+                        select(
+                            RegistroORM.num_serie,
+                            RegistroORM.timestamp,
+                            RegistroORM.accion,
+                        ).where(
+                            RegistroORM.num_serie.in_(series),
+                            RegistroORM.timestamp.in_(
+                                {r.timestamp for r in registros if r}
+                            ),
+                        )
+                    ).all()
+                )
+                for posicion, registro in enumerate(registros):
+                    if registro is None:
+                        continue
+                    clave = (registro.num_serie, registro.timestamp, registro.accion)
+                    if clave in vistos:
+                        resultados[posicion] = Resultado.error(
+                            CodigoError.EVENTO_REPETIDO, "timestamp"
+                        )
+                        registros[posicion] = None
+                    else:
+                        vistos.add(clave)
+                ocupadas_inicio = sesion.execute(select(consulta_ocupacion())).scalar()
+                ocupadas = ocupadas_inicio or 0
+
+                validos = []
+                for posicion, registro in enumerate(registros):
+                    if registro is None:
+                        continue
+                    # Un evento atrasado no puede deshacer un estado más reciente de la bici
+                    if registro.timestamp < momentos.get(registro.num_serie, 0):
+                        resultados[posicion] = Resultado.error(
+                            CodigoError.EVENTO_ANTERIOR, "timestamp"
+                        )
+                        continue
+                    contexto = ContextoRegistro(
+                        registro.dni_usuario in usuarios,
+                        registro.num_serie in propietarios,
+                        propietarios.get(registro.num_serie) == registro.dni_usuario,
+                        ultimas.get(registro.num_serie),
+                        ocupadas,
+                    )
+                    error = registro.validar(contexto)
+                    if error is not None:
+                        resultados[posicion] = error
+                    else:
+                        ultimas[registro.num_serie] = registro.accion
+                        momentos[registro.num_serie] = registro.timestamp
+                        ocupadas += 1 if registro.accion == "IN" else -1
+                        validos.append(registro)
+
+                if validos:
+                    filas = [
+                        {
+                            "timestamp": r.timestamp,
+                            "accion": r.accion,
+                            "num_serie": r.num_serie,
+                            "dni_usuario": r.dni_usuario,
+                        }
+                        for r in validos
+                    ]
+                    sesion.execute(insert(RegistroORM), filas)
+                    # El estado final de cada bici es su último evento válido del lote
+                    actualizar_estados(
+                        sesion, list({f["num_serie"]: f for f in filas}.values())
+                    )
+                    actualizar_ocupacion(sesion, ocupadas - (ocupadas_inicio or 0))
+        except Exception as error:
+            fallo = Resultado.error(CodigoError.ERROR_ESCRITURA, excepcion=error)
+            return [fallo for _ in eventos]
+
+        return resultados
@@ -0,0 +1,114 @@
+"""Resultado de las operaciones de los modelos.
+Los modelos no imprimen nada: devuelven un Resultado con si se ha completado, un código
+de error con el que actuar desde código y el mensaje para el usuario. La consola, el
+servicio o el importador deciden cómo mostrarlo."""
+
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Optional
+
+
+class CodigoError(str, Enum):
+    """Motivo por el que una operación no se ha completado"""
+
+    CAMPO_VACIO = "campo_vacio"
+    DNI_NO_VALIDO = "dni_no_valido"
+    EMAIL_NO_VALIDO = "email_no_valido"
+    DNI_REPETIDO = "dni_repetido"
+    EMAIL_REPETIDO = "email_repetido"
+    SERIE_REPETIDA = "serie_repetida"
+    USUARIO_NO_EXISTE = "usuario_no_existe"
+    USUARIO_CON_BICIS = "usuario_con_bicis"
+    BICI_NO_EXISTE = "bici_no_existe"
+    USUARIO_NO_REGISTRADO = "usuario_no_registrado"
+    BICI_NO_REGISTRADA = "bici_no_registrada"
+    NO_PROPIETARIO = "no_propietario"
+    ACCION_NO_VALIDA = "accion_no_valida"
+    NO_PUEDE_ENTRAR = "no_puede_entrar"
+    NO_PUEDE_SALIR = "no_puede_salir"
+    PARKING_LLENO = "parking_lleno"
+    TIMESTAMP_NO_VALIDO = "timestamp_no_valido"
+    EVENTO_ANTERIOR = "evento_anterior"
+    EVENTO_REPETIDO = "evento_repetido"
+    ERROR_ESCRITURA = "error_escritura"
+    ERROR_BORRADO = "error_borrado"
+
+
+MENSAJES = {
+    CodigoError.CAMPO_VACIO: "hay campos vacíos",
+    CodigoError.DNI_NO_VALIDO: "el DNI introducido no es válido",
+    CodigoError.EMAIL_NO_VALIDO: "el email introducido no es válido",
+    CodigoError.DNI_REPETIDO: "el DNI introducido ya está registrado",
+    CodigoError.EMAIL_REPETIDO: "el email introducido ya está registrado",
+    CodigoError.SERIE_REPETIDA: "el número de serie ya está registrado",
+    CodigoError.USUARIO_NO_EXISTE: "el DNI no existe o está mal escrito",
+    CodigoError.USUARIO_CON_BICIS: "el usuario tiene bicis asignadas, no se puede borrar",
+    CodigoError.BICI_NO_EXISTE: "la bicicleta no existe",
+    CodigoError.USUARIO_NO_REGISTRADO: "el usuario no está registrado",
+    CodigoError.BICI_NO_REGISTRADA: "la bicicleta no está registrada",
+    CodigoError.NO_PROPIETARIO: "esta bicicleta NO pertenece al usuario",
+    CodigoError.ACCION_NO_VALIDA: "Las acciones aceptadas son solo IN y OUT",
+    CodigoError.NO_PUEDE_ENTRAR: "Esta bicicleta no puede entrar",
+    CodigoError.NO_PUEDE_SALIR: "Esta bicicleta no puede salir",
+    CodigoError.PARKING_LLENO: "el parking está lleno",
+    CodigoError.TIMESTAMP_NO_VALIDO: "el timestamp no es válido",
+    CodigoError.EVENTO_ANTERIOR: "el registro es anterior al último estado de la bici",
+    CodigoError.EVENTO_REPETIDO: "el registro ya está guardado o repetido en el lote",
+    CodigoError.ERROR_ESCRITURA: "ha habido un error inexperado al escribir en la base de datos",
+    CodigoError.ERROR_BORRADO: "ha habido un error inexperado al borrar de la base de datos",
+}
+
+
+@dataclass(frozen=True)
+class Resultado:
+    """
+    Resultado de una operación. Se evalúa como su campo ok, así que se puede seguir
+    usando como un bool, y al convertirlo a texto da el mensaje con el prefijo OK: o ERROR:
+    """
+
+    ok: bool
+    mensaje: str
+    codigo: Optional[CodigoError] = None
+    # Campo al que se refiere el error, por ejemplo el que está vacío
+    campo: Optional[str] = None
+    # Excepción de una escritura fallida, para distinguir bloqueos de otros errores
+    excepcion: Optional[Exception] = field(default=None, compare=False, repr=False)
+
+    @classmethod
+    def correcto(cls, mensaje: str) -> "Resultado":
+        """
+        Args:
+            mensaje (str): Mensaje sin el prefijo OK:
+
+        Returns:
+            Resultado: Resultado de una operación completada
+        """
+        return cls(True, mensaje)
+
+    @classmethod
+    def error(
+        cls,
+        codigo: CodigoError,
+        campo: Optional[str] = None,
+        excepcion: Optional[Exception] = None,
+    ) -> "Resultado":
+        """
+        Args:
+            codigo (CodigoError): Motivo del error
+            campo (Optional[str]): Campo al que se refiere el error
+            excepcion (Optional[Exception]): Excepción que lo ha provocado
+
+        Returns:
+            Resultado: Resultado de una operación no completada con el mensaje del código
+        """
+        if codigo is CodigoError.CAMPO_VACIO and campo:
+            mensaje = f"el campo {campo} no puede estar vacío"
+        else:
+            mensaje = MENSAJES[codigo]
+        return cls(False, mensaje, codigo, campo, excepcion)
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    def __str__(self) -> str:
+        return f"{'OK' if self.ok else 'ERROR'}: {self.mensaje}"
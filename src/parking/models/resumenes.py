@@ -0,0 +1,329 @@
+"""Resúmenes por hora y por día del histórico para los paneles: entradas, salidas, bicis
+y usuarios distintos, pico de ocupación y bicis dentro al acabar el periodo.
+No se actualizan al guardar cada registro para no alargar la transacción de los tornos:
+actualizar_resumenes lee los registros con id posterior a la marca de agua "resumenes"
+y vuelve a calcular solo desde la medianoche del más antiguo de ellos, así que un lote
+atrasado de un torno sin conexión corrige también los días siguientes.
+Las horas se guardan en microsegundos desde epoch y los días como fecha local YYYY-MM-DD.
+"""
+
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Union
+
+from sqlalchemy import case, delete, distinct, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import aliased
+
+from parking.models.bd import Bd, MarcaORM, RegistroORM, ResumenDiaORM, ResumenHoraORM
+
+bd = Bd()
+
+HORA = 3_600_000_000
+MARCA_RESUMENES = "resumenes"
+# Corte del archivo (data_utils/archivo.py): antes de él ya no están todos los registros
+# en la base de datos, así que los resúmenes de esos días no se vuelven a calcular
+MARCA_ARCHIVO = "archivo"
+# Días que se recalculan por transacción al reconstruir todo el histórico
+DIAS_POR_LOTE = 31
+
+_COLUMNAS = ["entradas", "salidas", "bicis", "usuarios", "pico", "final"]
+
+
+class Resumen(NamedTuple):
+    """Fila de resumen de una hora (microsegundos desde epoch) o de un día (YYYY-MM-DD)"""
+
+    periodo: Union[int, str]
+    entradas: int
+    salidas: int
+    bicis: int
+    usuarios: int
+    pico: int
+    final: int
+
+
+def leer_marca(conexion, nombre: str) -> int:
+    """
+    Args:
+        conexion (Connection | Session): Conexión o sesión abierta
+        nombre (str): Nombre de la marca de agua
+
+    Returns:
+        int: Valor guardado, 0 si no existe
+    """
+    valor = conexion.execute(
+        select(MarcaORM.valor).where(MarcaORM.nombre == nombre)
+    ).scalar()
+    return valor or 0
+
+
+def guardar_marca(conexion, nombre: str, valor: int) -> None:
+    """
+    Crea o sobrescribe una marca de agua
+
+    Args:
+        conexion (Connection | Session): Conexión o sesión con una transacción abierta
+        nombre (str): Nombre de la marca de agua
+        valor (int): Nuevo valor
+    """
+    sentencia = sqlite_insert(MarcaORM).values(nombre=nombre, valor=valor)
+    conexion.execute(
+        sentencia.on_conflict_do_update(
+            index_elements=[MarcaORM.nombre], set_={"valor": valor}
+        )
+    )
+
+
+def medianoche(microsegundos: int) -> int:
+    """
+    Args:
+        microsegundos (int): Momento en microsegundos desde epoch
+
+    Returns:
+        int: Inicio del día local de ese momento, en microsegundos desde epoch
+    """
+    fecha = datetime.fromtimestamp(microsegundos // 1_000_000)
+    inicio = fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(inicio.timestamp()) * 1_000_000
+
+
+def _dia(microsegundos: int) -> str:
+    return datetime.fromtimestamp(microsegundos // 1_000_000).strftime("%Y-%m-%d")
+
+
+def _dia_local(columna):
+    """Misma fecha local que _dia pero calculada en SQLite"""
+    return func.date(columna // 1_000_000, "unixepoch", "localtime")
+
+
+def _recalcular(conexion, desde: int, hasta: Optional[int] = None) -> None:
+    """
+    Borra y vuelve a calcular los resúmenes de [desde, hasta). desde y hasta deben ser
+    medianoches locales para que los días queden completos. La ocupación parte del
+    final de la última hora guardada antes de desde.
+    """
+    en_rango = [RegistroORM.timestamp >= desde]
+    horas_en_rango = [ResumenHoraORM.hora >= desde]
+    dias_en_rango = [ResumenDiaORM.dia >= _dia(desde)]
+    if hasta is not None:
+        en_rango.append(RegistroORM.timestamp < hasta)
+        horas_en_rango.append(ResumenHoraORM.hora < hasta)
+        dias_en_rango.append(ResumenDiaORM.dia < _dia(hasta))
+
+    nivel = (
+        conexion.execute(
+            select(ResumenHoraORM.final)
+            .where(ResumenHoraORM.hora < desde)
+            .order_by(ResumenHoraORM.hora.desc())
+            .limit(1)
+        ).scalar()
+        or 0
+    )
+    conexion.execute(delete(ResumenHoraORM).where(*horas_en_rango))
+    conexion.execute(delete(ResumenDiaORM).where(*dias_en_rango))
+
+    # Bicis dentro tras cada evento con una suma acumulada; antes del evento hay
+    # despues - delta, así el pico cuenta también las que ya estaban al empezar la hora
+    delta = case((RegistroORM.accion == "IN", 1), else_=-1)
+    hora = RegistroORM.timestamp - RegistroORM.timestamp % HORA
+    eventos = (
+        select(
+            hora.label("hora"),
+            RegistroORM.accion,
+            RegistroORM.num_serie,
+            RegistroORM.dni_usuario,
+            delta.label("delta"),
+            (
+                nivel
+                + func.sum(delta).over(order_by=(RegistroORM.timestamp, RegistroORM.id))
+            ).label("despues"),
+            func.row_number()
+            .over(
+                partition_by=hora,
+                order_by=(RegistroORM.timestamp.desc(), RegistroORM.id.desc()),
+            )
+            .label("orden"),
+        )
+        .where(*en_rango)
+        .subquery()
+    )
+    e = eventos.c
+    conexion.execute(
+        insert(ResumenHoraORM).from_select(
+            ["hora", *_COLUMNAS],
+            select(
+                e.hora,
+                func.sum(case((e.accion == "IN", 1), else_=0)),
+                func.sum(case((e.accion == "OUT", 1), else_=0)),
+                func.count(distinct(e.num_serie)),
+                func.count(distinct(e.dni_usuario)),
+                func.max(func.max(e.despues), func.max(e.despues - e.delta)),
+                func.max(case((e.orden == 1, e.despues))),
+            ).group_by(e.hora),
+        )
+    )
+
+    # Los días cuentan desde los registros (una bici en dos horas es una sola bici) y
+    # toman el pico y el final de sus horas ya calculadas
+    dia = _dia_local(RegistroORM.timestamp)
+    conteos = (
+        select(
+            dia.label("dia"),
+            func.sum(case((RegistroORM.accion == "IN", 1), else_=0)).label("entradas"),
+            func.sum(case((RegistroORM.accion == "OUT", 1), else_=0)).label("salidas"),
+            func.count(distinct(RegistroORM.num_serie)).label("bicis"),
+            func.count(distinct(RegistroORM.dni_usuario)).label("usuarios"),
+        )
+        .where(*en_rango)
+        .group_by(dia)
+        .subquery()
+    )
+    dia_hora = _dia_local(ResumenHoraORM.hora)
+    horas = (
+        select(
+            dia_hora.label("dia"),
+            func.max(ResumenHoraORM.pico).label("pico"),
+            func.max(ResumenHoraORM.hora).label("ultima"),
+        )
+        .where(*horas_en_rango)
+        .group_by(dia_hora)
+        .subquery()
+    )
+    ultima = aliased(ResumenHoraORM)
+    conexion.execute(
+        insert(ResumenDiaORM).from_select(
+            ["dia", *_COLUMNAS],
+            select(
+                conteos.c.dia,
+                conteos.c.entradas,
+                conteos.c.salidas,
+                conteos.c.bicis,
+                conteos.c.usuarios,
+                horas.c.pico,
+                ultima.final,
+            )
+            .join(horas, horas.c.dia == conteos.c.dia)
+            .join(ultima, ultima.hora == horas.c.ultima),
+        )
+    )
+
+
+def actualizar_resumenes(base: Optional[Bd] = None) -> int:
+    """
+    Incorpora a los resúmenes los registros posteriores a la marca de agua, en una
+    transacción. Pensada para ejecutarse periódicamente (el servicio lo hace cada
+    RESUMENES["intervalo"] segundos) o desde mantenimiento.py resumenes.
+
+    Args:
+        base (Optional[Bd]): Base de datos resumida. Por defecto la principal.
+
+    Returns:
+        int: Registros nuevos procesados
+    """
+    base = bd if base is None else base
+    with base.crear_sesion() as sesion:
+        marca = leer_marca(sesion, MARCA_RESUMENES)
+        nuevos, ultimo_id, minimo = sesion.execute(
+            select(
+                func.count(), func.max(RegistroORM.id), func.min(RegistroORM.timestamp)
+            ).where(RegistroORM.id > marca)
+        ).one()
+        if not nuevos:
+            return 0
+        _recalcular(sesion, max(medianoche(minimo), leer_marca(sesion, MARCA_ARCHIVO)))
+        guardar_marca(sesion, MARCA_RESUMENES, ultimo_id)
+    return nuevos
+
+
+def reconstruir_resumenes(
+    dias_por_lote: int = DIAS_POR_LOTE, base: Optional[Bd] = None
+) -> int:
+    """
+    Calcula los resúmenes de todo el histórico de registros, en una transacción por cada
+    dias_por_lote días para no bloquear a los tornos. Solo se sustituyen los resúmenes
+    desde el día del primer registro o desde el corte del archivo si es posterior; los
+    anteriores se conservan.
+
+    Args:
+        dias_por_lote (int, optional): Días por transacción. Por defecto DIAS_POR_LOTE.
+        base (Optional[Bd]): Base de datos resumida. Por defecto la principal.
+
+    Returns:
+        int: Días con registros resumidos
+    """
+    if dias_por_lote < 1:
+        raise ValueError("hay que recalcular al menos un día por lote")
+    base = bd if base is None else base
+    with base.crear_sesion(escritura=False) as sesion:
+        ultimo_id, minimo, maximo = sesion.execute(
+            select(
+                func.max(RegistroORM.id),
+                func.min(RegistroORM.timestamp),
+                func.max(RegistroORM.timestamp),
+            )
+        ).one()
+        corte = leer_marca(sesion, MARCA_ARCHIVO)
+    if ultimo_id is None:
+        return 0
+
+    inicio = desde = max(medianoche(minimo), corte)
+    while True:
+        # Se suman días de calendario para no depender de los cambios de hora
+        fin = datetime.fromtimestamp(desde // 1_000_000) + timedelta(days=dias_por_lote)
+        hasta = int(fin.timestamp()) * 1_000_000
+        ultimo_lote = hasta > maximo
+        with base.crear_sesion() as sesion:
+            _recalcular(sesion, desde, None if ultimo_lote else hasta)
+            if ultimo_lote:
+                guardar_marca(sesion, MARCA_RESUMENES, ultimo_id)
+        if ultimo_lote:
+            break
+        desde = hasta
+
+    # Los registros que hayan llegado mientras tanto los recoge la actualización
+    actualizar_resumenes(base)
+    with base.crear_sesion(escritura=False) as sesion:
+        return sesion.execute(
+            select(func.count()).where(ResumenDiaORM.dia >= _dia(inicio))
+        ).scalar()
+
+
+def resumen_horas(desde: int, hasta: int, base: Optional[Bd] = None) -> list[Resumen]:
+    """
+    Args:
+        desde (int): Primera hora incluida, en microsegundos
+        hasta (int): Hora final excluida, en microsegundos
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
+
+    Returns:
+        list[Resumen]: Horas con registros del intervalo, en orden
+    """
+    base = bd if base is None else base
+    with base.crear_sesion_lectura() as sesion:
+        filas = sesion.execute(
+            select(
+                ResumenHoraORM.hora, *(getattr(ResumenHoraORM, c) for c in _COLUMNAS)
+            )
+            .where(ResumenHoraORM.hora >= desde, ResumenHoraORM.hora < hasta)
+            .order_by(ResumenHoraORM.hora)
+        )
+        return [Resumen(*fila) for fila in filas]
+
+
+def resumen_dias(desde: str, hasta: str, base: Optional[Bd] = None) -> list[Resumen]:
+    """
+    Args:
+        desde (str): Primer día incluido, YYYY-MM-DD
+        hasta (str): Último día incluido, YYYY-MM-DD
+        base (Optional[Bd]): Base de datos consultada. Por defecto la principal.
+
+    Returns:
+        list[Resumen]: Días con registros del intervalo, en orden
+    """
+    base = bd if base is None else base
+    with base.crear_sesion_lectura() as sesion:
+        filas = sesion.execute(
+            select(ResumenDiaORM.dia, *(getattr(ResumenDiaORM, c) for c in _COLUMNAS))
+            .where(ResumenDiaORM.dia >= desde, ResumenDiaORM.dia <= hasta)
+            .order_by(ResumenDiaORM.dia)
+        )
+        return [Resumen(*fila) for fila in filas]
@@ -1,48 +1,101 @@
 """Clase que representa una fila de la base de datos de usuarios"""
 
+from typing import Optional
+
+from sqlalchemy import exists
+
+from parking.data_utils.cache import cache_validaciones, clave
 from parking.data_utils.validators import (
     es_dni_valido,
     es_email_valido,
 )
 from parking.models.bd import Bd, BiciORM, UsuarioORM
+from parking.models.instrumentacion import operacion
+from parking.models.resultado import CodigoError, Resultado
 
 bd = Bd()
 
 
 class Usuario:
 
-    def __init__(self, dni: str, nombre: str = "", email: str = "") -> None:
+    def __init__(
+        self,
+        dni: str,
+        nombre: str = "",
+        email: str = "",
+        base: Optional[Bd] = None,
+    ) -> None:
         """
-        Genera un usuario dado su DNI (nombre e email opcional) y le asocia sus bicicletas si tiene
+        Genera un usuario dado su DNI (nombre e email opcional).
+        Sus bicicletas no se consultan hasta que se accede a bicis por primera vez.
 
         Args:
             dni (str): DNI del usuario, tiene que ser único
             nombre (str, optional): Nombre del usuario. Por defecto vacío.
             email (str, optional): Email del usuario, tiene que ser único. Por defecto vacío.
+            base (Optional[Bd]): Base de datos del usuario. Por defecto la principal.
         """
         self.dni = dni
         self.nombre = nombre
         self.email = email
-        self.bicis = []
-        with bd.crear_sesion() as sesion:
-            for bici in sesion.query(BiciORM).filter_by(dni_usuario=dni).all():
-                self.bicis.append(bici)
+        self.base = base
+        self._bicis: Optional[list[BiciORM]] = None
+
+    @property
+    def _bd(self) -> Bd:
+        return bd if self.base is None else self.base
+
+    @property
+    def bicis(self) -> list[BiciORM]:
+        """
+        Bicis del usuario, se cargan de la base de datos en el primer acceso y se guardan
+
+        Returns:
+            list[BiciORM]: Bicis asociadas al DNI del usuario
+        """
+        if self._bicis is None:
+            with self._bd.crear_sesion(escritura=False) as sesion:
+                self._bicis = (
+                    sesion.query(BiciORM).filter_by(dni_usuario=self.dni).all()
+                )
+        return self._bicis
+
+    @bicis.setter
+    def bicis(self, bicis: list[BiciORM]) -> None:
+        self._bicis = list(bicis)
+
+    def tiene_bicis(self, sesion=None) -> bool:
+        """
+        Indica si el usuario tiene alguna bici. Si las bicis ya están cargadas no consulta
+        la base de datos, si no hace una consulta de existencia sobre el índice de bicis por DNI
+
+        Args:
+            sesion (Session, optional): Sesión abierta a reutilizar. Por defecto abre una.
+
+        Returns:
+            bool: True si tiene al menos una bici
+        """
+        if self._bicis is not None:
+            return len(self._bicis) > 0
+        consulta = exists().where(BiciORM.dni_usuario == self.dni)
+        if sesion is not None:
+            return bool(sesion.query(consulta).scalar())
+        with self._bd.crear_sesion(escritura=False) as sesion:
+            return bool(sesion.query(consulta).scalar())
 
-    def es_valido(self) -> bool:
+    def es_valido(self) -> Resultado:
         """
         Valida que el usuario esté bien formado sin campos vacíos y con dni e email válidos
 
         Returns:
-            bool: True si valido.
+            Resultado: Correcto si es válido, si no con el motivo
         """
         if not es_dni_valido(self.dni):
-            print("ERROR: el DNI introducido no es válido")
-            return False
+            return Resultado.error(CodigoError.DNI_NO_VALIDO, "dni")
         elif not es_email_valido(self.email):
-            print("ERROR: el email introducido no es válido")
-            return False
+            return Resultado.error(CodigoError.EMAIL_NO_VALIDO, "email")
         else:
-            return True
+            return Resultado.correcto("el usuario es válido")
 
     def crear_fila(self) -> UsuarioORM:
         """
@@ -53,56 +106,57 @@ class Usuario:
         """
         return UsuarioORM(self.dni, self.nombre, self.email)
 
-    def guardar(self) -> bool:
+    @operacion("Usuario.guardar")
+    def guardar(self) -> Resultado:
         """
-        Guarda el usuario en el csv siempre y cuando sea válido y único
+        Guarda el usuario en el csv siempre y cuando sea válido y único.
+        Tras confirmar la escritura invalida su DNI y email en cache_validaciones.
 
         Returns:
-            bool: True si se ha guardado el usuario
+            Resultado: Correcto si se ha guardado el usuario, si no con el motivo
         """
-        with bd.crear_sesion() as sesion:
-            if self.es_valido():
+        validez = self.es_valido()
+        if not validez:
+            return validez
+
+        # El try cubre también el commit al salir de la sesión, que es donde falla un bloqueo
+        try:
+            with self._bd.crear_sesion() as sesion:
                 if sesion.query(UsuarioORM).filter_by(dni=self.dni).first():
-                    print("ERROR: el DNI introducido ya está registrado")
-                    return False
+                    return Resultado.error(CodigoError.DNI_REPETIDO, "dni")
                 elif sesion.query(UsuarioORM).filter_by(email=self.email).first():
-                    print("ERROR: el email introducido ya está registrado")
-                    return False
-                else:
-                    try:
-                        sesion.add(self.crear_fila())
-                        print("OK: se ha registrado el usuario")
-                        return True
-                    except:
-                        print(
-                            "ERROR: ha habido un error inexperado al escribir en la base de datos"
-                        )
-                        return False
-            else:
-                return False
-
-    def borrar(self) -> bool:
+                    return Resultado.error(CodigoError.EMAIL_REPETIDO, "email")
+                sesion.add(self.crear_fila())
+        except Exception as error:
+            return Resultado.error(CodigoError.ERROR_ESCRITURA, excepcion=error)
+
+        cache_validaciones.invalidar(
+            clave("dni", self.dni, self._bd), clave("email", self.email, self._bd)
+        )
+        return Resultado.correcto("se ha registrado el usuario")
+
+    @operacion("Usuario.borrar")
+    def borrar(self) -> Resultado:
         """
-        Intenta borrar el usuario siempre y cuando ya exista el DNI y no tenga bicis asociadas
+        Intenta borrar el usuario siempre y cuando ya exista el DNI y no tenga bicis asociadas.
+        Tras confirmar el borrado invalida su DNI y email en cache_validaciones.
 
         Returns:
-            bool: _description_
+            Resultado: Correcto si se ha borrado el usuario, si no con el motivo
         """
-        with bd.crear_sesion() as sesion:
-            usuario = sesion.query(UsuarioORM).filter_by(dni=self.dni).first()
-            if not usuario:
-                print("ERROR: el DNI no existe o está mal escrito")
-                return False
-            elif len(self.bicis) is not 0:
-                print("ERROR: el usuario tiene bicis asignadas, no se puede borrar")
-                return False
-            else:
-                try:
-                    sesion.delete(usuario)
-                    print("OK: usuario borrado")
-                    return True
-                except:
-                    print(
-                        "ERROR: ha habido un error inexperado al borrar de la base de datos"
-                    )
-                    return False
+        try:
+            with self._bd.crear_sesion() as sesion:
+                usuario = sesion.query(UsuarioORM).filter_by(dni=self.dni).first()
+                if not usuario:
+                    return Resultado.error(CodigoError.USUARIO_NO_EXISTE, "dni")
+                elif self.tiene_bicis(sesion):
+                    return Resultado.error(CodigoError.USUARIO_CON_BICIS)
+                email = usuario.email
+                sesion.delete(usuario)
+        except Exception as error:
+            return Resultado.error(CodigoError.ERROR_BORRADO, excepcion=error)
+
+        cache_validaciones.invalidar(
+            clave("dni", self.dni, self._bd), clave("email", email, self._bd)
+        )
+        return Resultado.correcto("usuario borrado")
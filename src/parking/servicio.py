@@ -0,0 +1,256 @@
+"""Servicio asyncio para que varios tornos usen el parking a la vez.
+Habla un protocolo de líneas JSON sobre un socket Unix o TCP: cada línea recibida es una
+petición {"op": ..., campos} y cada respuesta una línea {"ok": bool, "mensaje": str, ...},
+con el "codigo" de error en las operaciones de los modelos.
+
+SQLite solo admite un escritor: las entradas y salidas pasan por EscritorRegistros, que
+las confirma en grupos, las altas y bajas se ejecutan en un único hilo escritor y las
+consultas en el pool de hilos del bucle de eventos."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+from typing import Any, Callable, Optional
+
+from parking.config import HOST_SERVICIO, PUERTO_SERVICIO, RESUMENES
+from parking.data_utils.validators import puede_entrar, puede_salir
+from parking.models.bd import Bd
+from parking.models.bici import Bici
+from parking.models.escritor import EscritorRegistros
+from parking.models.estado import leer_ocupacion
+from parking.models.resultado import Resultado
+from parking.models.resumenes import actualizar_resumenes
+from parking.models.usuario import Usuario
+
+bd = Bd()
+
+_registro = logging.getLogger("parking.servicio")
+
+# Operación: (campos obligatorios, campos opcionales)
+OPERACIONES = {
+    "registrar_usuario": (("dni", "nombre", "email"), ()),
+    "borrar_usuario": (("dni",), ()),
+    "registrar_bici": (("num_serie", "dni_usuario", "marca", "modelo"), ()),
+    "borrar_bici": (("num_serie",), ()),
+    "entrada": (("num_serie", "dni_usuario"), ("timestamp",)),
+    "salida": (("num_serie", "dni_usuario"), ("timestamp",)),
+    "estado": (("num_serie",), ()),
+    "ocupacion": ((), ()),
+}
+
+
+def respuesta(ok: bool, mensaje: str, **datos: Any) -> dict:
+    """
+    Devuelve el diccionario de respuesta del protocolo
+
+    Args:
+        ok (bool): Si la operación se ha completado
+        mensaje (str): Mensaje para el torno, el mismo que se vería en consola
+        **datos (Any): Campos adicionales de la respuesta
+
+    Returns:
+        dict: Respuesta lista para serializar
+    """
+    return {"ok": ok, "mensaje": mensaje, **datos}
+
+
+def respuesta_resultado(resultado: Resultado) -> dict:
+    """
+    Devuelve la respuesta del protocolo para el resultado de una operación de los modelos,
+    con su código de error para que el torno pueda actuar sin interpretar el mensaje
+
+    Args:
+        resultado (Resultado): Resultado de la operación
+
+    Returns:
+        dict: Respuesta lista para serializar
+    """
+    return respuesta(
+        resultado.ok,
+        str(resultado),
+        codigo=resultado.codigo.value if resultado.codigo else None,
+    )
+
+
+def _estado(num_serie: str) -> dict:
+    """Indica si la bici puede entrar o salir ahora mismo"""
+    return respuesta(
+        True,
+        "",
+        puede_entrar=puede_entrar(num_serie),
+        puede_salir=puede_salir(num_serie),
+    )
+
+
+def _ocupacion() -> dict:
+    """Devuelve el número de bicis dentro del parking"""
+    with bd.crear_sesion(escritura=False) as sesion:
+        return respuesta(True, "", bicis=leer_ocupacion(sesion))
+
+
+class Servicio:
+    """Servidor de líneas JSON con un hilo escritor dedicado"""
+
+    def __init__(self, registros: Optional[EscritorRegistros] = None) -> None:
+        """
+        Args:
+            registros (Optional[EscritorRegistros]): Escritor de entradas y salidas. Por defecto uno nuevo.
+        """
+        self._escritor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="escritor"
+        )
+        self._registros = (registros or EscritorRegistros()).iniciar()
+        self._servidor: Optional[asyncio.AbstractServer] = None
+        self._resumenes: Optional[asyncio.Task] = None
+
+    def _preparar(self, op: str, peticion: dict) -> tuple[Callable[[], dict], bool]:
+        """Devuelve la función que resuelve la petición y si escribe en la base de datos"""
+        if op == "registrar_usuario":
+            usuario = Usuario(peticion["dni"], peticion["nombre"], peticion["email"])
+            return lambda: respuesta_resultado(usuario.guardar()), True
+        elif op == "borrar_usuario":
+            usuario = Usuario(peticion["dni"])
+            return lambda: respuesta_resultado(usuario.borrar()), True
+        elif op == "registrar_bici":
+            bici = Bici(
+                peticion["num_serie"],
+                peticion["dni_usuario"],
+                peticion["marca"],
+                peticion["modelo"],
+            )
+            return lambda: respuesta_resultado(bici.guardar()), True
+        elif op == "borrar_bici":
+            bici = Bici(peticion["num_serie"])
+            return lambda: respuesta_resultado(bici.borrar()), True
+        elif op == "estado":
+            return lambda: _estado(peticion["num_serie"]), False
+        else:
+            return _ocupacion, False
+
+    async def atender(self, peticion: Any) -> dict:
+        """
+        Resuelve una petición ya decodificada
+
+        Args:
+            peticion (Any): Objeto JSON recibido
+
+        Returns:
+            dict: Respuesta del protocolo
+        """
+        if not isinstance(peticion, dict):
+            return respuesta(False, "ERROR: la petición debe ser un objeto JSON")
+        op = peticion.get("op")
+        if op not in OPERACIONES:
+            return respuesta(False, f"ERROR: operación desconocida {op}")
+        obligatorios, opcionales = OPERACIONES[op]
+        for campo in obligatorios:
+            if not isinstance(peticion.get(campo), str):
+                return respuesta(False, f"ERROR: falta el campo {campo}")
+        for campo in opcionales:
+            valor = peticion.get(campo)
+            if isinstance(valor, bool) or not isinstance(valor, (int, str, type(None))):
+                return respuesta(False, f"ERROR: el campo {campo} no es válido")
+
+        if op in ("entrada", "salida"):
+            futuro = self._registros.enviar(
+                "IN" if op == "entrada" else "OUT",
+                peticion["num_serie"],
+                peticion["dni_usuario"],
+                peticion.get("timestamp"),
+            )
+            try:
+                return respuesta_resultado(await asyncio.wrap_future(futuro))
+            except Exception:
+                return respuesta(
+                    False, "ERROR: ha habido un error inexperado en la base de datos"
+                )
+
+        funcion, escribe = self._preparar(op, peticion)
+        bucle = asyncio.get_running_loop()
+        try:
+            return await bucle.run_in_executor(
+                self._escritor if escribe else None, funcion
+            )
+        except Exception:
+            return respuesta(
+                False, "ERROR: ha habido un error inexperado en la base de datos"
+            )
+
+    async def _actualizar_resumenes(self, intervalo: float) -> None:
+        """Pone al día los resúmenes cada intervalo segundos en el hilo escritor"""
+        bucle = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                await bucle.run_in_executor(self._escritor, actualizar_resumenes)
+            except Exception:
+                _registro.exception("no se han podido actualizar los resúmenes")
+
+    async def _atender_conexion(
+        self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter
+    ) -> None:
+        """Lee peticiones línea a línea hasta que el torno cierra la conexión"""
+        try:
+            while linea := await lector.readline():
+                if not linea.strip():
+                    continue
+                try:
+                    peticion = json.loads(linea)
+                except ValueError:
+                    resultado = respuesta(False, "ERROR: la petición no es JSON válido")
+                else:
+                    resultado = await self.atender(peticion)
+                escritor.write(json.dumps(resultado, ensure_ascii=False).encode())
+                escritor.write(b"\n")
+                await escritor.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    async def iniciar(
+        self,
+        ruta_socket: Optional[str] = None,
+        host: str = HOST_SERVICIO,
+        puerto: int = PUERTO_SERVICIO,
+    ) -> asyncio.AbstractServer:
+        """
+        Empieza a aceptar conexiones en un socket Unix si se da su ruta, si no en TCP
+
+        Args:
+            ruta_socket (Optional[str]): Ruta del socket Unix
+            host (str, optional): Dirección TCP. Por defecto HOST_SERVICIO.
+            puerto (int, optional): Puerto TCP, 0 para uno libre. Por defecto PUERTO_SERVICIO.
+
+        Returns:
+            asyncio.AbstractServer: Servidor en marcha
+        """
+        if ruta_socket:
+            self._servidor = await asyncio.start_unix_server(
+                self._atender_conexion, path=ruta_socket
+            )
+        else:
+            self._servidor = await asyncio.start_server(
+                self._atender_conexion, host, puerto
+            )
+        if RESUMENES["activos"] and self._resumenes is None:
+            self._resumenes = asyncio.create_task(
+                self._actualizar_resumenes(RESUMENES["intervalo"])
+            )
+        return self._servidor
+
+    async def cerrar(self) -> None:
+        """Deja de aceptar conexiones y espera a que terminen las escrituras pendientes"""
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        if self._resumenes is not None:
+            self._resumenes.cancel()
+            try:
+                await self._resumenes
+            except asyncio.CancelledError:
+                pass
+            self._resumenes = None
+        self._escritor.shutdown(wait=True)
+        self._registros.cerrar()
@@ -3,6 +3,7 @@
 from parking.models.usuario import Usuario
 from parking.models.bici import Bici
 from parking.models.registro import Registro
+from parking.models.resultado import Resultado
 
 
 def preguntar_bool(texto: str) -> bool:
@@ -39,6 +40,20 @@ def preguntar_dato(texto: str) -> str:
     return input(texto).strip()
 
 
+def mostrar_resultado(resultado: Resultado) -> bool:
+    """
+    Muestra por consola el resultado de una operación de los modelos
+
+    Args:
+        resultado (Resultado): Resultado a mostrar
+
+    Returns:
+        bool: True si la operación se ha completado
+    """
+    print(resultado)
+    return resultado.ok
+
+
 def menu_anadir_usuario() -> bool:
     """
     Pide al usuario dni, nombre y email para registrarse.
@@ -53,7 +68,7 @@ def menu_anadir_usuario() -> bool:
 
     usuario = Usuario(dni, nombre, email)
 
-    while not usuario.guardar():
+    while not mostrar_resultado(usuario.guardar()):
         if not preguntar_bool("Intentarlo de nuevo? (S/N): "):
             return False
         dni = preguntar_dato("Introduce tu DNI con letra: ")
@@ -76,7 +91,7 @@ def menu_borrar_usuario() -> bool:
     dni = preguntar_dato("Introduce tu DNI con letra: ")
     usuario = Usuario(dni)
 
-    while not usuario.borrar():
+    while not mostrar_resultado(usuario.borrar()):
         if not preguntar_bool("Intentarlo de nuevo? (S/N): "):
             return False
         dni = preguntar_dato("Introduce tu DNI con letra: ")
@@ -100,7 +115,7 @@ def menu_anadir_bici() -> bool:
 
     bici = Bici(num_serie, dni, marca, modelo)
 
-    while not bici.guardar():
+    while not mostrar_resultado(bici.guardar()):
         if not preguntar_bool("Intentarlo de nuevo? (S/N): "):
             return False
         num_serie = preguntar_dato("Introduce el número de serie de tu bicicleta: ")
@@ -123,7 +138,7 @@ def menu_borrar_bici() -> bool:
     num_serie = preguntar_dato("Introduce el número de serie de tu bicicleta: ")
     bici = Bici(num_serie)
 
-    while not bici.borrar():
+    while not mostrar_resultado(bici.borrar()):
         if not preguntar_bool("Intentarlo de nuevo? (S/N): "):
             return False
         num_serie = preguntar_dato("Introduce el número de serie de tu bicicleta: ")
@@ -144,7 +159,7 @@ def registro_entrada() -> bool:
     num_serie = preguntar_dato("Introduce el número de serie de tu bicicleta: ")
     registro = Registro("IN", num_serie, dni)
 
-    while not registro.guardar():
+    while not mostrar_resultado(registro.guardar()):
         if not preguntar_bool("Intentarlo de nuevo? (S/N): "):
             return False
         dni = preguntar_dato("Introduce tu DNI con letra: ")
@@ -166,7 +181,7 @@ def registro_salida() -> bool:
     num_serie = preguntar_dato("Introduce el número de serie de tu bicicleta: ")
     registro = Registro("OUT", num_serie, dni)
 
-    while not registro.guardar():
+    while not mostrar_resultado(registro.guardar()):
         if not preguntar_bool("Intentarlo de nuevo? (S/N): "):
             return False
         dni = preguntar_dato("Introduce tu DNI con letra: ")
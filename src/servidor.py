@@ -0,0 +1,30 @@
+"""Arranca el servicio para tornos, se lanza desde la carpeta src"""
+
+import argparse
+import asyncio
+
+from parking.config import HOST_SERVICIO, PUERTO_SERVICIO  # pragma: no cover
+from parking.servicio import Servicio  # pragma: no cover
+
+
+async def servir(args: argparse.Namespace) -> None:  # pragma: no cover
+    """Atiende conexiones hasta que se interrumpe el proceso"""
+    servicio = Servicio()
+    servidor = await servicio.iniciar(args.socket, args.host, args.puerto)
+    direccion = args.socket or f"{args.host}:{args.puerto}"
+    print(f"OK: servicio escuchando en {direccion}")
+    try:
+        await servidor.serve_forever()
+    finally:
+        await servicio.cerrar()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Servicio de Bike Parking para tornos")
+    parser.add_argument("--socket", help="Ruta de un socket Unix en vez de TCP")
+    parser.add_argument("--host", default=HOST_SERVICIO)
+    parser.add_argument("--puerto", type=int, default=PUERTO_SERVICIO)
+    try:
+        asyncio.run(servir(parser.parse_args()))
+    except KeyboardInterrupt:
+        print("Hasta pronto!")
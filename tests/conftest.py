@@ -0,0 +1,115 @@
+"""Fixtures compartidas por los archivos de pruebas"""
+
+from importlib import import_module
+from pathlib import Path
+import sys
+from typing import Optional
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import insert as insertar_filas
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+import parking
+from parking.models.bd import Bd, BiciORM, RegistroORM, UsuarioORM
+
+# Usuarios y bicis de prueba, en orden: poblar crea los primeros que se le pidan
+USUARIOS = [
+    ("12345678Z", "Ana", "ana@example.com"),
+    ("87654321X", "Carlos", "carlos@example.com"),
+]
+BICIS = [
+    ("BK001", "12345678Z", "Orbea", "Carpe"),
+    ("BK002", "87654321X", "BH", "Atom"),
+]
+
+# Durante la recolección todos los módulos comparten el mismo Bd simulado,
+# así ningún import abre data/bd.db y los tests pueden parchear cualquier módulo
+_parche_bd = patch("parking.models.bd.Bd", MagicMock())
+
+
+def pytest_configure(config):
+    _parche_bd.start()
+    raiz = Path(parking.__file__).parent
+    for archivo in sorted(raiz.rglob("*.py")):
+        partes = archivo.relative_to(raiz.parent).with_suffix("").parts
+        if partes[-1] != "__init__":
+            import_module(".".join(partes))
+
+
+def pytest_collection_finish(session):
+    _parche_bd.stop()
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia():
+    """Cada test empieza sin resultados guardados de otros tests"""
+    from parking.data_utils.cache import cache_validaciones
+
+    cache_validaciones.limpiar()
+    yield cache_validaciones
+    cache_validaciones.limpiar()
+
+
+@pytest.fixture
+def bd_temporal(tmp_path, monkeypatch):
+    """
+    Crea una base de datos SQLite real en una carpeta temporal y la sustituye
+    en todos los módulos del paquete que tengan su propia referencia a bd
+    """
+    bd = object.__new__(Bd)
+    bd._init(str(tmp_path / "bd.db"))
+    for nombre, modulo in list(sys.modules.items()):
+        if nombre.startswith("parking.") and hasattr(modulo, "bd"):
+            monkeypatch.setattr(modulo, "bd", bd)
+    yield bd
+    bd.engine.dispose()
+
+
+@pytest.fixture
+def poblar(bd_temporal):
+    """
+    Devuelve una función poblar(usuarios=2, series=None) que crea en bd_temporal los
+    primeros usuarios de USUARIOS con su bici de BICIS. Si se dan series, en vez de
+    esas bicis se crean bicis de Ana con esos números de serie.
+    """
+
+    def poblar(usuarios: int = 2, series: Optional[list[str]] = None) -> None:
+        with bd_temporal.crear_sesion() as sesion:
+            sesion.add_all(UsuarioORM(*usuario) for usuario in USUARIOS[:usuarios])
+            if series is None:
+                sesion.add_all(BiciORM(*bici) for bici in BICIS[:usuarios])
+            else:
+                sesion.add_all(
+                    BiciORM(serie, "12345678Z", "Orbea", "Carpe") for serie in series
+                )
+
+    return poblar
+
+
+@pytest.fixture
+def insertar(bd_temporal):
+    """
+    Devuelve una función insertar(eventos, inicio=0, paso=1) que inserta en bd_temporal
+    eventos (t, accion, num_serie, dni) con timestamp inicio + t * paso, sin validarlos
+    ni tocar el estado de las bicis
+    """
+
+    def insertar(
+        eventos: list[tuple[int, str, str, str]], inicio: int = 0, paso: int = 1
+    ) -> None:
+        with bd_temporal.crear_sesion() as sesion:
+            sesion.execute(
+                insertar_filas(RegistroORM),
+                [
+                    {
+                        "timestamp": inicio + t * paso,
+                        "accion": accion,
+                        "num_serie": num_serie,
+                        "dni_usuario": dni,
+                    }
+                    for t, accion, num_serie, dni in eventos
+                ],
+            )
+
+    return insertar
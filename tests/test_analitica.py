@@ -0,0 +1,171 @@
+"""Archivo de pruebas de la analítica del histórico, usa una base de datos temporal"""
+
+from pathlib import Path
+import sys
+
+from sqlalchemy import delete
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.data_utils.analitica import (
+    HORA,
+    Analizador,
+    OcupacionHora,
+    distribucion,
+    estancias,
+)
+from parking.models.bd import RegistroORM
+from parking.models.resumenes import MARCA_ARCHIVO, actualizar_resumenes, guardar_marca
+
+INICIO = 1740816000000000 - 1740816000000000 % HORA
+MINUTO = 60_000_000
+
+
+EVENTOS = [
+    (0, "IN", "BK001", "12345678Z"),
+    (10, "IN", "BK002", "87654321X"),
+    (20, "OUT", "BK001", "12345678Z"),
+    (70, "IN", "BK001", "12345678Z"),
+    (100, "OUT", "BK002", "87654321X"),
+    (190, "OUT", "BK001", "12345678Z"),
+    (200, "IN", "BK001", "12345678Z"),
+]
+
+
+def test_estancias_con_lead(bd_temporal, poblar, insertar):
+    """Cada entrada se empareja con la salida siguiente de su bici"""
+    poblar()
+    insertar(EVENTOS, INICIO, MINUTO)
+    resultado = estancias()
+    assert [(e.num_serie, e.segundos / 60) for e in resultado] == [
+        ("BK001", 20),
+        ("BK001", 120),
+        ("BK002", 90),
+    ]
+    assert len(estancias(desde=INICIO + 60 * MINUTO)) == 1
+
+    resumen = distribucion(e.segundos for e in resultado)
+    assert resumen.cuenta == 3
+    assert resumen.media == 230 / 3 * 60
+    assert resumen.maximo == 7200
+    assert dict(resumen.cubos)[1800] == 1
+    assert dict(resumen.cubos)[7200] == 2
+
+
+def test_analizador_incremental(bd_temporal, poblar, insertar):
+    """Las actualizaciones solo leen registros nuevos y coinciden con el cálculo completo"""
+    poblar()
+    insertar(EVENTOS[:4], INICIO, MINUTO)
+    analizador = Analizador(tam_lote=2)
+    assert analizador.actualizar() == 4
+    assert analizador.distribucion_estancias().cuenta == 1
+    assert analizador.ocupadas == 2
+
+    insertar(EVENTOS[4:], INICIO, MINUTO)
+    assert analizador.actualizar() == 3
+    assert analizador.actualizar() == 0
+    assert analizador.ultimo_id == 7
+    assert analizador.reconstrucciones == 0
+    assert analizador.distribucion_estancias() == distribucion(
+        e.segundos for e in estancias()
+    )
+    assert analizador.usos_por_usuario == {"12345678Z": 3, "87654321X": 1}
+
+    assert analizador.ocupacion_por_hora() == [
+        OcupacionHora(INICIO, 2, 1),
+        OcupacionHora(INICIO + HORA, 2, 1),
+        OcupacionHora(INICIO + 2 * HORA, 1, 1),
+        OcupacionHora(INICIO + 3 * HORA, 1, 1),
+    ]
+    # Las horas sin eventos mantienen las bicis que había dentro
+    curva = analizador.ocupacion_por_hora(hasta=INICIO + 6 * HORA)
+    assert curva[-1] == OcupacionHora(INICIO + 5 * HORA, 1, 1)
+
+
+def test_analizador_eventos_atrasados(bd_temporal, poblar, insertar):
+    """Un evento anterior a la ventana de retraso obliga a recalcular desde el principio"""
+    poblar()
+    insertar(EVENTOS[2:4], INICIO, MINUTO)
+    analizador = Analizador()
+    analizador.actualizar()
+    assert analizador.distribucion_estancias().cuenta == 0
+
+    insertar(EVENTOS[:2], INICIO, MINUTO)
+    assert analizador.actualizar() == 4
+    assert analizador.reconstrucciones == 1
+    assert analizador.distribucion_estancias().cuenta == 1
+
+
+def test_analizador_retraso_sin_recalcular(bd_temporal, poblar, insertar):
+    """Un evento atrasado dentro de la ventana se coloca en su hora sin recalcular"""
+    poblar()
+    insertar([EVENTOS[0], *EVENTOS[2:4]], INICIO, MINUTO)
+    analizador = Analizador(retraso=60 * 60)
+    assert analizador.actualizar() == 3
+    assert analizador.ocupadas == 1
+
+    insertar([EVENTOS[1], *EVENTOS[4:]], INICIO, MINUTO)
+    assert analizador.actualizar() == 4
+    assert analizador.reconstrucciones == 0
+
+    completo = Analizador()
+    completo.actualizar()
+    assert analizador.ocupadas == completo.ocupadas
+    assert analizador.distribucion_estancias() == completo.distribucion_estancias()
+    assert analizador.ocupacion_por_hora() == completo.ocupacion_por_hora()
+    assert analizador.usos_por_usuario == completo.usos_por_usuario
+
+
+def test_analizador_conserva_ultimas_horas(bd_temporal, poblar, insertar):
+    """La curva de ocupación y su estado guardado solo conservan las últimas horas"""
+    poblar()
+    insertar(EVENTOS, INICIO, MINUTO)
+    analizador = Analizador(retraso=0, horas=3)
+    analizador.actualizar()
+    assert analizador.ocupacion_por_hora(desde=INICIO) == [
+        OcupacionHora(INICIO + HORA, 2, 1),
+        OcupacionHora(INICIO + 2 * HORA, 1, 1),
+        OcupacionHora(INICIO + 3 * HORA, 1, 1),
+    ]
+    analizador.guardar()
+    cargado = Analizador.cargar()
+    assert cargado.ocupacion_por_hora() == analizador.ocupacion_por_hora()
+
+
+def test_analizador_guardado(bd_temporal, poblar, insertar):
+    """El estado guardado permite seguir sin volver a leer los registros ya procesados"""
+    poblar()
+    insertar(EVENTOS[:4], INICIO, MINUTO)
+    analizador = Analizador.cargar()
+    assert analizador.actualizar() == 4
+    analizador.guardar()
+
+    cargado = Analizador.cargar()
+    assert cargado.ultimo_id == 4
+    assert cargado.actualizar() == 0
+    insertar(EVENTOS[4:], INICIO, MINUTO)
+    assert cargado.actualizar() == 3
+    cargado.guardar()
+
+    completo = Analizador()
+    completo.actualizar()
+    final = Analizador.cargar()
+    assert final.distribucion_estancias() == completo.distribucion_estancias()
+    assert final.ocupacion_por_hora() == completo.ocupacion_por_hora()
+    assert final.usos_por_usuario == completo.usos_por_usuario
+
+
+def test_analizador_tras_archivar(bd_temporal, poblar, insertar):
+    """Sin los registros archivados la ocupación parte del resumen de la hora anterior al corte"""
+    poblar()
+    insertar(EVENTOS, INICIO, MINUTO)
+    actualizar_resumenes()
+    corte = INICIO + HORA
+    with bd_temporal.crear_sesion() as sesion:
+        sesion.execute(delete(RegistroORM).where(RegistroORM.timestamp < corte))
+        guardar_marca(sesion, MARCA_ARCHIVO, corte)
+
+    analizador = Analizador()
+    assert analizador.actualizar() == 4
+    assert analizador.corte == corte
+    assert analizador.ocupacion_por_hora()[0] == OcupacionHora(INICIO + HORA, 2, 1)
+    assert analizador.ocupadas == 1
@@ -0,0 +1,153 @@
+"""Archivo de pruebas del archivo mensual de registros, usa una base de datos temporal"""
+
+from datetime import datetime
+import os
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import select
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.data_utils import historial
+from parking.data_utils.archivo import (
+    archivar_registros,
+    archivos_en_rango,
+    consultar_archivo,
+    corte_archivo,
+)
+from parking.data_utils.validators import puede_entrar, puede_salir
+from parking.models.bd import RegistroORM
+from parking.models.estado import reconciliar_ocupacion, reconstruir_estado_bicis
+from parking.models.resumenes import (
+    reconstruir_resumenes,
+    resumen_dias,
+)
+
+
+def micro(texto: str) -> int:
+    return int(datetime.fromisoformat(texto).timestamp()) * 1_000_000
+
+
+EVENTOS = [
+    ("2025-01-10 10:00:00", "IN", "BK001", "12345678Z"),
+    ("2025-01-10 12:00:00", "OUT", "BK001", "12345678Z"),
+    ("2025-01-20 09:00:00", "IN", "BK002", "87654321X"),
+    ("2025-02-03 08:00:00", "IN", "BK001", "12345678Z"),
+    ("2025-02-03 18:00:00", "OUT", "BK001", "12345678Z"),
+    ("2025-03-05 08:00:00", "IN", "BK001", "12345678Z"),
+]
+
+
+@pytest.fixture
+def con_eventos(bd_temporal, poblar, insertar):
+    """Dos usuarios con una bici cada uno, sus eventos de enero a marzo y su estado"""
+    poblar()
+    insertar([(micro(t), a, s, d) for t, a, s, d in EVENTOS])
+    with bd_temporal.crear_sesion() as sesion:
+        reconstruir_estado_bicis(sesion)
+
+
+def ids_en_bd(bd) -> list[int]:
+    with bd.crear_sesion(escritura=False) as sesion:
+        return list(sesion.scalars(select(RegistroORM.id).order_by(RegistroORM.id)))
+
+
+def test_corte_archivo():
+    """El corte es el inicio del mes tras dejar los meses completos indicados"""
+    ahora = micro("2025-03-15 12:00:00")
+    assert corte_archivo(0, ahora) == micro("2025-03-01 00:00:00")
+    assert corte_archivo(2, ahora) == micro("2025-01-01 00:00:00")
+    assert corte_archivo(3, ahora) == micro("2024-12-01 00:00:00")
+
+
+def test_archiva_por_meses_sin_el_ultimo_de_cada_bici(
+    bd_temporal, con_eventos, tmp_path
+):
+    """Cada mes va a su archivo y el último registro de cada bici se queda"""
+    carpeta = str(tmp_path / "archivo")
+
+    resultado = archivar_registros(
+        carpeta=carpeta, antes_de=micro("2025-03-10 00:00:00")
+    )
+
+    assert resultado.corte == micro("2025-03-01 00:00:00")
+    assert resultado.movidos == 4
+    assert sorted(os.listdir(carpeta)) == [
+        "registros_2025-01.db",
+        "registros_2025-02.db",
+    ]
+    # Quedan la entrada de BK002 de enero, su último registro, y marzo
+    assert ids_en_bd(bd_temporal) == [3, 6]
+    enero = consultar_archivo(
+        archivos_en_rango(carpeta=carpeta)[0][2],
+        lambda tabla: select(tabla.c.id).order_by(tabla.c.id),
+    )
+    assert [fila.id for fila in enero] == [1, 2]
+
+    # Repetir no mueve nada ni crea archivos vacíos
+    assert archivar_registros(carpeta=carpeta, antes_de=resultado.corte).movidos == 0
+    assert len(os.listdir(carpeta)) == 2
+
+
+def test_estado_sigue_siendo_correcto(bd_temporal, con_eventos, tmp_path):
+    """Las validaciones y la reconstrucción del estado no dependen de lo archivado"""
+    archivar_registros(
+        carpeta=str(tmp_path / "archivo"), antes_de=micro("2025-04-01 00:00:00")
+    )
+
+    assert puede_salir("BK001") and puede_salir("BK002")
+    assert not puede_entrar("BK002")
+    with bd_temporal.crear_sesion() as sesion:
+        assert reconstruir_estado_bicis(sesion) == 2
+        assert reconciliar_ocupacion(sesion) == 2
+
+
+def test_historial_incluye_archivo(bd_temporal, con_eventos, tmp_path):
+    """Con incluir_archivo las páginas mezclan base de datos y archivos en orden"""
+    carpeta = str(tmp_path / "archivo")
+    archivar_registros(carpeta=carpeta, antes_de=micro("2025-03-01 00:00:00"))
+
+    assert [e.id for e in historial.historial_bici("BK001").eventos] == [6]
+    recientes = historial.historial_bici(
+        "BK001", limite=2, incluir_archivo=True, carpeta_archivo=carpeta
+    )
+    assert [e.id for e in recientes.eventos] == [6, 5]
+    siguiente = historial.historial_bici(
+        "BK001",
+        limite=2,
+        despues_de=recientes.siguiente,
+        incluir_archivo=True,
+        carpeta_archivo=carpeta,
+    )
+    assert [e.id for e in siguiente.eventos] == [4, 2]
+
+    eventos = historial.recorrer_historial_usuario(
+        "12345678Z", tam_pagina=2, incluir_archivo=True, carpeta_archivo=carpeta
+    )
+    assert [e.id for e in eventos] == [1, 2, 4, 5, 6]
+    febrero = historial.historial_usuario(
+        "12345678Z",
+        desde=micro("2025-02-01 00:00:00"),
+        hasta=micro("2025-03-01 00:00:00"),
+        incluir_archivo=True,
+        carpeta_archivo=carpeta,
+    )
+    assert [e.id for e in febrero.eventos] == [4, 5]
+
+
+def test_resumenes_de_meses_archivados_se_conservan(bd_temporal, con_eventos, tmp_path):
+    """Reconstruir los resúmenes tras archivar no borra los días archivados"""
+    archivar_registros(
+        carpeta=str(tmp_path / "archivo"), antes_de=micro("2025-03-01 00:00:00")
+    )
+    antes = resumen_dias("2025-01-01", "2025-12-31")
+    assert [d.periodo for d in antes] == [
+        "2025-01-10",
+        "2025-01-20",
+        "2025-02-03",
+        "2025-03-05",
+    ]
+
+    assert reconstruir_resumenes() == 1
+    assert resumen_dias("2025-01-01", "2025-12-31") == antes
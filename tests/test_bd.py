@@ -0,0 +1,128 @@
+"""Archivo de pruebas del gestor de bases de datos: nombres, motor perezoso y fork"""
+
+import os
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import func, select
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+# Durante la recolección Bd está simulado, así que la clase se busca al usarla
+from parking.models import bd as modulo_bd
+from parking.data_utils.analitica import Analizador
+from parking.data_utils.historial import historial_bici
+from parking.data_utils.validators import (
+    es_dni_unico,
+    es_email_unico,
+    es_serie_unica,
+    puede_entrar,
+    puede_salir,
+)
+from parking.models.bd import UsuarioORM
+from parking.models.bici import Bici
+from parking.models.registro import Registro
+from parking.models.resumenes import actualizar_resumenes
+from parking.models.usuario import Usuario
+
+
+@pytest.fixture
+def bd_nombrada(tmp_path):
+    """Base de datos con nombre propio en una carpeta temporal, se olvida al acabar"""
+    bd = modulo_bd.Bd(str(tmp_path / "lote.db"), nombre="lote")
+    yield bd
+    bd.cerrar()
+
+
+def contar_usuarios(bd) -> int:
+    with bd.crear_sesion(escritura=False) as sesion:
+        return sesion.execute(select(func.count()).select_from(UsuarioORM)).scalar()
+
+
+def test_instancias_por_nombre(bd_nombrada, tmp_path):
+    """El mismo nombre devuelve la misma instancia y otro nombre otra base de datos"""
+    assert modulo_bd.Bd(nombre="lote") is bd_nombrada
+    otra = modulo_bd.Bd(str(tmp_path / "otra.db"), nombre="otra")
+    try:
+        with bd_nombrada.crear_sesion() as sesion:
+            sesion.add(UsuarioORM("12345678Z", "Ana", "ana@example.com"))
+        assert contar_usuarios(bd_nombrada) == 1
+        assert contar_usuarios(otra) == 0
+    finally:
+        otra.cerrar()
+
+
+def test_motor_perezoso(bd_nombrada, tmp_path):
+    """No se abre el archivo hasta el primer uso y hasta entonces se puede cambiar la ruta"""
+    ruta = tmp_path / "movida.db"
+    assert modulo_bd.Bd(str(ruta), nombre="lote") is bd_nombrada
+    assert not ruta.exists()
+
+    contar_usuarios(bd_nombrada)
+    assert ruta.exists()
+    with pytest.raises(ValueError):
+        modulo_bd.Bd(str(tmp_path / "lote.db"), nombre="lote")
+
+
+def test_cerrar_olvida_la_instancia(tmp_path):
+    """Tras cerrar, el mismo nombre crea una instancia nueva"""
+    bd = modulo_bd.Bd(str(tmp_path / "a.db"), nombre="temporal")
+    contar_usuarios(bd)
+    bd.cerrar()
+    nueva = modulo_bd.Bd(str(tmp_path / "b.db"), nombre="temporal")
+    assert nueva is not bd
+    nueva.cerrar()
+
+
+def test_modelos_y_consultas_en_otra_base(bd_nombrada, bd_temporal):
+    """Los modelos y las consultas usan la base de datos que se les pasa en base"""
+    assert Usuario("12345678Z", "Ana", "ana@example.com", base=bd_nombrada).guardar()
+    assert Bici("BK001", "12345678Z", "Orbea", "Carpe", base=bd_nombrada).guardar()
+    assert Registro("IN", "BK001", "12345678Z", base=bd_nombrada).guardar()
+    lote = Registro.guardar_lote([("OUT", "BK001", "12345678Z", None)], bd_nombrada)
+    assert lote[0].ok is True
+
+    assert Usuario("12345678Z", base=bd_nombrada).tiene_bicis() is True
+    assert len(historial_bici("BK001", base=bd_nombrada).eventos) == 2
+    assert actualizar_resumenes(bd_nombrada) == 2
+    assert Analizador(base=bd_nombrada).actualizar() == 2
+    # La principal, en las pruebas la temporal, no recibe nada
+    assert contar_usuarios(bd_temporal) == 0
+    assert historial_bici("BK001").eventos == []
+
+
+def test_validaciones_en_otra_base(bd_nombrada, bd_temporal):
+    """Las validaciones consultan la base de datos del modelo, no la principal"""
+    assert Usuario("12345678Z", "Ana", "ana@example.com", base=bd_nombrada).guardar()
+    assert Bici("BK001", "12345678Z", base=bd_nombrada).existe_usuario()
+    assert not Bici("BK001", "12345678Z").existe_usuario()
+
+    assert es_dni_unico("12345678Z") is True
+    assert es_dni_unico("12345678Z", bd_nombrada) is False
+    assert es_email_unico("ana@example.com", bd_nombrada) is False
+    assert Bici("BK001", "12345678Z", "Orbea", "Carpe", base=bd_nombrada).guardar()
+    assert es_serie_unica("BK001", bd_nombrada) is False
+    assert Registro("IN", "BK001", "12345678Z", base=bd_nombrada).guardar()
+    assert puede_salir("BK001", bd_nombrada) is True
+    assert puede_entrar("BK001", bd_nombrada) is False
+    assert puede_salir("BK001") is False
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="necesita fork")
+def test_proceso_hijo_abre_sus_conexiones(bd_nombrada):
+    """El hijo escribe con conexiones propias y el padre sigue usando las suyas"""
+    assert contar_usuarios(bd_nombrada) == 0
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        codigo = 1
+        try:
+            with bd_nombrada.crear_sesion() as sesion:
+                sesion.add(UsuarioORM("12345678Z", "Ana", "ana@example.com"))
+            codigo = 0
+        finally:
+            os._exit(codigo)
+
+    _, estado = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(estado) == 0
+    assert contar_usuarios(bd_nombrada) == 1
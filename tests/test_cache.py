@@ -0,0 +1,120 @@
+"""Archivo de pruebas de la caché de validaciones"""
+
+from pathlib import Path
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+# Durante la recolección Bd está simulado, así que la clase se busca al usarla
+from parking.models import bd as modulo_bd
+from parking.data_utils.cache import CacheTTL
+from parking.data_utils.validators import es_dni_unico, es_serie_unica
+from parking.models.bici import Bici
+from parking.models.usuario import Usuario
+
+
+@pytest.fixture
+def cache_activa(cache_vacia, monkeypatch):
+    """cache_validaciones activa aunque por defecto esté desactivada"""
+    monkeypatch.setattr(cache_vacia, "activa", True)
+    return cache_vacia
+
+
+class Reloj:
+    """Reloj manual para controlar la caducidad"""
+
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_cache_lru_y_ttl():
+    """Se descarta la entrada menos usada al llenarse y las caducadas se recalculan"""
+    reloj = Reloj()
+    cache = CacheTTL(tam_maximo=2, ttl=10, reloj=reloj)
+    calcular = MagicMock(side_effect=lambda: "valor")
+
+    cache.obtener("a", calcular)
+    cache.obtener("b", calcular)
+    cache.obtener("a", calcular)  # "b" pasa a ser la menos usada
+    cache.obtener("c", calcular)
+    assert cache.estadisticas() == {"aciertos": 1, "fallos": 3, "entradas": 2}
+
+    cache.obtener("b", calcular)
+    assert calcular.call_count == 4
+
+    reloj.ahora = 11
+    cache.obtener("c", calcular)
+    assert calcular.call_count == 5
+
+
+def test_cache_invalidacion_durante_calculo():
+    """Un valor calculado antes de una invalidación no se guarda"""
+    cache = CacheTTL(tam_maximo=10, ttl=10)
+
+    def calcular():
+        cache.invalidar("a")
+        return "antiguo"
+
+    assert cache.obtener("a", calcular) == "antiguo"
+    assert cache.obtener("a", lambda: "nuevo") == "nuevo"
+
+
+def test_cache_desactivada():
+    """Con la caché desactivada siempre se consulta"""
+    cache = CacheTTL(tam_maximo=10, ttl=10, activa=False)
+    calcular = MagicMock(return_value=True)
+    cache.obtener("a", calcular)
+    cache.obtener("a", calcular)
+    assert calcular.call_count == 2
+    assert cache.estadisticas()["entradas"] == 0
+
+
+def test_es_dni_unico_usa_cache(cache_activa):
+    """La segunda consulta del mismo DNI no abre sesión"""
+    mock_sesion = MagicMock()
+    mock_sesion.query.return_value.filter_by.return_value.first.return_value = None
+    mock_cm = MagicMock()
+    mock_cm.__enter__.return_value = mock_sesion
+
+    with patch(
+        "parking.data_utils.validators.bd.crear_sesion", return_value=mock_cm
+    ) as crear_sesion:
+        assert es_dni_unico("12345678Z") is True
+        assert es_dni_unico("12345678Z") is True
+        assert crear_sesion.call_count == 1
+    assert cache_activa.estadisticas()["aciertos"] == 1
+
+
+def test_modelos_invalidan_cache(bd_temporal, cache_activa):
+    """Guardar y borrar usuarios y bicis actualiza las validaciones en caché"""
+    assert es_dni_unico("12345678Z") is True
+    assert Usuario("12345678Z", "Ana", "ana@example.com").guardar().ok is True
+    assert es_dni_unico("12345678Z") is False
+
+    assert es_serie_unica("BK001") is True
+    assert Bici("BK001", "12345678Z", "Orbea", "Urbana").guardar().ok is True
+    assert es_serie_unica("BK001") is False
+
+    assert Bici("BK001").borrar().ok is True
+    assert es_serie_unica("BK001") is True
+    assert Usuario("12345678Z").borrar().ok is True
+    assert es_dni_unico("12345678Z") is True
+
+
+def test_cache_por_base_de_datos(bd_temporal, cache_activa, tmp_path):
+    """Cada base de datos tiene sus propias entradas y los modelos invalidan las suyas"""
+    lote = modulo_bd.Bd(str(tmp_path / "lote.db"), nombre="lote")
+    try:
+        assert es_dni_unico("12345678Z") is True
+        assert es_dni_unico("12345678Z", lote) is True
+        assert Usuario("12345678Z", "Ana", "ana@example.com", base=lote).guardar()
+        assert es_dni_unico("12345678Z", lote) is False
+        assert es_dni_unico("12345678Z") is True
+        assert cache_activa.estadisticas()["aciertos"] == 1
+    finally:
+        lote.cerrar()
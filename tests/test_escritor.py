@@ -0,0 +1,49 @@
+"""Archivo de pruebas del escritor de registros con commits agrupados"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.models.bd import RegistroORM
+from parking.models.escritor import EscritorRegistros
+from parking.models.estado import leer_ocupacion
+from parking.models.resultado import CodigoError
+
+
+def test_escritor_agrupa_commits(bd_temporal, poblar):
+    """Los eventos concurrentes se guardan en menos transacciones que eventos"""
+    series = [f"BK{i:03d}" for i in range(20)]
+    poblar(usuarios=1, series=series)
+    with EscritorRegistros(ventana=0.05) as escritor:
+        with ThreadPoolExecutor(max_workers=20) as hilos:
+            resultados = list(
+                hilos.map(lambda s: escritor.registrar("IN", s, "12345678Z"), series)
+            )
+    assert all(resultados)
+    assert escritor.eventos == 20
+    assert escritor.grupos < 20
+
+    with bd_temporal.crear_sesion() as sesion:
+        assert sesion.query(RegistroORM).count() == 20
+        assert leer_ocupacion(sesion) == 20
+
+
+def test_escritor_errores_por_evento(bd_temporal, poblar):
+    """Cada evento del grupo recibe su propio resultado"""
+    poblar(usuarios=1, series=["BK000"])
+    with EscritorRegistros(ventana=0.05) as escritor:
+        futuros = [
+            escritor.enviar("IN", "BK000", "12345678Z"),
+            escritor.enviar("IN", "BK000", "12345678Z"),
+            escritor.enviar("OUT", "BK999", "12345678Z"),
+            escritor.enviar("OUT", "BK000", "12345678Z"),
+        ]
+    assert [f.result().codigo for f in futuros] == [
+        None,
+        CodigoError.NO_PUEDE_ENTRAR,
+        CodigoError.BICI_NO_REGISTRADA,
+        None,
+    ]
+    assert str(futuros[0].result()) == "OK: se ha registrado el registro"
+    assert escritor.grupos == 1
@@ -0,0 +1,246 @@
+"""Archivo de pruebas de la tabla de estado de las bicis, usa una base de datos temporal"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.models.bici import Bici
+from parking.models.registro import Registro
+from parking.models.resultado import CodigoError
+from parking.models.usuario import Usuario
+from parking.models.estado import (
+    leer_ocupacion,
+    reconciliar_ocupacion,
+    reconstruir_estado_bicis,
+)
+from parking.models.bd import (
+    BiciORM,
+    EstadoBiciORM,
+    OcupacionORM,
+    RegistroORM,
+    UsuarioORM,
+)
+from parking.data_utils.validators import puede_entrar, puede_salir
+
+
+def test_guardar_actualiza_estado(bd_temporal, poblar):
+    """Cada registro guardado deja el estado de la bici en su última acción"""
+    poblar(usuarios=1)
+    registro = Registro("IN", "BK001", "12345678Z")
+    assert registro.guardar().ok is True
+
+    with bd_temporal.crear_sesion() as sesion:
+        estado = sesion.get(EstadoBiciORM, "BK001")
+        assert estado.accion == "IN"
+        assert estado.timestamp == registro.timestamp
+    assert puede_entrar("BK001") is False
+    assert puede_salir("BK001") is True
+
+
+def test_reconstruir_estado(bd_temporal, poblar):
+    """La reconstrucción toma el registro más reciente de cada bici"""
+    poblar(usuarios=1)
+    with bd_temporal.crear_sesion() as sesion:
+        sesion.add(BiciORM("BK002", "12345678Z", "BH", "Atom"))
+        sesion.add(RegistroORM(1740816922000000, "IN", "BK001", "12345678Z"))
+        sesion.add(RegistroORM(1740819730000000, "OUT", "BK001", "12345678Z"))
+        sesion.add(RegistroORM(1740821400000000, "IN", "BK002", "12345678Z"))
+
+    with bd_temporal.crear_sesion() as sesion:
+        assert reconstruir_estado_bicis(sesion) == 2
+
+    assert puede_entrar("BK001") is True
+    assert puede_salir("BK002") is True
+
+
+def test_registros_mismo_segundo(bd_temporal, poblar):
+    """Dos registros seguidos no colisionan aunque caigan en el mismo segundo"""
+    poblar(usuarios=1)
+    entrada = Registro("IN", "BK001", "12345678Z")
+    salida = Registro("OUT", "BK001", "12345678Z")
+    assert salida.timestamp > entrada.timestamp
+    assert entrada.guardar().ok is True
+    assert salida.guardar().ok is True
+
+    with bd_temporal.crear_sesion() as sesion:
+        assert sesion.query(RegistroORM).count() == 2
+
+
+def test_perfil_sqlite(bd_temporal):
+    """La base de datos se abre en modo WAL con las pragmas del perfil"""
+    with bd_temporal.engine.connect() as conexion:
+        assert conexion.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conexion.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        assert conexion.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+
+def test_registros_concurrentes(bd_temporal):
+    """Varios hilos guardando a la vez no provocan errores de base de datos bloqueada"""
+    with bd_temporal.crear_sesion() as sesion:
+        sesion.add(UsuarioORM("12345678Z", "Ana", "ana@example.com"))
+        for i in range(8):
+            sesion.add(BiciORM(f"BK{i:03}", "12345678Z", "Orbea", "Carpe"))
+
+    def entrar_y_salir(num_serie):
+        return [
+            Registro(accion, num_serie, "12345678Z").guardar()
+            for accion in ("IN", "OUT", "IN", "OUT")
+        ]
+
+    with ThreadPoolExecutor(max_workers=8) as hilos:
+        resultados = list(hilos.map(entrar_y_salir, [f"BK{i:03}" for i in range(8)]))
+
+    assert all(all(r) for r in resultados)
+    with bd_temporal.crear_sesion() as sesion:
+        assert sesion.query(RegistroORM).count() == 32
+
+
+def test_guardar_lote(bd_temporal, poblar):
+    """El lote valida cada evento con los anteriores del mismo lote y guarda los válidos"""
+    poblar(usuarios=1)
+    resultados = Registro.guardar_lote(
+        [
+            ("IN", "BK001", "12345678Z", "2025-03-01 08:00:00"),
+            ("IN", "BK001", "12345678Z", "2025-03-01 08:05:00"),
+            ("OUT", "BK001", "12345678Z", 1740816922000000),
+            ("OUT", "BK999", "12345678Z", None),
+            ("IN", "BK001", "87654321X", None),
+            ("IN", "BK001", "12345678Z", "ayer"),
+        ]
+    )
+    assert [r.ok for r in resultados] == [True, False, True, False, False, False]
+    assert [r.codigo for r in resultados] == [
+        None,
+        CodigoError.NO_PUEDE_ENTRAR,
+        None,
+        CodigoError.BICI_NO_REGISTRADA,
+        CodigoError.USUARIO_NO_REGISTRADO,
+        CodigoError.TIMESTAMP_NO_VALIDO,
+    ]
+
+    with bd_temporal.crear_sesion() as sesion:
+        assert sesion.query(RegistroORM).count() == 2
+        assert sesion.get(EstadoBiciORM, "BK001").accion == "OUT"
+    assert puede_entrar("BK001") is True
+
+
+def test_guardar_lote_evento_anterior(bd_temporal, poblar):
+    """Un lote atrasado no cambia el estado ni la ocupación de una bici con un registro posterior"""
+    poblar(usuarios=1)
+    assert Registro("IN", "BK001", "12345678Z").guardar().ok is True
+
+    resultados = Registro.guardar_lote(
+        [("OUT", "BK001", "12345678Z", "2020-01-01 00:00:00")]
+    )
+    assert resultados[0].codigo is CodigoError.EVENTO_ANTERIOR
+
+    with bd_temporal.crear_sesion() as sesion:
+        assert sesion.query(RegistroORM).count() == 1
+        assert sesion.get(EstadoBiciORM, "BK001").accion == "IN"
+        assert leer_ocupacion(sesion) == 1
+    assert Registro("OUT", "BK001", "12345678Z").guardar().ok is True
+
+
+def test_guardar_lote_eventos_repetidos(bd_temporal, poblar):
+    """Un evento repetido en el lote o ya guardado se rechaza sin hacer fallar a los demás"""
+    poblar(usuarios=1)
+    assert Registro.guardar_lote([("IN", "BK001", "12345678Z", 1000)])[0].ok is True
+
+    resultados = Registro.guardar_lote(
+        [
+            ("IN", "BK001", "12345678Z", 1000),
+            ("OUT", "BK001", "12345678Z", 2000),
+            ("IN", "BK001", "12345678Z", 2000),
+            ("OUT", "BK001", "12345678Z", 2000),
+        ]
+    )
+    assert [r.codigo for r in resultados] == [
+        CodigoError.EVENTO_REPETIDO,
+        None,
+        None,
+        CodigoError.EVENTO_REPETIDO,
+    ]
+    with bd_temporal.crear_sesion() as sesion:
+        assert sesion.query(RegistroORM).count() == 3
+        assert sesion.get(EstadoBiciORM, "BK001").accion == "IN"
+        assert leer_ocupacion(sesion) == 1
+
+
+def test_usuario_tiene_bicis(bd_temporal, poblar):
+    """tiene_bicis consulta solo la existencia y borrar respeta las bicis asignadas"""
+    poblar(usuarios=1)
+    assert Usuario("12345678Z").tiene_bicis() is True
+    assert Usuario("12345678Z").borrar().ok is False
+    assert [b.num_serie for b in Usuario("12345678Z").bicis] == ["BK001"]
+
+    with bd_temporal.crear_sesion() as sesion:
+        sesion.add(UsuarioORM("87654321X", "Carlos", "carlos@example.com"))
+    assert Usuario("87654321X").tiene_bicis() is False
+    assert Usuario("87654321X").borrar().ok is True
+
+
+def test_fallo_al_confirmar(bd_temporal, monkeypatch, poblar):
+    """Un error en el commit, como un bloqueo, se devuelve como Resultado y no se propaga"""
+    poblar(usuarios=1)
+    with bd_temporal.crear_sesion() as sesion:
+        sesion.add(UsuarioORM("11223344B", "Eva", "eva@example.com"))
+
+    def bloqueada(sesion):
+        raise OperationalError("COMMIT", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(Session, "commit", bloqueada)
+    for resultado, codigo in (
+        (Usuario("87654321X", "Carlos", "carlos@example.com").guardar(), "escritura"),
+        (Bici("BK002", "12345678Z", "BH", "Atom").guardar(), "escritura"),
+        (Bici("BK001").borrar(), "borrado"),
+        (Usuario("11223344B").borrar(), "borrado"),
+    ):
+        assert resultado.ok is False
+        assert resultado.codigo is CodigoError[f"ERROR_{codigo.upper()}"]
+        assert isinstance(resultado.excepcion, OperationalError)
+
+    monkeypatch.undo()
+    with bd_temporal.crear_sesion() as sesion:
+        assert sesion.get(UsuarioORM, "87654321X") is None
+        assert sesion.get(BiciORM, "BK001") is not None
+        assert sesion.get(UsuarioORM, "11223344B") is not None
+
+
+def test_registro_bici_ajena(bd_temporal, poblar):
+    """Un usuario no puede registrar la bici de otro aunque tenga bicis propias"""
+    poblar()
+
+    resultado = Registro("IN", "BK001", "87654321X").guardar()
+    assert resultado.codigo is CodigoError.NO_PROPIETARIO
+    assert Registro("IN", "BK002", "87654321X").guardar().ok is True
+
+
+def test_ocupacion_y_capacidad(bd_temporal, monkeypatch, poblar):
+    """El contador sigue las entradas y salidas y las entradas se rechazan con el parking lleno"""
+    poblar(usuarios=1)
+    with bd_temporal.crear_sesion() as sesion:
+        sesion.add(BiciORM("BK002", "12345678Z", "BH", "Atom"))
+    monkeypatch.setattr("parking.models.registro.CAPACIDAD_MAXIMA", 1)
+
+    assert Registro("IN", "BK001", "12345678Z").guardar().ok is True
+    assert Registro("IN", "BK002", "12345678Z").guardar().ok is False
+    resultados = Registro.guardar_lote(
+        [
+            ("OUT", "BK001", "12345678Z", None),
+            ("IN", "BK002", "12345678Z", None),
+            ("IN", "BK001", "12345678Z", None),
+        ]
+    )
+    assert resultados[2].codigo is CodigoError.PARKING_LLENO
+    assert str(resultados[2]) == "ERROR: el parking está lleno"
+
+    with bd_temporal.crear_sesion() as sesion:
+        assert leer_ocupacion(sesion) == 1
+        sesion.execute(OcupacionORM.__table__.update().values(bicis=7))
+    with bd_temporal.crear_sesion() as sesion:
+        assert reconciliar_ocupacion(sesion) == 1
+        assert leer_ocupacion(sesion) == 1
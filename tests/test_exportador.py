@@ -0,0 +1,84 @@
+"""Archivo de pruebas de la exportación de registros a csv, usa una base de datos temporal"""
+
+import csv
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.config import CABECERA_REGISTROS
+from parking.data_utils.exportador import exportar_registros_csv
+from parking.data_utils.importador import (
+    importar_bicis,
+    importar_registros,
+    importar_usuarios,
+)
+from parking.data_utils.tiempo import texto_a_microsegundos
+from parking.models.registro import Registro
+
+DATOS = Path(__file__).resolve().parent / "data"
+
+
+def leer(ruta: Path) -> list[list[str]]:
+    """Devuelve las filas de un csv"""
+    with open(ruta, newline="", encoding="utf-8") as archivo:
+        return list(csv.reader(archivo))
+
+
+def cargar_datos():
+    """Importa los csv válidos de prueba"""
+    importar_usuarios(str(DATOS / "usuarios_valido.csv"))
+    importar_bicis(str(DATOS / "bicis_valido.csv"))
+    importar_registros(str(DATOS / "registros_valido.csv"))
+
+
+def test_exportar_completo(bd_temporal, tmp_path):
+    """La exportación reproduce el csv importado con la misma cabecera"""
+    cargar_datos()
+    ruta = tmp_path / "registros.csv"
+    resultado = exportar_registros_csv(str(ruta), tam_lote=2)
+    assert resultado.filas == 3
+    assert resultado.ultimo_id == 3
+    assert leer(ruta) == leer(DATOS / "registros_valido.csv")
+
+
+def test_exportar_incremental_y_rango(bd_temporal, tmp_path):
+    """Se puede continuar desde el último id y filtrar por fechas"""
+    cargar_datos()
+    ruta = tmp_path / "registros.csv"
+    primera = exportar_registros_csv(
+        str(ruta), hasta=texto_a_microsegundos("2025-03-01 09:00:00")
+    )
+    assert primera.filas == 1
+
+    segunda = exportar_registros_csv(
+        str(ruta), despues_de_id=primera.ultimo_id, anexar=True
+    )
+    assert segunda.filas == 2
+    assert segunda.ultimo_id == 3
+    assert leer(ruta) == leer(DATOS / "registros_valido.csv")
+
+    # Sin registros nuevos el archivo queda solo con la cabecera
+    assert exportar_registros_csv(str(ruta), despues_de_id=3).filas == 0
+    assert leer(ruta) == [CABECERA_REGISTROS.split(",")]
+
+
+def test_reimportar_exportacion(bd_temporal, tmp_path):
+    """Los microsegundos se conservan, así que reimportar lo exportado no duplica nada"""
+    cargar_datos()
+    inicio = texto_a_microsegundos("2025-03-02 10:00:00")
+    resultados = Registro.guardar_lote(
+        [
+            ("IN", "BK001", "12345678Z", inicio + 125),
+            ("OUT", "BK001", "12345678Z", inicio + 1_500_000),
+        ]
+    )
+    assert all(resultados)
+    ruta = tmp_path / "registros.csv"
+    exportar_registros_csv(str(ruta))
+    assert [fila[0] for fila in leer(ruta)[-2:]] == [
+        "2025-03-02 10:00:00.000125",
+        "2025-03-02 10:00:01.500000",
+    ]
+
+    resultado = importar_registros(str(ruta))
+    assert resultado.insertadas == 0
@@ -0,0 +1,95 @@
+"""Archivo de pruebas de la consulta del histórico, usa una base de datos temporal"""
+
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.data_utils.historial import (
+    PosicionHistorial,
+    historial_bici,
+    historial_usuario,
+    recorrer_historial_usuario,
+)
+
+INICIO = 1740816000000000
+MINUTO = 60_000_000
+
+
+# La bici de Ana alterna entradas y salidas cada minuto; dos eventos en el mismo
+# microsegundo se separan por id y Carlos tiene un único evento de su bici
+REGISTROS = [
+    *((i, "IN" if i % 2 == 0 else "OUT", "BK001", "12345678Z") for i in range(25)),
+    (24, "OUT", "BK001", "12345678Z"),
+    (0, "IN", "BK002", "87654321X"),
+]
+
+
+def test_historial_bici_paginas(bd_temporal, poblar, insertar):
+    """Las páginas de una bici van de la más reciente a la más antigua sin repetir eventos"""
+    poblar()
+    insertar(REGISTROS, INICIO, MINUTO)
+    pagina = historial_bici("BK001", limite=10)
+    assert len(pagina.eventos) == 10
+    assert pagina.eventos[0].id == 26
+    assert pagina.eventos[1].id == 25
+    assert pagina.eventos[0].timestamp == pagina.eventos[1].timestamp
+
+    vistos = [e.id for e in pagina.eventos]
+    while pagina.siguiente:
+        pagina = historial_bici("BK001", limite=10, despues_de=pagina.siguiente)
+        vistos += [e.id for e in pagina.eventos]
+    assert vistos == list(range(26, 0, -1))
+
+
+def test_historial_usuario_entre_fechas(bd_temporal, poblar, insertar):
+    """El histórico de un usuario se filtra por fechas y se recorre en orden cronológico"""
+    poblar()
+    insertar(REGISTROS, INICIO, MINUTO)
+    desde, hasta = INICIO + 5 * MINUTO, INICIO + 15 * MINUTO
+    pagina = historial_usuario("12345678Z", limite=4, desde=desde, hasta=hasta)
+    assert [e.timestamp for e in pagina.eventos] == [
+        desde + i * MINUTO for i in range(4)
+    ]
+    assert pagina.siguiente == PosicionHistorial(desde + 3 * MINUTO, 9)
+
+    eventos = list(recorrer_historial_usuario("12345678Z", desde, hasta, tam_pagina=3))
+    assert len(eventos) == 10
+    assert all(e.dni_usuario == "12345678Z" for e in eventos)
+    assert historial_usuario("87654321X").eventos[0].num_serie == "BK002"
+    assert historial_usuario("00000000T") == ([], None)
+
+
+def test_historial_usa_indice_sin_ordenar(bd_temporal, poblar, insertar):
+    """Las páginas bajan por el índice sin OFFSET ni ordenación temporal"""
+    poblar()
+    insertar(REGISTROS, INICIO, MINUTO)
+    sentencias = []
+
+    def capturar(conexion, cursor, sql, parametros, contexto, executemany):
+        if sql.startswith("SELECT"):
+            sentencias.append((sql, parametros))
+
+    event.listen(bd_temporal.engine, "before_cursor_execute", capturar)
+    try:
+        historial_bici("BK001", limite=5, despues_de=PosicionHistorial(INICIO, 9))
+        historial_usuario("12345678Z", despues_de=PosicionHistorial(INICIO, 1))
+    finally:
+        event.remove(bd_temporal.engine, "before_cursor_execute", capturar)
+
+    with bd_temporal.engine.connect() as conexion:
+        for sql, parametros, indice in zip(
+            *zip(*sentencias),
+            ("ix_registros_num_serie_timestamp", "ix_registros_dni_usuario_timestamp"),
+        ):
+            plan = conexion.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parametros)
+            detalle = " ".join(fila[-1] for fila in plan)
+            assert indice in detalle
+            assert "TEMP B-TREE" not in detalle
+
+
+def test_historial_limite_invalido(bd_temporal):
+    with pytest.raises(ValueError):
+        historial_bici("BK001", limite=0)
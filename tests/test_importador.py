@@ -0,0 +1,93 @@
+"""Archivo de pruebas de la importación masiva de csv, usa una base de datos temporal"""
+
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.data_utils.importador import (
+    importar_bicis,
+    importar_registros,
+    importar_usuarios,
+)
+from parking.data_utils.validators import puede_entrar, puede_salir
+from parking.models.bd import EstadoBiciORM, RegistroORM, UsuarioORM
+from parking.models.estado import leer_ocupacion
+
+DATOS = Path(__file__).resolve().parent / "data"
+
+
+def test_importar_validos(bd_temporal):
+    """Los csv válidos se importan completos y dejan el estado de las bicis al día"""
+    assert importar_usuarios(str(DATOS / "usuarios_valido.csv")).insertadas == 3
+    assert importar_bicis(str(DATOS / "bicis_valido.csv")).insertadas == 3
+    resultado = importar_registros(str(DATOS / "registros_valido.csv"), tam_lote=2)
+    assert resultado.insertadas == resultado.leidas == 3
+    assert resultado.errores == []
+
+    with bd_temporal.crear_sesion() as sesion:
+        assert sesion.query(RegistroORM).count() == 3
+        assert sesion.get(EstadoBiciORM, "BK001").accion == "OUT"
+        assert leer_ocupacion(sesion) == 1
+    assert puede_entrar("BK001") is True
+    assert puede_salir("BK002") is True
+
+    # Reimportar el mismo archivo no duplica los eventos
+    resultado = importar_registros(str(DATOS / "registros_valido.csv"))
+    assert resultado.insertadas == 0
+    with bd_temporal.crear_sesion() as sesion:
+        assert sesion.query(RegistroORM).count() == 3
+        assert leer_ocupacion(sesion) == 1
+
+
+def test_importar_invalidos(bd_temporal):
+    """Las filas inválidas o repetidas se rechazan indicando su línea"""
+    resultado = importar_usuarios(str(DATOS / "usuarios_invalido.csv"))
+    assert [linea for linea, _ in resultado.errores] == [2, 3, 5]
+
+    importar_usuarios(str(DATOS / "usuarios_valido.csv"))
+    resultado = importar_bicis(str(DATOS / "bicis_invalido.csv"))
+    assert resultado.insertadas == 1
+    assert resultado.rechazadas == 3
+    assert [linea for linea, _ in resultado.errores] == [4, 5]
+
+    resultado = importar_registros(str(DATOS / "registros_invalido.csv"))
+    assert resultado.insertadas == 0
+    assert len(resultado.errores) == 4
+
+
+def test_importar_cabecera_incorrecta(bd_temporal, tmp_path):
+    """Un csv con otra cabecera no se importa"""
+    ruta = tmp_path / "usuarios.csv"
+    ruta.write_text("dni,email\n12345678Z,ana@example.com\n", encoding="utf-8")
+    resultado = importar_usuarios(str(ruta))
+    assert resultado.leidas == 0
+    assert resultado.errores[0][0] == 1
+    with bd_temporal.crear_sesion() as sesion:
+        assert sesion.query(UsuarioORM).count() == 0
+
+
+def test_importar_letra_dni_incorrecta(bd_temporal, tmp_path):
+    """Un DNI con el formato correcto pero otra letra de control se rechaza"""
+    ruta = tmp_path / "usuarios.csv"
+    ruta.write_text(
+        "dni,nombre,email\n12345678A,Ana,ana@example.com\n12345678Z,Ana,ana@example.com\n",
+        encoding="utf-8",
+    )
+    resultado = importar_usuarios(str(ruta))
+    assert resultado.insertadas == 1
+    assert resultado.errores == [(2, "la letra del DNI no es correcta")]
+
+
+def test_importar_bici_sin_usuario(bd_temporal, tmp_path):
+    """Una bici de un usuario que no existe se rechaza sin romper el resto del lote"""
+    importar_usuarios(str(DATOS / "usuarios_valido.csv"))
+    ruta = tmp_path / "bicis.csv"
+    ruta.write_text(
+        "num_serie,dni_usuario,marca,modelo\n"
+        "BK001,12345678Z,Orbea,Carpe\n"
+        "BK002,00000000T,BH,Atom\n",
+        encoding="utf-8",
+    )
+    resultado = importar_bicis(str(ruta))
+    assert resultado.insertadas == 1
+    assert resultado.errores == [(3, "el usuario no está registrado")]
@@ -0,0 +1,97 @@
+"""Archivo de pruebas de la instantánea de solo lectura, usa una base de datos temporal"""
+
+from pathlib import Path
+import sys
+import time
+
+from sqlalchemy import func, select, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.data_utils.historial import historial_bici
+from parking.models.bd import BiciORM, RegistroORM
+from parking.models.instantanea import Instantanea
+from parking.models.registro import Registro
+
+
+def test_sin_instantanea_lee_de_la_principal(bd_temporal, poblar):
+    """Si no está activa, crear_sesion_lectura ve las escrituras al momento"""
+    poblar(usuarios=1)
+    assert Registro("IN", "BK001", "12345678Z").guardar()
+    assert len(historial_bici("BK001").eventos) == 1
+
+
+def test_informes_leen_la_copia_hasta_refrescar(bd_temporal, tmp_path, poblar):
+    """Los informes no ven las escrituras posteriores a la copia hasta el refresco"""
+    poblar(usuarios=1)
+    assert Registro("IN", "BK001", "12345678Z").guardar()
+    instantanea = bd_temporal.activar_instantanea(str(tmp_path / "lectura.db"))
+
+    assert Registro("OUT", "BK001", "12345678Z").guardar()
+    assert [e.accion for e in historial_bici("BK001").eventos] == ["IN"]
+
+    instantanea.refrescar()
+    assert [e.accion for e in historial_bici("BK001").eventos] == ["OUT", "IN"]
+    instantanea.parar()
+
+
+def test_copia_inmutable_y_sesion_abierta(bd_temporal, tmp_path, poblar):
+    """La copia no admite escrituras y una sesión abierta sobrevive a un refresco"""
+    poblar(usuarios=1)
+    instantanea = bd_temporal.activar_instantanea(str(tmp_path / "lectura.db"))
+
+    with bd_temporal.crear_sesion_lectura() as sesion:
+        assert sesion.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+        assert Registro("IN", "BK001", "12345678Z").guardar()
+        instantanea.refrescar()
+        assert sesion.execute(select(func.count()).select_from(BiciORM)).scalar() == 1
+
+    try:
+        with bd_temporal.crear_sesion_lectura() as sesion:
+            sesion.execute(text("DELETE FROM bicis"))
+    except Exception as error:
+        assert "readonly" in str(error)
+    else:
+        raise AssertionError("la instantánea no debería admitir escrituras")
+    instantanea.parar()
+
+
+def test_refresco_periodico(bd_temporal, tmp_path, poblar):
+    """Con intervalo un hilo rehace la copia sin intervención"""
+    poblar(usuarios=1)
+    instantanea = bd_temporal.activar_instantanea(str(tmp_path / "lectura.db"), 0.01)
+    primera = instantanea.refrescada
+    assert Registro("IN", "BK001", "12345678Z").guardar()
+    for _ in range(200):
+        if instantanea.refrescada != primera and historial_bici("BK001").eventos:
+            break
+        time.sleep(0.01)
+    instantanea.parar()
+    assert len(historial_bici("BK001").eventos) == 1
+
+
+def test_versiones_y_otro_lector(bd_temporal, tmp_path, poblar):
+    """Cada refresco crea una versión nueva sin sobrescribir la abierta y borra las viejas"""
+    poblar(usuarios=1)
+    ruta = str(tmp_path / "lectura.db")
+    instantanea = bd_temporal.activar_instantanea(ruta)
+    # Otro proceso con su propia instantánea sobre la misma ruta
+    otro = Instantanea(bd_temporal.engine, ruta)
+    with otro.crear_sesion() as sesion:
+        assert (
+            sesion.execute(select(func.count()).select_from(RegistroORM)).scalar() == 0
+        )
+    assert otro.version == instantanea.version
+
+    assert Registro("IN", "BK001", "12345678Z").guardar()
+    anterior = instantanea.version
+    instantanea.refrescar()
+    assert instantanea.version != anterior
+    assert [archivo for _, archivo in instantanea.versiones()] == [instantanea.version]
+
+    with otro.crear_sesion() as sesion:
+        assert (
+            sesion.execute(select(func.count()).select_from(RegistroORM)).scalar() == 1
+        )
+    assert otro.version == instantanea.version
+    otro.parar()
+    instantanea.parar()
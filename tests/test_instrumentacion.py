@@ -0,0 +1,80 @@
+"""Archivo de pruebas de la instrumentación de la base de datos"""
+
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.data_utils.validators import puede_entrar
+from parking.models import instrumentacion
+from parking.models.bd import BiciORM, UsuarioORM
+from parking.models.registro import Registro
+
+
+@pytest.fixture
+def metricas(bd_temporal):
+    """Activa la instrumentación sobre la base de datos temporal"""
+    with bd_temporal.crear_sesion() as sesion:
+        sesion.add(UsuarioORM("12345678Z", "Ana", "ana@example.com"))
+        sesion.add(BiciORM("BK001", "12345678Z", "Orbea", "Carpe"))
+    instrumentacion.metricas.reiniciar()
+    instrumentacion.activar(bd_temporal.engine)
+    yield instrumentacion.metricas
+    instrumentacion.desactivar(bd_temporal.engine)
+    instrumentacion.metricas.reiniciar()
+
+
+def test_forma_sentencia():
+    """Las sentencias que solo cambian en valores comparten forma"""
+    assert instrumentacion.forma_sentencia(
+        "SELECT a\n  FROM t WHERE id IN (?, ?, ?) LIMIT 10"
+    ) == instrumentacion.forma_sentencia("SELECT a FROM t WHERE id IN (?, ?) LIMIT 5")
+
+
+def test_sesiones_y_sentencias_por_operacion(metricas):
+    """Un registro abre una sesión y el coste se atribuye a su operación"""
+    assert Registro("IN", "BK001", "12345678Z").guardar().ok is True
+    assert Registro("OUT", "BK001", "12345678Z").guardar().ok is True
+    puede_entrar("BK001")
+
+    resumen = metricas.por_operacion()
+    assert resumen["Registro.guardar"]["llamadas"] == 2
+    assert resumen["Registro.guardar"]["sesiones"] == 1
+    # BEGIN, contexto, insert del registro, estado y ocupación
+    assert resumen["Registro.guardar"]["sentencias"] == 5
+    assert resumen["puede_entrar"]["sesiones"] == 1
+    assert "Registro.guardar llamadas=2" in instrumentacion.linea_log()
+
+
+def test_sentencia_fallida(metricas, bd_temporal):
+    """Una sentencia que falla no se mide ni deja su inicio pendiente en la conexión"""
+    with bd_temporal.engine.connect() as conexion:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conexion.exec_driver_sql("SELECT * FROM no_existe")
+        conexion.exec_driver_sql("SELECT 1")
+        assert not any(isinstance(v, list) and v for v in conexion.info.values())
+
+    assert not any("no_existe" in forma for forma in metricas.sentencias)
+    assert metricas.sentencias["SELECT N"].cuenta == 1
+
+
+def test_exportar_prometheus(metricas, tmp_path):
+    """El archivo de Prometheus tiene histogramas por sentencia y contadores por operación"""
+    Registro("IN", "BK001", "12345678Z").guardar()
+    ruta = tmp_path / "parking.prom"
+    instrumentacion.escribir_prometheus(str(ruta))
+    texto = ruta.read_text(encoding="utf-8")
+    assert "# TYPE parking_sql_segundos histogram" in texto
+    assert 'parking_sesiones_total{operacion="Registro.guardar"} 1' in texto
+    assert 'parking_operacion_segundos_count{operacion="Registro.guardar"} 1' in texto
+
+
+def test_desactivada_no_mide(bd_temporal):
+    """Sin activar no se acumula nada"""
+    instrumentacion.metricas.reiniciar()
+    puede_entrar("BK001")
+    assert instrumentacion.metricas.por_operacion() == {}
+    assert instrumentacion.metricas.sesiones == {}
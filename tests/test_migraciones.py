@@ -0,0 +1,106 @@
+"""Archivo de pruebas de las migraciones del esquema, usa bases de datos temporales"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sqlite3
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.data_utils.tiempo import texto_a_microsegundos
+from parking.models.bd import crear_motor
+from parking.models.migraciones import VERSION_ESQUEMA, preparar_esquema, version_actual
+
+
+def crear_bd_antigua(ruta: Path) -> None:
+    """Crea una base de datos con el esquema original, sin índices ni estado"""
+    conexion = sqlite3.connect(ruta)
+    conexion.executescript(
+        """
+        CREATE TABLE usuarios (dni VARCHAR PRIMARY KEY, nombre VARCHAR NOT NULL,
+            email VARCHAR UNIQUE NOT NULL);
+        CREATE TABLE bicis (num_serie VARCHAR PRIMARY KEY, dni_usuario VARCHAR NOT NULL,
+            marca VARCHAR NOT NULL, modelo VARCHAR NOT NULL);
+        CREATE TABLE registros (timestamp VARCHAR PRIMARY KEY, accion VARCHAR,
+            num_serie VARCHAR NOT NULL, dni_usuario VARCHAR NOT NULL);
+        INSERT INTO registros VALUES ('2025-03-01 08:15:22', 'IN', 'BK001', '12345678Z');
+        INSERT INTO registros VALUES ('2025-03-01 09:02:10', 'OUT', 'BK001', '12345678Z');
+        """
+    )
+    conexion.commit()
+    conexion.close()
+
+
+def test_bd_nueva_queda_en_ultima_version(tmp_path):
+    """Una base de datos vacía se crea desde los modelos sin aplicar migraciones"""
+    engine = crear_motor(str(tmp_path / "bd.db"))
+    assert preparar_esquema(engine) == []
+    with engine.connect() as conexion:
+        assert version_actual(conexion) == VERSION_ESQUEMA
+
+
+def test_bd_antigua_se_migra(tmp_path):
+    """Una base de datos anterior a las migraciones recibe el estado y los índices"""
+    ruta = tmp_path / "bd.db"
+    crear_bd_antigua(ruta)
+    engine = crear_motor(str(ruta))
+
+    assert preparar_esquema(engine) == list(range(1, VERSION_ESQUEMA + 1))
+    assert preparar_esquema(engine) == []
+
+    with engine.connect() as conexion:
+        assert version_actual(conexion) == VERSION_ESQUEMA
+        estado = conexion.exec_driver_sql(
+            "SELECT accion FROM estado_bicis WHERE num_serie = 'BK001'"
+        ).scalar()
+        assert estado == "OUT"
+        ocupacion = conexion.exec_driver_sql("SELECT bicis FROM ocupacion").scalar()
+        assert ocupacion == 0
+        plan = conexion.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM registros WHERE num_serie = 'BK001' "
+            "ORDER BY timestamp DESC"
+        ).fetchall()
+        # Ambos índices empiezan por (num_serie, timestamp), SQLite puede usar cualquiera
+        assert any(
+            indice in str(plan)
+            for indice in ("ix_registros_num_serie_timestamp", "ux_registros_evento")
+        )
+        tablas = {
+            fila[0]
+            for fila in conexion.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        }
+        assert {"resumen_horas", "resumen_dias", "marcas", "analitica"} <= tablas
+
+        filas = conexion.exec_driver_sql(
+            "SELECT id, timestamp FROM registros ORDER BY id"
+        ).fetchall()
+        assert filas == [
+            (1, texto_a_microsegundos("2025-03-01 08:15:22")),
+            (2, texto_a_microsegundos("2025-03-01 09:02:10")),
+        ]
+        textos = conexion.exec_driver_sql(
+            "SELECT timestamp FROM registros_texto ORDER BY id"
+        ).scalars()
+        assert list(textos) == ["2025-03-01 08:15:22", "2025-03-01 09:02:10"]
+
+
+def test_varios_procesos_migran_una_sola_vez(tmp_path):
+    """Si varios motores preparan a la vez una base de datos antigua, cada migración se aplica una vez"""
+    ruta = tmp_path / "bd.db"
+    crear_bd_antigua(ruta)
+    motores = [crear_motor(str(ruta)) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=len(motores)) as hilos:
+        aplicadas = list(hilos.map(preparar_esquema, motores))
+
+    assert sorted(v for lista in aplicadas for v in lista) == list(
+        range(1, VERSION_ESQUEMA + 1)
+    )
+    with motores[0].connect() as conexion:
+        filas = conexion.exec_driver_sql(
+            "SELECT timestamp FROM registros ORDER BY id"
+        ).scalars()
+        assert list(filas) == [
+            texto_a_microsegundos("2025-03-01 08:15:22"),
+            texto_a_microsegundos("2025-03-01 09:02:10"),
+        ]
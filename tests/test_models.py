@@ -2,6 +2,7 @@
 
 from pathlib import Path
 import sys
+from types import SimpleNamespace
 import pytest
 from unittest.mock import MagicMock, patch
 
@@ -12,6 +13,8 @@ with patch("parking.models.bd.Bd", mock_bd_class):
     from parking.models.bici import Bici
     from parking.models.registro import Registro
     from parking.models.bd import UsuarioORM, BiciORM, RegistroORM
+    from parking.models.resultado import CodigoError, Resultado
+    from parking.ui_utils.menu_handlers import mostrar_resultado
 
 
 # Usuario
@@ -28,19 +31,23 @@ def test_guardar_usuario_ok(capfd):
         mock_cm.return_value.__enter__.return_value = mock_sesion
         mock_sesion.query.return_value.filter_by.return_value.first.return_value = None
 
-        assert Usuario("12345678A", "Ana", "ana@mail.com").guardar() is True
-        assert "OK: se ha registrado el usuario" in capfd.readouterr().out
+        resultado = Usuario("12345678Z", "Ana", "ana@mail.com").guardar()
+        assert resultado.ok is True
+        assert str(resultado) == "OK: se ha registrado el usuario"
+        # Los modelos no imprimen, eso lo hace la consola
+        assert capfd.readouterr().out == ""
 
 
-def test_guardar_usuario_no_valido(capfd):
+def test_guardar_usuario_no_valido():
     """No guarda un usuario inválido"""
     usuario = Usuario("", "", "error")
-    assert usuario.guardar() is False
-    out = capfd.readouterr().out
-    assert "ERROR" in out
+    resultado = usuario.guardar()
+    assert not resultado
+    assert resultado.codigo is CodigoError.DNI_NO_VALIDO
+    assert str(resultado) == "ERROR: el DNI introducido no es válido"
 
 
-def test_borrar_usuario_ok(capfd):
+def test_borrar_usuario_ok():
     """Borra un usuario existente sin bicis"""
     usuario = Usuario("12345678A")
     usuario.bicis = []
@@ -52,11 +59,12 @@ def test_borrar_usuario_ok(capfd):
             UsuarioORM("12345678A", "Ana", "ana@mail.com")
         )
 
-        assert usuario.borrar() is True
-        assert "OK: usuario borrado" in capfd.readouterr().out
+        resultado = usuario.borrar()
+        assert resultado.ok is True
+        assert str(resultado) == "OK: usuario borrado"
 
 
-def test_borrar_usuario_con_bicis(capfd):
+def test_borrar_usuario_con_bicis():
     """No borra un usuario con bicis"""
     usuario = Usuario("12345678A")
     usuario.bicis = ["B123"]
@@ -69,16 +77,15 @@ def test_borrar_usuario_con_bicis(capfd):
     with patch(
         "parking.models.usuario.bd.crear_sesion", return_value=mock_context_manager
     ):
-        result = usuario.borrar()
-        out = capfd.readouterr().out
-        assert result is False
-        assert "ERROR" in out
+        resultado = usuario.borrar()
+        assert resultado.ok is False
+        assert resultado.codigo is CodigoError.USUARIO_CON_BICIS
 
 
 # Bici
 
 
-def test_guardar_bici_ok(capfd):
+def test_guardar_bici_ok():
     """Guarda una bici válida"""
     with (
         patch.object(Bici, "es_valido", return_value=True),
@@ -90,11 +97,12 @@ def test_guardar_bici_ok(capfd):
         mock_cm.return_value.__enter__.return_value = mock_sesion
         mock_sesion.query.return_value.filter_by.return_value.first.return_value = None
 
-        assert Bici("B123", "12345678A", "Orbea", "MX20").guardar() is True
-        assert "OK: se ha registrado la bicicleta" in capfd.readouterr().out
+        resultado = Bici("B123", "12345678A", "Orbea", "MX20").guardar()
+        assert resultado.ok is True
+        assert str(resultado) == "OK: se ha registrado la bicicleta"
 
 
-def test_borrar_bici_ok(capfd):
+def test_borrar_bici_ok():
     """Borra una bici existente"""
     with patch("parking.models.bici.bd.crear_sesion") as mock_cm:
         mock_sesion = MagicMock()
@@ -103,24 +111,40 @@ def test_borrar_bici_ok(capfd):
             BiciORM("B123", "12345678A", "Orbea", "MX20")
         )
 
-        assert Bici("B123").borrar() is True
-        assert "OK: bicicleta borrada" in capfd.readouterr().out
+        resultado = Bici("B123").borrar()
+        assert resultado.ok is True
+        assert str(resultado) == "OK: bicicleta borrada"
 
 
-def test_borrar_bici_no_existe(capfd):
+def test_borrar_bici_no_existe():
     """No borra una bici inexistente"""
     with patch("parking.models.bici.bd.crear_sesion") as mock_cm:
         mock_sesion = MagicMock()
         mock_cm.return_value.__enter__.return_value = mock_sesion
         mock_sesion.query.return_value.filter_by.return_value.first.return_value = None
 
-        assert Bici("B123").borrar() is False
-        assert "ERROR: la bicicleta no existe" in capfd.readouterr().out
+        resultado = Bici("B123").borrar()
+        assert resultado.ok is False
+        assert resultado.codigo is CodigoError.BICI_NO_EXISTE
+        assert str(resultado) == "ERROR: la bicicleta no existe"
 
 
 # Registro
 
 
+def contexto_registro(
+    accion_ultima, existe_usuario=True, existe_bici=True, es_propietario=True
+):
+    """Simula la fila que devuelve Registro.consultar_contexto"""
+    return SimpleNamespace(
+        existe_usuario=existe_usuario,
+        existe_bici=existe_bici,
+        es_propietario=es_propietario,
+        ultima_accion=accion_ultima,
+        ocupadas=0,
+    )
+
+
 @pytest.mark.parametrize(
     "accion_ultima,esperado",
     [
@@ -131,23 +155,16 @@ def test_borrar_bici_no_existe(capfd):
 )
 def test_puede_entrar_mock(accion_ultima, esperado):
     """Verifica si puede entrar según el último estado"""
-    with (
-        patch("parking.models.registro.bd.crear_sesion") as mock_cm,
-        patch("parking.models.registro.Usuario") as mock_usuario,
-    ):
+    with patch("parking.models.registro.bd.crear_sesion") as mock_cm:
         mock_sesion = MagicMock()
         mock_cm.return_value.__enter__.return_value = mock_sesion
-        if accion_ultima is None:
-            mock_sesion.query.return_value.filter_by.return_value.order_by.return_value.first.return_value = (
-                None
-            )
-        else:
-            mock_sesion.query.return_value.filter_by.return_value.order_by.return_value.first.return_value = RegistroORM(
-                "2025-12-29 12:00:00", accion_ultima, "B123", "12345678A"
-            )
-        mock_usuario.return_value.bicis = ["B123"]
+        mock_sesion.execute.return_value.one.return_value = contexto_registro(
+            accion_ultima
+        )
         registro = Registro("IN", "B123", "12345678A")
-        assert registro.guardar() is esperado or registro.guardar() is False
+        assert registro.guardar().ok is esperado
+        assert mock_cm.call_count == 1
+        assert mock_sesion.add.called is esperado
 
 
 @pytest.mark.parametrize(
@@ -160,20 +177,64 @@ def test_puede_entrar_mock(accion_ultima, esperado):
 )
 def test_puede_salir_mock(accion_ultima, esperado):
     """Verifica si puede salir según el último estado"""
-    with (
-        patch("parking.models.registro.bd.crear_sesion") as mock_cm,
-        patch("parking.models.registro.Usuario") as mock_usuario,
-    ):
+    with patch("parking.models.registro.bd.crear_sesion") as mock_cm:
         mock_sesion = MagicMock()
         mock_cm.return_value.__enter__.return_value = mock_sesion
-        if accion_ultima is None:
-            mock_sesion.query.return_value.filter_by.return_value.order_by.return_value.first.return_value = (
-                None
-            )
-        else:
-            mock_sesion.query.return_value.filter_by.return_value.order_by.return_value.first.return_value = RegistroORM(
-                "2025-12-29 12:00:00", accion_ultima, "B123", "12345678A"
-            )
-        mock_usuario.return_value.bicis = ["B123"]
+        mock_sesion.execute.return_value.one.return_value = contexto_registro(
+            accion_ultima
+        )
         registro = Registro("OUT", "B123", "12345678A")
-        assert registro.guardar() is esperado or registro.guardar() is False
+        assert registro.guardar().ok is esperado
+        assert mock_cm.call_count == 1
+        assert mock_sesion.add.called is esperado
+
+
+@pytest.mark.parametrize(
+    "contexto,codigo",
+    [
+        (
+            contexto_registro(None, existe_usuario=False),
+            CodigoError.USUARIO_NO_REGISTRADO,
+        ),
+        (contexto_registro(None, existe_bici=False), CodigoError.BICI_NO_REGISTRADA),
+        (contexto_registro(None, es_propietario=False), CodigoError.NO_PROPIETARIO),
+    ],
+)
+def test_guardar_registro_invalido(contexto, codigo):
+    """No guarda registros de usuarios o bicis inexistentes ni de bicis ajenas"""
+    with patch("parking.models.registro.bd.crear_sesion") as mock_cm:
+        mock_sesion = MagicMock()
+        mock_cm.return_value.__enter__.return_value = mock_sesion
+        mock_sesion.execute.return_value.one.return_value = contexto
+        resultado = Registro("IN", "B123", "12345678A").guardar()
+        assert resultado.ok is False
+        assert resultado.codigo is codigo
+        mock_sesion.add.assert_not_called()
+
+
+def test_usuario_no_consulta_bicis_al_crearse():
+    """Crear un usuario no abre ninguna sesión, las bicis se cargan al usarlas"""
+    with patch("parking.models.usuario.bd.crear_sesion") as mock_cm:
+        usuario = Usuario("12345678Z", "Ana", "ana@mail.com")
+        mock_cm.assert_not_called()
+
+        mock_sesion = MagicMock()
+        mock_cm.return_value.__enter__.return_value = mock_sesion
+        mock_sesion.query.return_value.filter_by.return_value.all.return_value = [
+            BiciORM("B123", "12345678Z", "Orbea", "MX20")
+        ]
+        assert len(usuario.bicis) == 1
+        assert len(usuario.bicis) == 1
+        assert mock_cm.call_count == 1
+
+
+def test_resultado_se_evalua_como_bool(capfd):
+    """Un Resultado se puede usar como bool y la consola lo muestra con su prefijo"""
+    correcto = Resultado.correcto("usuario borrado")
+    error = Resultado.error(CodigoError.CAMPO_VACIO, "marca")
+    assert correcto and not error
+    assert str(error) == "ERROR: el campo marca no puede estar vacío"
+    assert error.campo == "marca"
+
+    assert mostrar_resultado(error) is False
+    assert capfd.readouterr().out == "ERROR: el campo marca no puede estar vacío\n"
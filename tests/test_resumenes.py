@@ -0,0 +1,155 @@
+"""Archivo de pruebas de los resúmenes por hora y día, usa una base de datos temporal"""
+
+from pathlib import Path
+import sys
+
+from sqlalchemy import select
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.data_utils.analitica import Analizador
+from parking.models.bd import ResumenDiaORM, ResumenHoraORM
+from parking.models.resumenes import (
+    HORA,
+    MARCA_RESUMENES,
+    Resumen,
+    actualizar_resumenes,
+    leer_marca,
+    medianoche,
+    reconstruir_resumenes,
+    resumen_dias,
+    resumen_horas,
+)
+
+# Las 10:00 locales de un día cualquiera, así las pruebas no cruzan la medianoche
+INICIO = medianoche(1740816000000000) + 10 * HORA
+MINUTO = 60_000_000
+DIA = 24 * HORA
+
+
+def leer_tablas(bd):
+    with bd.crear_sesion(escritura=False) as sesion:
+        horas = sesion.execute(select(ResumenHoraORM.__table__)).all()
+        dias = sesion.execute(select(ResumenDiaORM.__table__)).all()
+    return sorted(horas), sorted(dias)
+
+
+EVENTOS = [
+    (0, "IN", "BK001", "12345678Z"),
+    (10, "IN", "BK002", "87654321X"),
+    (20, "OUT", "BK001", "12345678Z"),
+    (70, "IN", "BK001", "12345678Z"),
+    (100, "OUT", "BK002", "87654321X"),
+    (190, "OUT", "BK001", "12345678Z"),
+    (200, "IN", "BK001", "12345678Z"),
+]
+
+
+def test_resumen_por_horas(bd_temporal, poblar, insertar):
+    """Cada hora con eventos guarda sus conteos, el pico y las bicis que quedan"""
+    poblar()
+    insertar(EVENTOS, INICIO, MINUTO)
+
+    assert actualizar_resumenes() == 7
+    assert resumen_horas(INICIO, INICIO + 4 * HORA) == [
+        Resumen(INICIO, 2, 1, 2, 2, 2, 1),
+        Resumen(INICIO + HORA, 1, 1, 2, 2, 2, 1),
+        Resumen(INICIO + 3 * HORA, 1, 1, 1, 1, 1, 1),
+    ]
+
+
+def test_resumen_por_dias(bd_temporal, poblar, insertar):
+    """Los días cuentan bicis y usuarios distintos de todo el día, no sumando horas"""
+    poblar()
+    insertar(EVENTOS, INICIO, MINUTO)
+    insertar([(24 * 60, "OUT", "BK001", "12345678Z")], INICIO, MINUTO)
+
+    actualizar_resumenes()
+    hoy = resumen_dias("0000-01-01", "9999-12-31")
+    assert [
+        (d.entradas, d.salidas, d.bicis, d.usuarios, d.pico, d.final) for d in hoy
+    ] == [
+        (4, 3, 2, 2, 2, 1),
+        (0, 1, 1, 1, 1, 0),
+    ]
+
+
+def test_coincide_con_el_analizador(bd_temporal, poblar, insertar):
+    """El pico y el final de cada hora son los de la curva de ocupación del Analizador"""
+    poblar()
+    insertar(EVENTOS, INICIO, MINUTO)
+    actualizar_resumenes()
+
+    analizador = Analizador()
+    analizador.actualizar()
+    curva = {
+        h.hora: (h.pico, h.final)
+        for h in analizador.ocupacion_por_hora()
+        if h.hora != INICIO + 2 * HORA
+    }
+    horas = resumen_horas(INICIO, INICIO + 4 * HORA)
+    assert {h.periodo: (h.pico, h.final) for h in horas} == curva
+
+
+def test_actualizacion_incremental(bd_temporal, poblar, insertar):
+    """Solo se procesan los registros nuevos y la marca avanza hasta el último id"""
+    poblar()
+    insertar(EVENTOS[:3], INICIO, MINUTO)
+    assert actualizar_resumenes() == 3
+    assert actualizar_resumenes() == 0
+
+    insertar(EVENTOS[3:], INICIO, MINUTO)
+    assert actualizar_resumenes() == 4
+    with bd_temporal.crear_sesion(escritura=False) as sesion:
+        assert leer_marca(sesion, MARCA_RESUMENES) == 7
+
+    incremental = leer_tablas(bd_temporal)
+    assert reconstruir_resumenes() == 1
+    assert leer_tablas(bd_temporal) == incremental
+
+
+def test_registro_atrasado_corrige_los_dias_siguientes(bd_temporal, poblar, insertar):
+    """Un registro de un día anterior recalcula desde ese día y arrastra la ocupación"""
+    poblar()
+    insertar([(24 * 60, "IN", "BK001", "12345678Z")], INICIO, MINUTO)
+    actualizar_resumenes()
+    assert resumen_horas(INICIO + DIA, INICIO + DIA + HORA)[0].final == 1
+
+    insertar([(0, "IN", "BK002", "87654321X")], INICIO, MINUTO)
+    assert actualizar_resumenes() == 1
+    assert resumen_horas(INICIO, INICIO + HORA)[0].final == 1
+    assert resumen_horas(INICIO + DIA, INICIO + DIA + HORA)[0].final == 2
+
+
+def test_reconstruir_por_lotes(bd_temporal, poblar, insertar):
+    """Reconstruir de día en día da lo mismo que de una vez y conserva días anteriores"""
+    poblar()
+    insertar(
+        [
+            (0, "IN", "BK001", "12345678Z"),
+            (24 * 60, "IN", "BK002", "87654321X"),
+            (3 * 24 * 60, "OUT", "BK001", "12345678Z"),
+        ],
+        INICIO,
+        MINUTO,
+    )
+    with bd_temporal.crear_sesion() as sesion:
+        sesion.add(
+            ResumenDiaORM(
+                dia="2000-01-01",
+                entradas=1,
+                salidas=0,
+                bicis=1,
+                usuarios=1,
+                pico=1,
+                final=1,
+            )
+        )
+
+    assert reconstruir_resumenes(dias_por_lote=1) == 3
+    por_dias = leer_tablas(bd_temporal)
+    assert reconstruir_resumenes() == 3
+    assert leer_tablas(bd_temporal) == por_dias
+
+    dias = resumen_dias("2000-01-01", "9999-12-31")
+    assert dias[0].periodo == "2000-01-01"
+    assert [d.final for d in dias[1:]] == [1, 2, 1]
@@ -0,0 +1,107 @@
+"""Archivo de pruebas del servicio para tornos, usa una base de datos temporal"""
+
+import asyncio
+import json
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.servicio import Servicio
+
+
+def atender(peticiones: list) -> list[dict]:
+    """Resuelve las peticiones en orden con un servicio nuevo"""
+
+    async def _atender():
+        servicio = Servicio()
+        try:
+            return [await servicio.atender(p) for p in peticiones]
+        finally:
+            await servicio.cerrar()
+
+    return asyncio.run(_atender())
+
+
+def test_atender_flujo_completo(bd_temporal):
+    """Alta de usuario y bici, entrada, consulta y salida"""
+    respuestas = atender(
+        [
+            {
+                "op": "registrar_usuario",
+                "dni": "12345678Z",
+                "nombre": "Ana",
+                "email": "ana@example.com",
+            },
+            {
+                "op": "registrar_bici",
+                "num_serie": "BK001",
+                "dni_usuario": "12345678Z",
+                "marca": "Orbea",
+                "modelo": "Carpe",
+            },
+            {"op": "entrada", "num_serie": "BK001", "dni_usuario": "12345678Z"},
+            {"op": "entrada", "num_serie": "BK001", "dni_usuario": "12345678Z"},
+            {"op": "estado", "num_serie": "BK001"},
+            {"op": "ocupacion"},
+            {"op": "salida", "num_serie": "BK001", "dni_usuario": "12345678Z"},
+        ]
+    )
+    assert [r["ok"] for r in respuestas] == [True, True, True, False, True, True, True]
+    assert respuestas[0]["mensaje"] == "OK: se ha registrado el usuario"
+    assert respuestas[3]["mensaje"] == "ERROR: Esta bicicleta no puede entrar"
+    assert respuestas[3]["codigo"] == "no_puede_entrar"
+    assert respuestas[2]["codigo"] is None
+    assert respuestas[4]["puede_salir"] is True
+    assert respuestas[5]["bicis"] == 1
+
+
+@pytest.mark.parametrize(
+    "peticion, mensaje",
+    [
+        ([], "ERROR: la petición debe ser un objeto JSON"),
+        ({"op": "volar"}, "ERROR: operación desconocida volar"),
+        ({"op": "entrada", "num_serie": "BK001"}, "ERROR: falta el campo dni_usuario"),
+        (
+            {"op": "salida", "num_serie": "BK001", "dni_usuario": "1", "timestamp": []},
+            "ERROR: el campo timestamp no es válido",
+        ),
+    ],
+)
+def test_atender_peticion_invalida(peticion, mensaje):
+    """Las peticiones mal formadas se rechazan sin tocar la base de datos"""
+    assert atender([peticion]) == [{"ok": False, "mensaje": mensaje}]
+
+
+def test_servicio_tcp(bd_temporal):
+    """Varias conexiones simultáneas reciben una respuesta por línea"""
+
+    async def cliente(puerto: int, lineas: list[bytes]) -> list[dict]:
+        lector, escritor = await asyncio.open_connection("127.0.0.1", puerto)
+        respuestas = []
+        for linea in lineas:
+            escritor.write(linea + b"\n")
+            await escritor.drain()
+            respuestas.append(json.loads(await lector.readline()))
+        escritor.close()
+        await escritor.wait_closed()
+        return respuestas
+
+    async def probar():
+        servicio = Servicio()
+        servidor = await servicio.iniciar(host="127.0.0.1", puerto=0)
+        puerto = servidor.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(
+                *(
+                    cliente(puerto, [b"no es json", b'{"op": "ocupacion"}'])
+                    for _ in range(5)
+                )
+            )
+        finally:
+            await servicio.cerrar()
+
+    for respuestas in asyncio.run(probar()):
+        assert respuestas[0]["ok"] is False
+        assert respuestas[1] == {"ok": True, "mensaje": "", "bicis": 0}
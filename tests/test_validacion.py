@@ -0,0 +1,80 @@
+"""Archivo de pruebas de las reglas de validación por valor y por columna"""
+
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from parking.data_utils.validacion import (
+    CodigoValidacion,
+    a_columnas,
+    letra_dni,
+    validar_acciones,
+    validar_columnas,
+    validar_dni,
+    validar_dnis,
+    validar_email,
+    validar_emails,
+    validar_no_vacios,
+)
+
+
+def test_letra_dni():
+    assert letra_dni(12345678) == "Z"
+    assert letra_dni(0) == "T"
+
+
+def test_validar_dni_y_nie():
+    """Se comprueba el formato y la letra de control, también de los NIE"""
+    assert validar_dni("12345678Z") is None
+    assert validar_dni("12345678z") is None
+    assert validar_dni("X1234567L") is None
+    assert validar_dni("Y1234567X") is None
+    assert validar_dni("12345678A") is CodigoValidacion.DNI_LETRA
+    assert validar_dni("X1234567A") is CodigoValidacion.DNI_LETRA
+    assert validar_dni("1234567Z") is CodigoValidacion.DNI_FORMATO
+    assert validar_dni("12345678Z ") is CodigoValidacion.DNI_FORMATO
+    assert validar_dni("A1234567Z") is CodigoValidacion.DNI_FORMATO
+
+
+def test_validar_email():
+    assert validar_email("ana@mail.com") is None
+    assert validar_email("ana@mail") is CodigoValidacion.EMAIL_FORMATO
+    assert validar_email("ana@mail.com\n") is CodigoValidacion.EMAIL_FORMATO
+
+
+def test_validadores_de_columna():
+    """Devuelven un código por fila, None en las válidas"""
+    assert validar_dnis(("12345678Z", "12345678A", "abc")) == [
+        None,
+        CodigoValidacion.DNI_LETRA,
+        CodigoValidacion.DNI_FORMATO,
+    ]
+    assert validar_emails(["a@b.es", "ab.es"]) == [None, CodigoValidacion.EMAIL_FORMATO]
+    assert validar_no_vacios(["x", ""]) == [None, CodigoValidacion.VACIO]
+    assert validar_acciones(["IN", "OUT", "in"]) == [
+        None,
+        None,
+        CodigoValidacion.ACCION,
+    ]
+
+
+def test_validar_columnas_primer_error_por_fila():
+    """Cada fila se queda con el primer error en el orden de las reglas"""
+    filas = [
+        {"dni": "12345678Z", "email": "ana@mail.com", "nombre": "Ana"},
+        {"dni": "12345678A", "email": "mal", "nombre": ""},
+        {"dni": "87654321X", "email": "mal", "nombre": ""},
+        {"dni": "11223344B", "email": "bea@mail.com", "nombre": ""},
+    ]
+    reglas = {
+        "dni": validar_dnis,
+        "email": validar_emails,
+        "nombre": validar_no_vacios,
+    }
+    assert validar_columnas(a_columnas(filas, reglas), reglas) == [
+        None,
+        ("dni", CodigoValidacion.DNI_LETRA),
+        ("email", CodigoValidacion.EMAIL_FORMATO),
+        ("nombre", CodigoValidacion.VACIO),
+    ]
+    assert validar_columnas({}, {}) == []
@@ -5,7 +5,7 @@ from pathlib import Path
 
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
-from parking.models.bd import RegistroORM
+from parking.models.bd import EstadoBiciORM
 from parking.data_utils.validators import (
     es_campo_vacio,
     es_dni_unico,
@@ -243,17 +243,15 @@ def test_normalizar_texto(test_text, expected):
     ],
 )
 def test_puede_entrar(accion_ultima, esperado):
-    """Comprueba que puede_entrar devuelva los valores esperados según la última ocurrencia de registro"""
+    """Comprueba que puede_entrar devuelva los valores esperados según el estado guardado de la bici"""
     mock_sesion = MagicMock()
     if accion_ultima is None:
-        mock_sesion.query.return_value.filter_by.return_value.order_by.return_value.first.return_value = (
-            None
-        )
+        mock_sesion.get.return_value = None
     else:
-        mock_sesion.query.return_value.filter_by.return_value.order_by.return_value.first.return_value = RegistroORM(
-            timestamp="2025-12-29 12:00:00",
-            accion=accion_ultima,
+        mock_sesion.get.return_value = EstadoBiciORM(
             num_serie="BK001",
+            accion=accion_ultima,
+            timestamp="2025-12-29 12:00:00",
             dni_usuario="12345678A",
         )
 
@@ -277,17 +275,15 @@ def test_puede_entrar(accion_ultima, esperado):
     ],
 )
 def test_puede_salir(accion_ultima, esperado):
-    """Comprueba que puede_salir devuelva los valores esperados según la última ocurrencia de registro"""
+    """Comprueba que puede_salir devuelva los valores esperados según el estado guardado de la bici"""
     mock_sesion = MagicMock()
     if accion_ultima is None:
-        mock_sesion.query.return_value.filter_by.return_value.order_by.return_value.first.return_value = (
-            None
-        )
+        mock_sesion.get.return_value = None
     else:
-        mock_sesion.query.return_value.filter_by.return_value.order_by.return_value.first.return_value = RegistroORM(
-            timestamp="2025-12-29 12:00:00",
-            accion=accion_ultima,
+        mock_sesion.get.return_value = EstadoBiciORM(
             num_serie="BK001",
+            accion=accion_ultima,
+            timestamp="2025-12-29 12:00:00",
             dni_usuario="12345678A",
         )
 